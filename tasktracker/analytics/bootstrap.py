@@ -0,0 +1,97 @@
+"""
+Building blocks for the dashboard bootstrap endpoint.
+
+Each part is an independent read, so when the database connection is not
+inside a transaction they run concurrently on a small thread pool. Every
+worker thread uses its own database connection.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from rest_framework.settings import api_settings
+
+from tasks.models import PendingApprovalCounter, Task
+from tasks.serializers import TaskSerializer
+from users.models import User
+from users.serializers import TeamRosterSerializer
+from users.views import RosterPagination
+from .summaries import current_month, current_week, employee_summary, team_summary
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BOOTSTRAP_MAX_WORKERS,
+            thread_name_prefix='bootstrap',
+        )
+    return _executor
+
+
+def _run_part(func):
+    try:
+        return func()
+    finally:
+        # Worker threads have no request cycle to close their connections.
+        close_old_connections()
+
+
+def run_parts(parts):
+    """
+    Evaluate a dict of zero-argument callables and return their results.
+
+    Parts run concurrently unless the current connection is inside an
+    atomic block, whose uncommitted data other connections cannot see.
+    """
+    if settings.BOOTSTRAP_MAX_WORKERS <= 1 or connection.in_atomic_block:
+        return {name: func() for name, func in parts.items()}
+
+    executor = _get_executor()
+    # Copy the context so replica routing carries over to worker threads.
+    futures = {
+        name: executor.submit(contextvars.copy_context().run, _run_part, func)
+        for name, func in parts.items()
+    }
+    return {name: future.result() for name, future in futures.items()}
+
+
+def period_summary(user, today):
+    """Current month team analytics for managers, current week for employees."""
+    if user.is_manager:
+        return team_summary(*current_month(today), user.managed_team_ids())
+    return employee_summary(user.id, *current_week(today))
+
+
+def pending_approval_count(user):
+    """Pending tasks awaiting a manager in their teams, or the employee's own pending tasks."""
+    if user.is_manager:
+        return PendingApprovalCounter.get_team_count(user.managed_team_ids())
+    return PendingApprovalCounter.get_count(PendingApprovalCounter.user_key(user.id))
+
+
+def first_task_page(user, request):
+    """First page of the task list, shaped like the paginated tasks/ response."""
+    tasks = Task.objects.visible_to(user).select_related('user')
+    page_size = api_settings.PAGE_SIZE
+    results = list(tasks[:page_size])
+    count = len(results) if len(results) < page_size else tasks.count()
+    return {
+        'count': count,
+        'results': TaskSerializer(results, many=True, context={'request': request}).data,
+    }
+
+
+def team_roster_page(today, manager):
+    """First page of a manager's team roster."""
+    roster = User.objects.team_roster(today, manager)
+    page_size = RosterPagination.page_size
+    results = list(roster[:page_size])
+    count = len(results) if len(results) < page_size else roster.count()
+    return {
+        'count': count,
+        'results': TeamRosterSerializer(results, many=True).data,
+    }
@@ -0,0 +1,60 @@
+"""
+Daily capacity: hours logged and left under the 8-hour daily limit.
+
+Logged hours per (employee, date) come from one grouped query over the
+team daily stats, which already hold each day's hours per status, and
+every day of the range is filled in so clients can see which days are
+full before they try to write. Employees without a team have no stats
+rows, so their hours are summed from their tasks instead. Tasks of every
+status count, as they do for ``Task.validate_daily_hours``.
+"""
+from datetime import timedelta
+
+from django.db.models import Sum
+
+from tasks.models import DAILY_HOURS_LIMIT, Task, TeamDailyStats
+
+
+def daily_capacity(employees, start_date, end_date):
+    """
+    Return the logged and remaining hours of each employee (a list of
+    users) on every day from start_date to end_date.
+    """
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    logged = {}
+    in_teams = [employee for employee in employees if employee.team_id is not None]
+    without_team = [employee for employee in employees if employee.team_id is None]
+    if in_teams:
+        rows = TeamDailyStats.objects.filter(
+            team_id__in={employee.team_id for employee in in_teams},
+            user_id__in=[employee.id for employee in in_teams],
+            task_date__range=[start_date, end_date],
+            task_count__gt=0,
+        ).values('user_id', 'task_date').annotate(total_hours=Sum('total_hours')).order_by()
+        for row in rows:
+            logged[row['user_id'], row['task_date']] = row['total_hours']
+    if without_team:
+        rows = Task.objects.filter(
+            user_id__in=[employee.id for employee in without_team],
+            task_date__range=[start_date, end_date],
+        ).values('user_id', 'task_date').annotate(total_hours=Sum('hours_spent')).order_by()
+        for row in rows:
+            logged[row['user_id'], row['task_date']] = row['total_hours']
+
+    results = []
+    for employee in employees:
+        employee_days = []
+        for day in days:
+            hours = logged.get((employee.id, day), 0)
+            employee_days.append({
+                'date': day,
+                'logged_hours': hours,
+                'remaining_hours': max(DAILY_HOURS_LIMIT - hours, 0),
+            })
+        results.append({
+            'employee_id': employee.id,
+            'email': employee.email,
+            'name': f"{employee.first_name} {employee.last_name}",
+            'days': employee_days,
+        })
+    return results
@@ -0,0 +1,59 @@
+import csv
+import io
+
+from tasktracker.metrics import EXPORT_BYTES, EXPORT_ROWS
+
+EXPORT_HEADER = [
+    'ID', 'Date', 'Employee', 'Title', 'Description',
+    'Hours', 'Tags', 'Status', 'Feedback', 'Created At'
+]
+
+# Rows written per streamed chunk
+EXPORT_CHUNK_ROWS = 500
+
+
+def export_row(task):
+    """Return the CSV row for a task (needs task.user loaded)."""
+    return [
+        task.id,
+        task.task_date,
+        task.user.email,
+        task.title,
+        task.description,
+        task.hours_spent,
+        ', '.join(task.tags),
+        task.status,
+        task.feedback or '',
+        task.created_at.strftime('%Y-%m-%d %H:%M:%S')
+    ]
+
+
+def stream_csv(tasks, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Yield the export CSV for an iterable of tasks in chunks of rows, so large
+    exports are never held in memory as a whole.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
+
+    rows = 0
+    for task in tasks:
+        writer.writerow(export_row(task))
+        rows += 1
+        if rows == chunk_rows:
+            yield _flush(buffer, rows)
+            rows = 0
+
+    if buffer.tell():
+        yield _flush(buffer, rows)
+
+
+def _flush(buffer, rows):
+    """Empty the buffer, counting its rows and bytes in the export metrics."""
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    EXPORT_ROWS.inc(rows)
+    EXPORT_BYTES.inc(len(data.encode()))
+    return data
@@ -0,0 +1,303 @@
+"""
+Streaming bulk import of tasks from the export CSV format.
+
+The upload is parsed row by row and imported in chunks of
+``IMPORT_CHUNK_ROWS`` rows. Employees are resolved from one lookup table
+loaded up front, and the 8-hour daily rule is checked in memory against
+running totals per (employee, date) that are seeded from the database once
+per chunk. Each chunk is written with ``bulk_create`` in its own
+transaction, together with the pending counters, team daily stats and the
+import's progress, so an interrupted import resumes after its last
+committed line. Rows that fail validation are skipped and reported.
+"""
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from tasks.audit import diff, record_task_change, snapshot
+from tasks.models import (
+    DAILY_HOURS_LIMIT,
+    ClosedPeriod,
+    PendingApprovalCounter,
+    Task,
+    TaskAuditEntry,
+    TaskImport,
+    TeamDailyStats,
+    lock_team_tasks,
+)
+from tasks.tags import tag_index
+from tasktracker.caching import TASKS, bump_data_version
+from users.models import User
+from .export import EXPORT_HEADER
+
+# Rows validated and committed per transaction
+IMPORT_CHUNK_ROWS = 1000
+
+# Rows per INSERT statement
+IMPORT_BATCH_SIZE = 500
+
+# Rejected rows kept in an import's error report
+IMPORT_MAX_ERRORS = 1000
+
+MIN_TASK_HOURS = Decimal('0.1')
+
+STATUSES = [status for status, _ in Task.STATUS_CHOICES]
+
+
+class ImportFormatError(ValueError):
+    """The uploaded file is not a CSV in the export format."""
+
+
+class ImportConflict(Exception):
+    """Another run of the same import committed rows first."""
+
+
+def employee_lookup(manager=None):
+    """
+    Return {email: (user id, team id)} for the employees a manager
+    manages, or every employee without a manager.
+    """
+    if manager is not None:
+        employees = User.objects.managed_by(manager)
+    else:
+        employees = User.objects.filter(role=User.ROLE_EMPLOYEE)
+    return {
+        email.lower(): (user_id, team_id)
+        for email, user_id, team_id in employees.values_list('email', 'id', 'team_id')
+    }
+
+
+def read_rows(binary_file):
+    """
+    Yield (line number, row) for every non-blank data row of a binary CSV
+    file, after checking its header. The line number is that of the row's
+    last line, so rows with quoted line breaks are counted correctly.
+    """
+    reader = csv.reader(io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline=''))
+    try:
+        header = next(reader, None)
+        if header is None or [name.strip() for name in header] != EXPORT_HEADER:
+            raise ImportFormatError(f"The header must be: {','.join(EXPORT_HEADER)}")
+        for row in reader:
+            if any(cell.strip() for cell in row):
+                yield reader.line_num, row
+    except UnicodeDecodeError:
+        raise ImportFormatError(f"The file is not UTF-8 encoded (after line {reader.line_num}).")
+    except csv.Error as e:
+        raise ImportFormatError(f"Line {reader.line_num}: {e}")
+
+
+def parse_hours(value):
+    """Return (hours, error) for an Hours cell."""
+    try:
+        hours = Decimal(value)
+    except InvalidOperation:
+        return None, "Hours must be a number."
+    if not hours.is_finite() or not MIN_TASK_HOURS <= hours <= DAILY_HOURS_LIMIT:
+        return None, f"Hours must be between {MIN_TASK_HOURS} and {DAILY_HOURS_LIMIT}."
+    if hours.as_tuple().exponent < -2:
+        return None, "Hours must have at most 2 decimal places."
+    return hours, None
+
+
+def parse_row(row, employees):
+    """
+    Return (unsaved task, []) for a valid CSV row, or (None, errors). The
+    ID and Created At columns are ignored: imported tasks get new ones.
+    """
+    if len(row) != len(EXPORT_HEADER):
+        return None, [f"Expected {len(EXPORT_HEADER)} columns, got {len(row)}."]
+    _, task_date, email, title, description, hours, tags, status, feedback, _ = row
+    errors = []
+
+    try:
+        task_date = parse_date(task_date.strip())
+    except ValueError:
+        task_date = None
+    if task_date is None:
+        errors.append("Date must use the YYYY-MM-DD format.")
+
+    employee = employees.get(email.strip().lower())
+    if employee is None:
+        errors.append(f"Unknown employee: {email.strip() or '(empty)'}.")
+
+    title = title.strip()
+    if not title:
+        errors.append("Title is required.")
+    elif len(title) > 255:
+        errors.append("Title must be at most 255 characters.")
+
+    if not description.strip():
+        errors.append("Description is required.")
+
+    hours, error = parse_hours(hours.strip())
+    if error:
+        errors.append(error)
+
+    status = status.strip().lower() or Task.STATUS_PENDING
+    if status not in STATUSES:
+        errors.append(f"Status must be one of: {', '.join(STATUSES)}.")
+
+    feedback = feedback.strip() or None
+    if status == Task.STATUS_REJECTED and not feedback:
+        errors.append("Rejected tasks need feedback.")
+
+    if errors:
+        return None, errors
+
+    user_id, team_id = employee
+    return Task(
+        user_id=user_id,
+        team_id=team_id,
+        task_date=task_date,
+        title=title,
+        description=description,
+        hours_spent=hours,
+        tags=[tag.strip() for tag in tags.split(',') if tag.strip()],
+        status=status,
+        feedback=feedback,
+    ), []
+
+
+class TaskImporter:
+    """
+    Import a CSV into the tasks of a manager's teams (or of every team
+    without a manager), recording progress in a TaskImport.
+    """
+
+    def __init__(self, task_import, manager=None, chunk_rows=IMPORT_CHUNK_ROWS, on_chunk=None):
+        self.task_import = task_import
+        self.manager = manager
+        self.chunk_rows = chunk_rows
+        # Called with the TaskImport after every committed chunk
+        self.on_chunk = on_chunk
+        self.employees = employee_lookup(manager)
+        self.team_ids = {team_id for _, team_id in self.employees.values()}
+        self.load_closed_periods()
+        # Hours logged per (user id, date), including rows imported so far
+        self.daily_hours = {}
+
+    def run(self, binary_file):
+        """Import the rows after the last committed line and return the TaskImport."""
+        chunk = []
+        for line, row in read_rows(binary_file):
+            if line <= self.task_import.last_line:
+                continue
+            chunk.append((line, row))
+            if len(chunk) >= self.chunk_rows:
+                self.import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk)
+
+        if self.task_import.status != TaskImport.STATUS_COMPLETED:
+            self.task_import.status = TaskImport.STATUS_COMPLETED
+            self.task_import.save(update_fields=['status', 'updated_at'])
+        return self.task_import
+
+    def load_closed_periods(self):
+        # (start, end) of the closed periods of each team
+        self.closed_periods = {}
+        for team_id, start_date, end_date in ClosedPeriod.objects.filter(
+            team_id__in=self.team_ids
+        ).values_list('team_id', 'start_date', 'end_date'):
+            self.closed_periods.setdefault(team_id, []).append((start_date, end_date))
+
+    def is_closed(self, task):
+        return any(
+            start_date <= task.task_date <= end_date
+            for start_date, end_date in self.closed_periods.get(task.team_id, [])
+        )
+
+    def load_daily_hours(self, tasks):
+        """Seed the running daily totals of the (user, date) pairs not seen yet."""
+        missing = {(task.user_id, task.task_date) for task in tasks} - self.daily_hours.keys()
+        if not missing:
+            return
+        rows = Task.objects.filter(
+            user_id__in={user_id for user_id, _ in missing},
+            task_date__in={task_date for _, task_date in missing},
+        ).values('user_id', 'task_date').annotate(total=Sum('hours_spent')).order_by()
+        logged = {(row['user_id'], row['task_date']): row['total'] for row in rows}
+        for key in missing:
+            self.daily_hours[key] = logged.get(key) or Decimal(0)
+
+    def validate_chunk(self, chunk):
+        """Return the valid tasks and the errors of the rows in a chunk."""
+        parsed, errors = [], []
+        for line, row in chunk:
+            task, row_errors = parse_row(row, self.employees)
+            if task is not None and self.is_closed(task):
+                row_errors = [f"Tasks dated {task.task_date} are in a closed period."]
+            if row_errors:
+                errors.append({'line': line, 'errors': row_errors})
+            else:
+                parsed.append((line, task))
+
+        self.load_daily_hours(task for _, task in parsed)
+        tasks = []
+        for line, task in parsed:
+            key = (task.user_id, task.task_date)
+            total_hours = self.daily_hours[key]
+            if total_hours + task.hours_spent > DAILY_HOURS_LIMIT:
+                errors.append({'line': line, 'errors': [
+                    f"Total hours for {task.task_date} would exceed 8 hours limit. "
+                    f"Current total: {total_hours}, Attempting to add: {task.hours_spent}"
+                ]})
+                continue
+            self.daily_hours[key] = total_hours + task.hours_spent
+            tasks.append(task)
+
+        errors.sort(key=lambda error: error['line'])
+        return tasks, errors
+
+    def import_chunk(self, chunk):
+        """Insert a chunk's valid rows and record its progress in one transaction."""
+        task_import = self.task_import
+        with transaction.atomic():
+            # Periods of the teams cannot be closed until the chunk commits,
+            # so its rows are checked against those closed by now
+            if lock_team_tasks(self.team_ids):
+                self.load_closed_periods()
+            tasks, errors = self.validate_chunk(chunk)
+            room = max(IMPORT_MAX_ERRORS - len(task_import.errors), 0)
+            progress = {
+                'last_line': chunk[-1][0],
+                'imported_count': task_import.imported_count + len(tasks),
+                'error_count': task_import.error_count + len(errors),
+                'errors': task_import.errors + errors[:room],
+                'updated_at': timezone.now(),
+            }
+
+            Task.objects.bulk_create(tasks, batch_size=IMPORT_BATCH_SIZE)
+
+            # bulk_create sends no signals, so maintain what they would
+            pending = {}
+            for task in tasks:
+                if task.status == Task.STATUS_PENDING:
+                    pending[task.user_id, task.team_id] = pending.get((task.user_id, task.team_id), 0) + 1
+            for (user_id, team_id), count in pending.items():
+                PendingApprovalCounter.adjust(user_id, count, team_id)
+            TeamDailyStats.apply_created(task.stats_entry() for task in tasks)
+
+            # Only one run of an import may commit each chunk
+            updated = TaskImport.objects.filter(
+                pk=task_import.pk, last_line=task_import.last_line,
+            ).update(**progress)
+            if not updated:
+                raise ImportConflict("The import was resumed by another request.")
+
+        for field, value in progress.items():
+            setattr(task_import, field, value)
+        if tasks:
+            bump_data_version(TASKS)
+        for task in tasks:
+            tag_index.apply(None, task.tag_entry())
+            record_task_change(task, TaskAuditEntry.ACTION_CREATED, self.manager, diff({}, snapshot(task)))
+        if self.on_chunk is not None:
+            self.on_chunk(task_import)
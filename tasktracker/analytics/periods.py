@@ -0,0 +1,67 @@
+"""
+Closing periods.
+
+Closing a team's date range freezes its tasks and stores the team summary
+and every employee's summary of the range as PeriodSnapshot rows, which
+``summaries`` then serve instead of recomputing them.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from tasks.models import ClosedPeriod, PeriodSnapshot, Task, lock_team_tasks
+from .summaries import employee_summaries, live_team_summary
+
+
+class PeriodNotClosable(ValueError):
+    """The date range cannot be closed."""
+
+
+def snapshot_data(summary):
+    """Return a summary as JSON-ready data (dates and Decimals as strings)."""
+    return json.loads(json.dumps(summary, cls=DjangoJSONEncoder))
+
+
+def close_period(team_id, start_date, end_date, closed_by=None):
+    """
+    Close a team's tasks from start_date to end_date and snapshot their
+    analytics. Raises PeriodNotClosable if the range overlaps a closed
+    period or still has pending tasks.
+    """
+    with transaction.atomic():
+        # Lock the team's task writes out before reading anything, so the
+        # checks and snapshots see every write committed before the period
+        # and later writes see the period: the team lock on PostgreSQL, the
+        # write lock taken by creating the period first on SQLite
+        lock_team_tasks([team_id], exclusive=True)
+        period = ClosedPeriod.objects.create(
+            team_id=team_id, start_date=start_date, end_date=end_date, closed_by=closed_by
+        )
+
+        overlapping = ClosedPeriod.objects.filter(
+            team_id=team_id, start_date__lte=end_date, end_date__gte=start_date
+        ).exclude(pk=period.pk).first()
+        if overlapping is not None:
+            raise PeriodNotClosable(
+                f"Overlaps the closed period {overlapping.start_date} to {overlapping.end_date}."
+            )
+
+        tasks = Task.objects.filter(team_id=team_id, task_date__range=[start_date, end_date])
+        pending = tasks.filter(status=Task.STATUS_PENDING).count()
+        if pending:
+            raise PeriodNotClosable(f"{pending} task(s) in the period are still pending approval.")
+
+        snapshots = [PeriodSnapshot(
+            period=period,
+            data=snapshot_data(live_team_summary(start_date, end_date, [team_id])),
+        )]
+        employee_ids = sorted(set(tasks.values_list('user_id', flat=True)))
+        for summary in employee_summaries(employee_ids, start_date, end_date, [team_id], tag_limit=None):
+            summary['tag_counts'] = summary['top_tags']
+            summary['top_tags'] = summary['tag_counts'][:5]
+            snapshots.append(PeriodSnapshot(
+                period=period, user_id=summary['employee_id'], data=snapshot_data(summary),
+            ))
+        PeriodSnapshot.objects.bulk_create(snapshots)
+    return period
@@ -0,0 +1,333 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.utils.dateparse import parse_date
+
+from tasks.models import PeriodSnapshot, Task, TeamDailyStats
+
+
+def current_week(today):
+    """Return the Monday and Sunday of the week containing today."""
+    start_date = today - timedelta(days=today.weekday())
+    return start_date, start_date + timedelta(days=6)
+
+
+def current_month(today):
+    """Return the first and last day of the month containing today."""
+    start_date = today.replace(day=1)
+    if today.month == 12:
+        end_date = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
+    else:
+        end_date = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
+    return start_date, end_date
+
+
+def top_tags(tag_lists, limit):
+    """Return the most used tags across lists of tags as (tag, count) pairs."""
+    tags_data = {}
+    for tags in tag_lists:
+        for tag in tags:
+            if tag in tags_data:
+                tags_data[tag] += 1
+            else:
+                tags_data[tag] = 1
+
+    # Sort tags by frequency, ties by name, so merged summaries rank alike
+    return sorted(tags_data.items(), key=lambda x: (-x[1], x[0]))[:limit]
+
+
+def count_tags(tasks, limit):
+    """Return the most used tags across tasks as (tag, count) pairs."""
+    return top_tags(tasks.values_list('tags', flat=True), limit)
+
+
+def status_counts(tasks):
+    """Count tasks by status."""
+    return {
+        'pending': tasks.filter(status=Task.STATUS_PENDING).count(),
+        'approved': tasks.filter(status=Task.STATUS_APPROVED).count(),
+        'rejected': tasks.filter(status=Task.STATUS_REJECTED).count(),
+    }
+
+
+def closed_snapshots(start_date, end_date, team_ids=None, user_id=None):
+    """
+    Return the snapshots of the closed periods lying wholly inside a date
+    range: an employee's, or the team summaries of team_ids.
+    """
+    snapshots = PeriodSnapshot.objects.filter(
+        period__start_date__gte=start_date,
+        period__end_date__lte=end_date,
+    ).select_related('period')
+    if user_id is not None:
+        return list(snapshots.filter(user_id=user_id))
+    return list(snapshots.filter(user__isnull=True, period__team_id__in=team_ids))
+
+
+def covers(ranges, start_date, end_date):
+    """Return True if the (start, end) date ranges cover every day from start_date to end_date."""
+    day = start_date
+    for range_start, range_end in sorted(ranges):
+        if range_start > day:
+            return False
+        day = max(day, range_end + timedelta(days=1))
+    return day > end_date
+
+
+def load_snapshot(data):
+    """Restore the dates and Decimal hours of a summary stored as JSON."""
+    summary = dict(data)
+    summary['total_hours'] = Decimal(summary['total_hours'])
+    for key in ('daily_stats', 'tasks_per_day', 'employee_hours'):
+        rows = []
+        for row in summary.get(key, []):
+            row = dict(row, total_hours=Decimal(row['total_hours']))
+            if 'task_date' in row:
+                row['task_date'] = parse_date(row['task_date'])
+            rows.append(row)
+        summary[key] = rows
+    return summary
+
+
+def merge_tag_counts(parts):
+    """Add up the tag_counts of summaries, most used first."""
+    tags_data = {}
+    for part in parts:
+        for tag, count in part['tag_counts']:
+            tags_data[tag] = tags_data.get(tag, 0) + count
+    return sorted(tags_data.items(), key=lambda x: (-x[1], x[0]))
+
+
+def merge_rows(parts, key, group_by):
+    """Add up the task_count and total_hours of rows grouped by group_by."""
+    merged = {}
+    for part in parts:
+        for row in part[key]:
+            group = row[group_by]
+            if group in merged:
+                merged[group]['total_hours'] += row['total_hours']
+                merged[group]['task_count'] += row['task_count']
+            else:
+                merged[group] = dict(row)
+    return list(merged.values())
+
+
+def merge_status_counts(parts):
+    counts = {'pending': 0, 'approved': 0, 'rejected': 0}
+    for part in parts:
+        for status, count in part['status_counts'].items():
+            counts[status] += count
+    return counts
+
+
+def live_employee_summary(employee_id, start_date, end_date, exclude=Q()):
+    """
+    Build the weekly summary for an employee from their tasks, leaving out
+    those matching exclude, with the count of every tag in tag_counts.
+    """
+    # Get tasks for the employee in date range
+    tasks = Task.objects.filter(
+        user_id=employee_id,
+        task_date__range=[start_date, end_date]
+    ).exclude(exclude)
+
+    # Group tasks by date and calculate stats
+    stats = tasks.values('task_date').annotate(
+        total_hours=Sum('hours_spent'),
+        task_count=Count('id')
+    ).order_by('task_date')
+
+    # Calculate total hours worked
+    total_hours = tasks.aggregate(total=Sum('hours_spent'))['total'] or 0
+
+    tag_counts = count_tags(tasks, None)
+    return {
+        'employee_id': employee_id,
+        'start_date': start_date,
+        'end_date': end_date,
+        'daily_stats': list(stats),
+        'status_counts': status_counts(tasks),
+        'total_hours': total_hours,
+        'top_tags': tag_counts[:5],
+        'tag_counts': tag_counts,
+    }
+
+
+def employee_summary(employee_id, start_date, end_date):
+    """
+    Build the weekly summary for an employee over a date range. Closed
+    periods in the range are read from their snapshots and only the other
+    days are computed from tasks.
+    """
+    snapshots = closed_snapshots(start_date, end_date, user_id=employee_id)
+    if not snapshots:
+        summary = live_employee_summary(employee_id, start_date, end_date)
+    else:
+        parts = [load_snapshot(snapshot.data) for snapshot in snapshots]
+        ranges = [(snapshot.period.start_date, snapshot.period.end_date) for snapshot in snapshots]
+        if not covers(ranges, start_date, end_date):
+            closed = Q()
+            for range_start, range_end in ranges:
+                closed |= Q(task_date__range=[range_start, range_end])
+            parts.append(live_employee_summary(employee_id, start_date, end_date, exclude=closed))
+        tag_counts = merge_tag_counts(parts)
+        summary = {
+            'employee_id': employee_id,
+            'start_date': start_date,
+            'end_date': end_date,
+            'daily_stats': sorted(merge_rows(parts, 'daily_stats', 'task_date'), key=lambda row: row['task_date']),
+            'status_counts': merge_status_counts(parts),
+            'total_hours': sum(part['total_hours'] for part in parts),
+            'top_tags': tag_counts[:5],
+        }
+    summary.pop('tag_counts', None)
+    return summary
+
+
+def employee_summaries(employee_ids, start_date, end_date, team_ids, tag_limit=5):
+    """
+    Build the weekly summary of many employees with two grouped queries
+    whatever their number: daily stats, status counts and hours from the
+    team daily stats of team_ids, and tags from the tasks. A tag_limit of
+    None lists every tag.
+    """
+    summaries = {
+        employee_id: {
+            'employee_id': employee_id,
+            'start_date': start_date,
+            'end_date': end_date,
+            'daily_stats': [],
+            'status_counts': {'pending': 0, 'approved': 0, 'rejected': 0},
+            'total_hours': 0,
+            'top_tags': [],
+        }
+        for employee_id in employee_ids
+    }
+
+    stats = TeamDailyStats.objects.filter(
+        team_id__in=team_ids,
+        user_id__in=employee_ids,
+        task_date__range=[start_date, end_date],
+        task_count__gt=0,
+    ).values('user_id', 'task_date', 'status').annotate(
+        task_count=Sum('task_count'),
+        total_hours=Sum('total_hours')
+    ).order_by('user_id', 'task_date')
+
+    for row in stats:
+        summary = summaries[row['user_id']]
+        daily_stats = summary['daily_stats']
+        if not daily_stats or daily_stats[-1]['task_date'] != row['task_date']:
+            daily_stats.append({'task_date': row['task_date'], 'total_hours': 0, 'task_count': 0})
+        daily_stats[-1]['total_hours'] += row['total_hours']
+        daily_stats[-1]['task_count'] += row['task_count']
+        summary['status_counts'][row['status']] += row['task_count']
+        summary['total_hours'] += row['total_hours']
+
+    tag_lists = {employee_id: [] for employee_id in employee_ids}
+    tasks = Task.objects.filter(
+        team_id__in=team_ids,
+        user_id__in=employee_ids,
+        task_date__range=[start_date, end_date],
+    )
+    for user_id, tags in tasks.values_list('user_id', 'tags'):
+        tag_lists[user_id].append(tags)
+    for employee_id, summary in summaries.items():
+        summary['top_tags'] = top_tags(tag_lists[employee_id], tag_limit)
+
+    return list(summaries.values())
+
+
+def live_team_summary(start_date, end_date, team_ids, exclude=Q()):
+    """
+    Build analytics for teams over a date range, leaving out the stats and
+    tasks matching exclude, with the count of every tag in tag_counts.
+    Counts and hours come from the precomputed team daily stats; only the
+    tags are read from tasks.
+    """
+    stats = TeamDailyStats.objects.filter(
+        team_id__in=team_ids,
+        task_date__range=[start_date, end_date],
+        task_count__gt=0,
+    ).exclude(exclude)
+
+    counts = {'pending': 0, 'approved': 0, 'rejected': 0}
+    for row in stats.values('status').annotate(task_count=Sum('task_count')).order_by():
+        counts[row['status']] = row['task_count']
+
+    # Hours by employee
+    employee_hours = stats.values(
+        'user__id', 'user__first_name', 'user__last_name', 'user__email'
+    ).annotate(
+        total_hours=Sum('total_hours'),
+        task_count=Sum('task_count')
+    ).order_by('-total_hours', 'user__id')
+
+    # Total hours for the team
+    total_hours = stats.aggregate(total=Sum('total_hours'))['total'] or 0
+
+    # Tasks per day
+    tasks_per_day = stats.values('task_date').annotate(
+        task_count=Sum('task_count'),
+        total_hours=Sum('total_hours')
+    ).order_by('task_date')
+
+    tasks = Task.objects.filter(team_id__in=team_ids, task_date__range=[start_date, end_date]).exclude(exclude)
+    tag_counts = count_tags(tasks, None)
+
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'status_counts': counts,
+        'employee_hours': list(employee_hours),
+        'total_hours': total_hours,
+        'tasks_per_day': list(tasks_per_day),
+        'top_tags': tag_counts[:10],
+        'pending_approval_count': counts['pending'],
+        'tag_counts': tag_counts,
+    }
+
+
+def team_summary(start_date, end_date, team_ids):
+    """
+    Build analytics for teams over a date range. Closed periods in the
+    range are read from their snapshots and only the other days are
+    computed live.
+    """
+    snapshots = closed_snapshots(start_date, end_date, team_ids=team_ids)
+    if not snapshots:
+        summary = live_team_summary(start_date, end_date, team_ids)
+    else:
+        parts = [load_snapshot(snapshot.data) for snapshot in snapshots]
+        closed = Q()
+        for snapshot in snapshots:
+            period = snapshot.period
+            closed |= Q(team_id=period.team_id, task_date__range=[period.start_date, period.end_date])
+        fully_closed = all(
+            covers(
+                [(snapshot.period.start_date, snapshot.period.end_date)
+                 for snapshot in snapshots if snapshot.period.team_id == team_id],
+                start_date, end_date,
+            )
+            for team_id in team_ids
+        )
+        if not fully_closed:
+            parts.append(live_team_summary(start_date, end_date, team_ids, exclude=closed))
+        counts = merge_status_counts(parts)
+        tag_counts = merge_tag_counts(parts)
+        summary = {
+            'start_date': start_date,
+            'end_date': end_date,
+            'status_counts': counts,
+            'employee_hours': sorted(
+                merge_rows(parts, 'employee_hours', 'user__id'),
+                key=lambda row: (-row['total_hours'], row['user__id']),
+            ),
+            'total_hours': sum(part['total_hours'] for part in parts),
+            'tasks_per_day': sorted(merge_rows(parts, 'tasks_per_day', 'task_date'), key=lambda row: row['task_date']),
+            'top_tags': tag_counts[:10],
+            'pending_approval_count': counts['pending'],
+        }
+    summary.pop('tag_counts', None)
+    return summary
@@ -0,0 +1,74 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users.models import User
+
+
+class TimeSeriesAnalyticsTests(TestCase):
+    def setUp(self):
+        caches['admission'].clear()
+        self.manager = User.objects.create_user(
+            email='manager@example.com', password='secret', first_name='Mia', last_name='Manager', role='manager',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def test_heatmap_of_empty_range(self):
+        response = self.client.get(reverse('timeseries_analytics'), {
+            'start_date': '2024-01-01', 'end_date': '2024-12-31', 'granularity': 'month', 'heatmap': '1',
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['heatmap']['employee_ids'], [])
+        self.assertEqual(response.data['heatmap']['utilization'], [])
+        self.assertEqual(response.data['totals']['hours'], 0)
+
+    def test_default_range_ending_on_leap_day(self):
+        response = self.client.get(reverse('timeseries_analytics'), {'end_date': '2024-02-29'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['start_date'], date(2023, 3, 2))
+
+
+class CapacityTests(TestCase):
+    def setUp(self):
+        caches['admission'].clear()
+        caches['default'].clear()
+        self.employee = User.objects.create_user(
+            email='employee@example.com', password='secret', first_name='Eli', last_name='Employee',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.employee)
+
+    def log_hours(self, hours):
+        response = self.client.post(reverse('task_list_create'), {
+            'title': 'Write report',
+            'description': 'Quarterly report',
+            'hours_spent': hours,
+            'task_date': '2025-01-06',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+    def get_day(self):
+        response = self.client.get(reverse('capacity'), {'start_date': '2025-01-06', 'end_date': '2025-01-06'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data['results'][0]['days'][0]
+
+    def test_employee_in_team(self):
+        self.log_hours('7.00')
+        day = self.get_day()
+        self.assertEqual(day['logged_hours'], Decimal('7.00'))
+        self.assertEqual(day['remaining_hours'], Decimal('1.00'))
+
+    def test_employee_without_team(self):
+        User.objects.filter(pk=self.employee.pk).update(team=None)
+        self.employee.refresh_from_db()
+        self.client.force_authenticate(self.employee)
+        self.log_hours('7.00')
+        day = self.get_day()
+        self.assertEqual(day['logged_hours'], Decimal('7.00'))
+        self.assertEqual(day['remaining_hours'], Decimal('1.00'))
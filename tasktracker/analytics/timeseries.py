@@ -0,0 +1,189 @@
+"""
+Vectorized time-series analytics.
+
+Tasks in a date range are loaded once as compact NumPy arrays (user id,
+date ordinal, hours, status code). Every bucket of every series is then
+computed with ``searchsorted`` and ``bincount`` instead of one GROUP BY
+query per breakdown, so any granularity costs the same single query.
+"""
+from datetime import date, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from tasks.models import Task
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter', 'year')
+
+STATUS_CODES = {
+    Task.STATUS_PENDING: 0,
+    Task.STATUS_APPROVED: 1,
+    Task.STATUS_REJECTED: 2,
+}
+
+# Working hours per business day used for utilization
+DAILY_CAPACITY_HOURS = 8
+
+
+def period_start(day, granularity):
+    """Return the first day of the period containing day."""
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'quarter':
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    return day.replace(month=1, day=1)
+
+
+def next_period_start(start, granularity):
+    """Return the first day of the period after the one starting at start."""
+    if granularity == 'day':
+        return start + timedelta(days=1)
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    months = {'month': 1, 'quarter': 3, 'year': 12}[granularity]
+    month_index = start.year * 12 + start.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def bucket_bounds(start_date, end_date, granularity):
+    """
+    Return the (start, end) dates of each bucket covering the range, with
+    the first and last bucket clipped to the range.
+    """
+    bounds = []
+    current = period_start(start_date, granularity)
+    while current <= end_date:
+        following = next_period_start(current, granularity)
+        bounds.append((max(current, start_date), min(following - timedelta(days=1), end_date)))
+        current = following
+    return bounds
+
+
+def load_task_arrays(queryset):
+    """Load (user_id, date ordinal, hours, status code) columns as arrays."""
+    rows = list(queryset.values_list('user_id', 'task_date', 'hours_spent', 'status'))
+    count = len(rows)
+    return {
+        'user_id': np.fromiter((row[0] for row in rows), dtype=np.int64, count=count),
+        'ordinal': np.fromiter((row[1].toordinal() for row in rows), dtype=np.int64, count=count),
+        'hours': np.fromiter((row[2] for row in rows), dtype=np.float64, count=count),
+        'status': np.fromiter((STATUS_CODES[row[3]] for row in rows), dtype=np.int64, count=count),
+    }
+
+
+def _round(values, digits=2):
+    return np.round(values, digits).tolist()
+
+
+def compute_series(arrays, bounds):
+    """Compute the dense per-bucket series for the loaded arrays."""
+    bucket_count = len(bounds)
+    edges = np.array([start.toordinal() for start, _ in bounds], dtype=np.int64)
+    bucket = np.searchsorted(edges, arrays['ordinal'], side='right') - 1
+
+    hours = np.bincount(bucket, weights=arrays['hours'], minlength=bucket_count)
+    tasks = np.bincount(bucket, minlength=bucket_count)
+    by_status = np.bincount(
+        bucket * len(STATUS_CODES) + arrays['status'],
+        minlength=bucket_count * len(STATUS_CODES),
+    ).reshape(bucket_count, len(STATUS_CODES))
+
+    series = {
+        'hours': _round(hours),
+        'tasks': tasks.tolist(),
+    }
+    for status, code in STATUS_CODES.items():
+        series[status] = by_status[:, code].tolist()
+
+    totals = {
+        'hours': round(float(hours.sum()), 2),
+        'tasks': int(tasks.sum()),
+    }
+    for status, code in STATUS_CODES.items():
+        totals[status] = int(by_status[:, code].sum())
+    return bucket, series, totals
+
+
+def business_days(bounds):
+    """Return the number of Monday-Friday days in each bucket."""
+    starts = np.array([start for start, _ in bounds], dtype='datetime64[D]')
+    ends = np.array([end for _, end in bounds], dtype='datetime64[D]') + 1
+    return np.busday_count(starts, ends)
+
+
+def utilization_heatmap(arrays, bucket, bounds):
+    """
+    Return the employees present in the data and a matrix of their logged
+    hours divided by business-day capacity, one row per employee.
+    """
+    user_ids, user_index = np.unique(arrays['user_id'], return_inverse=True)
+    bucket_count = len(bounds)
+    hours = np.bincount(
+        user_index * bucket_count + bucket,
+        weights=arrays['hours'],
+        minlength=len(user_ids) * bucket_count,
+    ).reshape(len(user_ids), bucket_count)
+
+    capacity = business_days(bounds) * DAILY_CAPACITY_HOURS
+    utilization = np.divide(
+        hours, capacity, out=np.zeros(hours.shape, dtype=np.float64), where=capacity > 0
+    )
+    return user_ids.tolist(), _round(utilization, 3)
+
+
+def percent_change(current, previous):
+    if not previous:
+        return None
+    return round((current - previous) / previous * 100, 1)
+
+
+def build_timeseries(queryset, start_date, end_date, granularity, compare=False, heatmap=False):
+    """
+    Build dense series for tasks in queryset between start_date and
+    end_date, optionally with the preceding period of equal length and an
+    employee utilization heatmap.
+    """
+    bounds = bucket_bounds(start_date, end_date, granularity)
+    arrays = load_task_arrays(queryset.filter(task_date__range=[start_date, end_date]))
+    bucket, series, totals = compute_series(arrays, bounds)
+
+    result = {
+        'start_date': start_date,
+        'end_date': end_date,
+        'granularity': granularity,
+        'buckets': [{'start': start, 'end': end} for start, end in bounds],
+        'capacity_hours': (business_days(bounds) * DAILY_CAPACITY_HOURS).tolist(),
+        'series': series,
+        'totals': totals,
+    }
+
+    if compare:
+        length = end_date - start_date + timedelta(days=1)
+        previous_start, previous_end = start_date - length, start_date - timedelta(days=1)
+        previous_bounds = bucket_bounds(previous_start, previous_end, granularity)
+        previous_arrays = load_task_arrays(
+            queryset.filter(task_date__range=[previous_start, previous_end])
+        )
+        _, previous_series, previous_totals = compute_series(previous_arrays, previous_bounds)
+        result['previous'] = {
+            'start_date': previous_start,
+            'end_date': previous_end,
+            'buckets': [{'start': start, 'end': end} for start, end in previous_bounds],
+            'series': previous_series,
+            'totals': previous_totals,
+            'change_percent': {
+                key: percent_change(totals[key], previous_totals[key]) for key in totals
+            },
+        }
+
+    if heatmap:
+        user_ids, utilization = utilization_heatmap(arrays, bucket, bounds)
+        result['heatmap'] = {'employee_ids': user_ids, 'utilization': utilization}
+
+    return result
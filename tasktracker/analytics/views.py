@@ -1,26 +1,48 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import render
-import csv
 from datetime import datetime, timedelta
 from django.db.models import Count, Sum, Avg
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from rest_framework import generics, permissions, views
+from rest_framework import generics, permissions, status, views
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 
-from tasks.models import Task
+from tasks.filters import filter_tasks
+from tasks.models import DAILY_HOURS_LIMIT, ClosedPeriod, Task, TaskImport
+from tasks.serializers import ClosedPeriodSerializer, TaskImportSerializer
+from tasktracker.caching import TASKS, USERS, versioned_cache_key
+from tasktracker.db_router import ReplicaReadMixin, read_db_alias
+from tasktracker.metrics import cache_lookup
+from tasktracker.throttling import AdmissionControlMixin
 from users.models import User
 from users.permissions import IsManager, IsManagerOrTaskOwner
+from users.serializers import UserSerializer
+from .bootstrap import first_task_page, pending_approval_count, period_summary, run_parts, team_roster_page
+from .capacity import daily_capacity
+from .export import stream_csv
+from .importer import ImportConflict, ImportFormatError, TaskImporter
+from .periods import PeriodNotClosable, close_period
+from .summaries import current_month, current_week, employee_summaries, employee_summary, team_summary
+from .timeseries import GRANULARITIES, build_timeseries, np
 
 
-class EmployeeWeeklySummaryView(views.APIView):
+class EmployeeWeeklySummaryView(AdmissionControlMixin, ReplicaReadMixin, views.APIView):
     """View for getting weekly summary for an employee."""
     
+    admission_class = 'heavy'
     permission_classes = [permissions.IsAuthenticated, IsManagerOrTaskOwner]
     
     def get(self, request, employee_id=None):
         # Default to current user if no employee_id or user is not a manager
         if not employee_id or not request.user.is_manager:
             employee_id = request.user.id
+        elif not User.objects.managed_by(request.user).filter(id=employee_id).exists():
+            raise NotFound("No such employee in your teams.")
             
         # Get start and end dates from query params or use current week
         start_date = request.query_params.get('start_date')
@@ -28,63 +50,71 @@ class EmployeeWeeklySummaryView(views.APIView):
         
         if not start_date or not end_date:
             # Default to current week
-            today = timezone.now().date()
-            # Get the previous Monday
-            start_date = today - timedelta(days=today.weekday())
-            # Get the Sunday
-            end_date = start_date + timedelta(days=6)
+            start_date, end_date = current_week(timezone.now().date())
         else:
             start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
         
-        # Get tasks for the employee in date range
-        tasks = Task.objects.filter(
-            user_id=employee_id,
-            task_date__range=[start_date, end_date]
-        )
+        return Response(employee_summary(employee_id, start_date, end_date))
+
+
+class BatchWeeklySummaryView(AdmissionControlMixin, ReplicaReadMixin, views.APIView):
+    """
+    View for getting the weekly summary of many employees at once: those in
+    ``employee_ids``, those in ``team_id`` or every employee of the
+    manager's teams (for managers only).
+    """
+    
+    admission_class = 'heavy'
+    permission_classes = [permissions.IsAuthenticated, IsManager]
+    
+    def get(self, request):
+        team_ids = request.user.managed_team_ids()
+        employees = User.objects.managed_by(request.user)
         
-        # Group tasks by date and calculate stats
-        stats = tasks.values('task_date').annotate(
-            total_hours=Sum('hours_spent'),
-            task_count=Count('id')
-        ).order_by('task_date')
-        
-        # Count tasks by status
-        status_counts = {
-            'pending': tasks.filter(status=Task.STATUS_PENDING).count(),
-            'approved': tasks.filter(status=Task.STATUS_APPROVED).count(),
-            'rejected': tasks.filter(status=Task.STATUS_REJECTED).count(),
-        }
+        team_id = request.query_params.get('team_id')
+        employee_ids = request.query_params.get('employee_ids')
+        try:
+            if team_id:
+                team_id = int(team_id)
+                if team_id not in team_ids:
+                    raise NotFound("No such team among the teams you manage.")
+                team_ids = [team_id]
+                employees = employees.filter(team_id=team_id)
+            if employee_ids:
+                employee_ids = {int(employee_id) for employee_id in employee_ids.split(',') if employee_id.strip()}
+                employees = employees.filter(id__in=employee_ids)
+        except ValueError:
+            raise ValidationError({'detail': ["team_id and employee_ids must be integers."]})
         
-        # Calculate total hours worked
-        total_hours = tasks.aggregate(total=Sum('hours_spent'))['total'] or 0
+        found = sorted(employees.values_list('id', flat=True))
+        if employee_ids and len(found) != len(employee_ids):
+            raise NotFound("No such employee in your teams.")
         
-        # Get most used tags
-        tags_data = {}
-        for task in tasks:
-            for tag in task.tags:
-                if tag in tags_data:
-                    tags_data[tag] += 1
-                else:
-                    tags_data[tag] = 1
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
         
-        # Sort tags by frequency
-        top_tags = sorted(tags_data.items(), key=lambda x: x[1], reverse=True)[:5]
+        if not start_date or not end_date:
+            # Default to current week
+            start_date, end_date = current_week(timezone.now().date())
+        else:
+            try:
+                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+            except ValueError:
+                raise ValidationError({'detail': ["Dates must use the YYYY-MM-DD format."]})
         
         return Response({
-            'employee_id': employee_id,
             'start_date': start_date,
             'end_date': end_date,
-            'daily_stats': stats,
-            'status_counts': status_counts,
-            'total_hours': total_hours,
-            'top_tags': top_tags
+            'results': employee_summaries(found, start_date, end_date, team_ids),
         })
 
 
-class TeamAnalyticsView(views.APIView):
+class TeamAnalyticsView(AdmissionControlMixin, ReplicaReadMixin, views.APIView):
     """View for team analytics (for managers only)."""
     
+    admission_class = 'heavy'
     permission_classes = [permissions.IsAuthenticated, IsManager]
     
     def get(self, request):
@@ -94,124 +124,278 @@ class TeamAnalyticsView(views.APIView):
         
         if not start_date or not end_date:
             # Default to current month
-            today = timezone.now().date()
-            start_date = today.replace(day=1)
-            # End date is the end of the month
-            if today.month == 12:
-                end_date = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
-            else:
-                end_date = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
+            start_date, end_date = current_month(timezone.now().date())
         else:
             start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
         
-        # Get all tasks in date range
-        tasks = Task.objects.filter(task_date__range=[start_date, end_date])
+        return Response(team_summary(start_date, end_date, request.user.managed_team_ids()))
+
+
+class CapacityView(AdmissionControlMixin, ReplicaReadMixin, views.APIView):
+    """
+    View for the hours logged and left under the daily limit per employee
+    and day, for planning work before writing it. Employees get their own
+    capacity; managers get an employee's (``employee_id``), a team's
+    (``team_id``) or their whole teams'.
+    """
+    
+    # One cached grouped query, read while filling in task forms
+    admission_class = 'crud'
+    permission_classes = [permissions.IsAuthenticated]
+    
+    # Longest range accepted, to bound the days returned per employee
+    max_range_days = 92
+    
+    def get_dates(self, request):
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        if not start_date or not end_date:
+            # Default to current week
+            return current_week(timezone.now().date())
+        try:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValidationError({'detail': ["Dates must use the YYYY-MM-DD format."]})
+        if start_date > end_date:
+            raise ValidationError({'start_date': ["Must not be after end_date."]})
+        if (end_date - start_date).days >= self.max_range_days:
+            raise ValidationError({'start_date': [f"Range must be under {self.max_range_days} days."]})
+        return start_date, end_date
+    
+    def get_employees(self, request):
+        user = request.user
+        if not user.is_manager:
+            return [user]
         
-        # Tasks by status
-        status_counts = {
-            'pending': tasks.filter(status=Task.STATUS_PENDING).count(),
-            'approved': tasks.filter(status=Task.STATUS_APPROVED).count(),
-            'rejected': tasks.filter(status=Task.STATUS_REJECTED).count(),
-        }
+        employees = User.objects.managed_by(user)
+        try:
+            team_id = request.query_params.get('team_id')
+            if team_id:
+                team_id = int(team_id)
+                if team_id not in user.managed_team_ids():
+                    raise NotFound("No such team among the teams you manage.")
+                employees = employees.filter(team_id=team_id)
+            employee_id = request.query_params.get('employee_id')
+            if employee_id:
+                employees = employees.filter(id=int(employee_id))
+        except ValueError:
+            raise ValidationError({'detail': ["team_id and employee_id must be integers."]})
         
-        # Hours by employee
-        employee_hours = tasks.values(
-            'user__id', 'user__first_name', 'user__last_name', 'user__email'
-        ).annotate(
-            total_hours=Sum('hours_spent'),
-            task_count=Count('id')
-        ).order_by('-total_hours')
-        
-        # Total hours for the team
-        total_hours = tasks.aggregate(total=Sum('hours_spent'))['total'] or 0
-        
-        # Tasks per day
-        tasks_per_day = tasks.values('task_date').annotate(
-            task_count=Count('id'),
-            total_hours=Sum('hours_spent')
-        ).order_by('task_date')
-        
-        # Get most used tags
-        tags_data = {}
-        for task in tasks:
-            for tag in task.tags:
-                if tag in tags_data:
-                    tags_data[tag] += 1
-                else:
-                    tags_data[tag] = 1
-        
-        # Sort tags by frequency
-        top_tags = sorted(tags_data.items(), key=lambda x: x[1], reverse=True)[:10]
+        employees = list(employees.order_by('email').only('id', 'email', 'first_name', 'last_name', 'team_id'))
+        if employee_id and not employees:
+            raise NotFound("No such employee in your teams.")
+        return employees
+    
+    def get(self, request):
+        start_date, end_date = self.get_dates(request)
+        user = request.user
         
-        return Response({
-            'start_date': start_date,
-            'end_date': end_date,
-            'status_counts': status_counts,
-            'employee_hours': employee_hours,
-            'total_hours': total_hours,
-            'tasks_per_day': tasks_per_day,
-            'top_tags': top_tags,
-            'pending_approval_count': status_counts['pending']
-        })
+        # Cached until a user or task is written
+        cache_key = versioned_cache_key(
+            'capacity',
+            (USERS, TASKS),
+            '-'.join(map(str, sorted(user.managed_team_ids()))) if user.is_manager else f'user-{user.id}',
+            request.query_params.get('team_id', ''),
+            request.query_params.get('employee_id', ''),
+            start_date,
+            end_date,
+        )
+        data = cache.get(cache_key)
+        cache_lookup('capacity', data is not None)
+        if data is None:
+            data = {
+                'start_date': start_date,
+                'end_date': end_date,
+                'daily_limit': DAILY_HOURS_LIMIT,
+                'results': daily_capacity(self.get_employees(request), start_date, end_date),
+            }
+            cache.set(cache_key, data, settings.CAPACITY_CACHE_SECONDS)
+        return Response(data)
 
 
-class ExportTasksView(views.APIView):
+class ExportTasksView(AdmissionControlMixin, ReplicaReadMixin, views.APIView):
     """View for exporting tasks data as CSV."""
     
+    admission_class = 'heavy'
     permission_classes = [permissions.IsAuthenticated, IsManager]
     
     def get(self, request):
-        # Get filters from query params
-        status_filter = request.query_params.get('status')
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-        tag = request.query_params.get('tag')
-        employee_id = request.query_params.get('employee_id')
+        # Start with the tasks of the manager's teams
+        queryset = filter_tasks(
+            Task.objects.visible_to(request.user),
+            request.query_params,
+            request.user,
+            default_ordering=['task_date', 'user__email'],
+        )
         
-        # Start with all tasks
-        queryset = Task.objects.all().order_by('task_date', 'user__email')
+        # Pin the database now: rows are read while the response streams,
+        # after the view (and its replica routing) has returned.
+        tasks = queryset.select_related('user').using(read_db_alias()).iterator(chunk_size=2000)
         
-        # Apply filters
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
+        # Create streaming CSV response
+        response = StreamingHttpResponse(stream_csv(tasks), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="tasks_export.csv"'
+        return response
+
+
+class ImportTasksView(AdmissionControlMixin, views.APIView):
+    """
+    View for importing tasks from a CSV in the export format (for managers
+    only). Posting the file again with the same key resumes an interrupted
+    import after its last committed line.
+    """
+    
+    admission_class = 'heavy'
+    permission_classes = [permissions.IsAuthenticated, IsManager]
+    parser_classes = [MultiPartParser]
+    
+    def post(self, request):
+        upload = request.data.get('file')
+        if not upload or isinstance(upload, str):
+            raise ValidationError({'file': ["A CSV file is required."]})
+        key = request.data.get('key') or uuid.uuid4().hex
+        if len(key) > 64:
+            raise ValidationError({'key': ["Must be at most 64 characters."]})
         
-        if start_date:
-            queryset = queryset.filter(task_date__gte=start_date)
+        task_import, created = TaskImport.objects.get_or_create(
+            created_by=request.user, key=key, defaults={'file_name': upload.name[:255]}
+        )
+        try:
+            TaskImporter(task_import, manager=request.user).run(upload)
+        except ImportFormatError as e:
+            raise ValidationError({'file': [str(e)]})
+        except ImportConflict as e:
+            return Response({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
         
-        if end_date:
-            queryset = queryset.filter(task_date__lte=end_date)
+        return Response(
+            TaskImportSerializer(task_import).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+
+class ClosedPeriodListCreateView(AdmissionControlMixin, generics.ListCreateAPIView):
+    """
+    View for listing and closing periods of the manager's teams. Closing
+    freezes the period's tasks and snapshots its analytics.
+    """
+    
+    admission_class = 'heavy'
+    serializer_class = ClosedPeriodSerializer
+    permission_classes = [permissions.IsAuthenticated, IsManager]
+    
+    def get_queryset(self):
+        return ClosedPeriod.objects.filter(
+            team_id__in=self.request.user.managed_team_ids()
+        ).select_related('closed_by')
+    
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        try:
+            serializer.instance = close_period(
+                data['team'].id, data['start_date'], data['end_date'], closed_by=self.request.user
+            )
+        except PeriodNotClosable as e:
+            raise ValidationError({'detail': [str(e)]})
+
+
+class TimeSeriesAnalyticsView(AdmissionControlMixin, ReplicaReadMixin, views.APIView):
+    """
+    View for dense time series of logged hours and task counts by day,
+    week, month, quarter or year (for managers only).
+    """
+    
+    permission_classes = [permissions.IsAuthenticated, IsManager]
+    admission_class = 'heavy'
+    
+    # Longest range accepted, to bound the arrays loaded per request
+    max_range_days = 3 * 366
+    
+    def get(self, request):
+        if np is None:
+            return Response(
+                {"detail": "Time series analytics require NumPy to be installed."},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        
+        granularity = request.query_params.get('granularity', 'week')
+        if granularity not in GRANULARITIES:
+            raise ValidationError({'granularity': [f"Must be one of: {', '.join(GRANULARITIES)}."]})
         
-        if tag:
-            queryset = queryset.filter(tags__contains=[tag])
+        # Default to the last twelve months
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        try:
+            if end_date:
+                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+            else:
+                end_date = timezone.now().date()
+            if start_date:
+                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValidationError({'detail': ["Dates must use the YYYY-MM-DD format."]})
+        if not start_date:
+            start_date = end_date - timedelta(days=364)
+        if start_date > end_date:
+            raise ValidationError({'start_date': ["Must not be after end_date."]})
+        if (end_date - start_date).days >= self.max_range_days:
+            raise ValidationError({'start_date': [f"Range must be under {self.max_range_days} days."]})
         
+        tasks = Task.objects.visible_to(request.user)
+        employee_id = request.query_params.get('employee_id')
         if employee_id:
-            queryset = queryset.filter(user_id=employee_id)
+            try:
+                employee_id = int(employee_id)
+            except ValueError:
+                raise ValidationError({'employee_id': ["A valid integer is required."]})
+            if not User.objects.managed_by(request.user).filter(id=employee_id).exists():
+                raise NotFound("No such employee in your teams.")
+            tasks = tasks.filter(user_id=employee_id)
         
-        # Create CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="tasks_export.csv"'
+        compare = request.query_params.get('compare') == 'previous'
+        heatmap = request.query_params.get('heatmap', '').lower() in ('1', 'true', 'yes')
+        data = build_timeseries(tasks, start_date, end_date, granularity, compare, heatmap)
         
-        # Create CSV writer
-        writer = csv.writer(response)
-        writer.writerow([
-            'ID', 'Date', 'Employee', 'Title', 'Description', 
-            'Hours', 'Tags', 'Status', 'Feedback', 'Created At'
-        ])
-        
-        # Add task data
-        for task in queryset:
-            writer.writerow([
-                task.id,
-                task.task_date,
-                task.user.email,
-                task.title,
-                task.description,
-                task.hours_spent,
-                ', '.join(task.tags),
-                task.status,
-                task.feedback or '',
-                task.created_at.strftime('%Y-%m-%d %H:%M:%S')
-            ])
+        if heatmap:
+            users = User.objects.in_bulk(data['heatmap']['employee_ids'])
+            data['heatmap']['employees'] = [
+                {
+                    'id': user_id,
+                    'email': users[user_id].email,
+                    'name': f"{users[user_id].first_name} {users[user_id].last_name}",
+                }
+                for user_id in data['heatmap']['employee_ids'] if user_id in users
+            ]
         
-        return response
+        return Response(data)
+
+
+class DashboardBootstrapView(AdmissionControlMixin, ReplicaReadMixin, views.APIView):
+    """
+    View returning everything the dashboard needs on first load: profile,
+    team roster (managers only), current period summary, pending approval
+    count and the first page of tasks.
+    """
+    
+    admission_class = 'heavy'
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        user = request.user
+        today = timezone.now().date()
+        
+        parts = {
+            'summary': lambda: period_summary(user, today),
+            'pending_approval_count': lambda: pending_approval_count(user),
+            'tasks': lambda: first_task_page(user, request),
+        }
+        if user.is_manager:
+            # Load the team ids once, before the parts share the user
+            user.managed_team_ids()
+            parts['team'] = lambda: team_roster_page(today, user)
+        
+        return Response({
+            'profile': UserSerializer(user).data,
+            **run_parts(parts)
+        })
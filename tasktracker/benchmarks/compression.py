@@ -0,0 +1,120 @@
+"""
+Benchmark response compression on task export payloads.
+
+Renders an export CSV with the same code as ExportTasksView, then compresses
+it with every available encoder at several levels, both as one buffer and
+as a stream of flushed chunks (as CompressionMiddleware does for streaming
+responses). Reports CPU time against bytes saved.
+
+Usage (from the tasktracker directory):
+
+    python benchmarks/compression.py [--rows 20000] [--from-db]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tasktracker.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from analytics.export import EXPORT_CHUNK_ROWS, stream_csv  # noqa: E402
+from tasks.models import Task  # noqa: E402
+from tasktracker.compression import ENCODERS, compress_sequence  # noqa: E402
+from users.models import User  # noqa: E402
+
+LEVELS = {'gzip': [1, 6, 9], 'br': [1, 4, 5, 8], 'zstd': [1, 3, 6, 12]}
+
+WORDS = (
+    'review fix implement refactor meeting client backend frontend api deploy '
+    'test bug feature sprint planning documentation migration report sync '
+    'design database support onboarding performance query endpoint'
+).split()
+TAGS = ['development', 'frontend', 'backend', 'meeting', 'review', 'support', 'qa', 'ops']
+
+
+def synthetic_tasks(rows, employees=50, seed=1):
+    """Build unsaved tasks shaped like real timesheet entries."""
+    rng = random.Random(seed)
+    users = [
+        User(id=i, email=f'employee{i}@example.com', first_name='Emp', last_name=str(i))
+        for i in range(1, employees + 1)
+    ]
+    start = date(2024, 1, 1)
+    tasks = []
+    for i in range(1, rows + 1):
+        status = rng.choice([Task.STATUS_APPROVED] * 6 + [Task.STATUS_PENDING] * 3 + [Task.STATUS_REJECTED])
+        task = Task(
+            id=i,
+            title=' '.join(rng.choices(WORDS, k=rng.randint(2, 6))).capitalize(),
+            description=' '.join(rng.choices(WORDS, k=rng.randint(8, 60))).capitalize() + '.',
+            hours_spent=Decimal(rng.randint(1, 16)) / 2,
+            tags=rng.sample(TAGS, rng.randint(0, 3)),
+            task_date=start + timedelta(days=rng.randint(0, 364)),
+            status=status,
+            feedback='Please add more detail.' if status == Task.STATUS_REJECTED else None,
+            user=rng.choice(users),
+        )
+        task.created_at = datetime(2024, 1, 1, 9) + timedelta(minutes=i)
+        tasks.append(task)
+    return tasks
+
+
+def measure(func):
+    start_cpu = time.process_time()
+    start_wall = time.perf_counter()
+    result = func()
+    return result, time.process_time() - start_cpu, time.perf_counter() - start_wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--from-db', action='store_true',
+                        help="Export tasks from the configured database instead of synthetic ones.")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.from_db:
+        tasks = list(Task.objects.select_related('user').order_by('task_date', 'user__email')[:args.rows])
+    else:
+        tasks = synthetic_tasks(args.rows)
+
+    chunks = [chunk.encode() for chunk in stream_csv(tasks)]
+    payload = b''.join(chunks)
+    print(f"Export payload: {len(tasks)} rows, {len(payload):,} bytes, "
+          f"{len(chunks)} chunks of {EXPORT_CHUNK_ROWS} rows")
+    print(f"Encoders available: {', '.join(ENCODERS)}\n")
+
+    header = f"{'encoding':<6} {'level':>5} {'mode':<9} {'bytes':>11} {'ratio':>6} {'saved':>6} {'cpu ms':>8} {'MB/s':>7} {'KB saved/cpu ms':>16}"
+    print(header)
+    print('-' * len(header))
+    for name, encoder_class in ENCODERS.items():
+        for level in LEVELS[name]:
+            modes = {
+                'buffered': lambda: (lambda e: e.compress(payload) + e.finish())(encoder_class(level)),
+                'streaming': lambda: b''.join(compress_sequence(encoder_class(level), chunks)),
+            }
+            for mode, func in modes.items():
+                best_cpu = None
+                for _ in range(args.repeat):
+                    compressed, cpu, _wall = measure(func)
+                    best_cpu = cpu if best_cpu is None else min(best_cpu, cpu)
+                saved = len(payload) - len(compressed)
+                cpu_ms = max(best_cpu * 1000, 1e-3)
+                print(f"{name:<6} {level:>5} {mode:<9} {len(compressed):>11,} "
+                      f"{len(payload) / len(compressed):>6.1f} {saved / len(payload):>6.1%} "
+                      f"{cpu_ms:>8.1f} {len(payload) / 1e6 / (cpu_ms / 1000):>7.1f} "
+                      f"{saved / 1024 / cpu_ms:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,589 @@
+"""
+End-to-end load generator for the api_v1 routes.
+
+Starts the app on a scratch database (or targets a running deployment with
+--url), signs in a pool of employees and managers and runs each of them as
+an asyncio client with its own keep-alive connection. Employees create,
+edit, list and delete tasks and read their summaries; managers work the
+approval queue, approve and reject, open analytics and the roster, and now
+and then export. Reports throughput, p50/p95/p99 latency, error rates and
+SQLite "database is locked" errors per route.
+
+--saturate ramps the number of clients step by step until the p95 latency
+or error rate SLO is breached, and reports the last step that met it.
+
+Requests over the admission control budgets are counted as 429s, not
+errors. Lock errors are recognised in the body of 500 responses, so they
+are only seen when the server runs with DEBUG (as the local server does).
+
+Usage (from the tasktracker directory):
+
+    python benchmarks/loadgen.py [--users 50] [--duration 60] [--profile mixed]
+    python benchmarks/loadgen.py --saturate [--slo-p95-ms 500] [--slo-error-rate 0.01]
+    python benchmarks/loadgen.py --url http://127.0.0.1:8000 --users 20
+    python benchmarks/loadgen.py --server-cmd "gunicorn tasktracker.wsgi -w 4 -b 127.0.0.1:{port}"
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+from urllib.parse import urlsplit
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+API_PREFIX = '/api/v1/'
+PASSWORD = 'loadgen-password-1'
+
+# Share of clients that are managers and the relative weight of each action
+PROFILES = {
+    'mixed': {
+        'managers': 0.15,
+        'employee': {
+            'create_task': 30, 'edit_task': 15, 'list_tasks': 25, 'task_detail': 5,
+            'delete_task': 3, 'weekly_summary': 10, 'bootstrap': 12,
+        },
+        'manager': {
+            'approval_queue': 20, 'approve': 25, 'reject': 8, 'list_tasks': 12,
+            'team_analytics': 10, 'timeseries': 5, 'roster': 8, 'bootstrap': 10, 'export': 2,
+        },
+    },
+    'write-heavy': {
+        'managers': 0.2,
+        'employee': {'create_task': 50, 'edit_task': 30, 'delete_task': 5, 'list_tasks': 15},
+        'manager': {'approval_queue': 20, 'approve': 55, 'reject': 25},
+    },
+    'read-heavy': {
+        'managers': 0.25,
+        'employee': {'list_tasks': 40, 'task_detail': 10, 'weekly_summary': 25, 'bootstrap': 20, 'create_task': 5},
+        'manager': {
+            'list_tasks': 20, 'approval_queue': 15, 'team_analytics': 25, 'timeseries': 10,
+            'roster': 15, 'bootstrap': 12, 'export': 3,
+        },
+    },
+}
+
+WORDS = (
+    'review fix implement refactor meeting client backend frontend api deploy '
+    'test bug feature sprint planning documentation migration report sync'
+).split()
+TAGS = ['development', 'frontend', 'backend', 'meeting', 'review', 'support', 'qa', 'ops']
+
+
+class HttpConnection:
+    """A minimal HTTP/1.1 client over one keep-alive connection."""
+
+    def __init__(self, host, port, accept_encoding):
+        self.host = host
+        self.port = port
+        self.accept_encoding = accept_encoding
+        self.reader = self.writer = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, token=None):
+        """Send a request and return (status, body bytes)."""
+        payload = b'' if body is None else json.dumps(body).encode()
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            'Connection: keep-alive',
+            f'Accept-Encoding: {self.accept_encoding}',
+            f'Content-Length: {len(payload)}',
+        ]
+        if body is not None:
+            lines.append('Content-Type: application/json')
+        if token:
+            lines.append(f'Authorization: Bearer {token}')
+        request = ('\r\n'.join(lines) + '\r\n\r\n').encode() + payload
+
+        for attempt in range(2):
+            reused = self.writer is not None
+            if not reused:
+                await self._connect()
+            try:
+                self.writer.write(request)
+                await self.writer.drain()
+                return await self._read_response()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                # Only a reused connection may have been closed by the server while idle
+                if not reused or attempt:
+                    raise
+
+    async def _read_response(self):
+        status_line = await self.reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+                chunks.append(chunk[:-2])
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            body = await self.reader.read()
+            self.close()
+
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        if headers.get('content-encoding') == 'gzip':
+            body = zlib.decompress(body, 31)
+        return status, body
+
+
+class Stats:
+    """Latencies and outcomes per route."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.outcomes = defaultdict(lambda: defaultdict(int))
+        self.started = time.perf_counter()
+        self.stopped = None
+
+    def record(self, route, status, seconds, body=b''):
+        self.latencies[route].append(seconds)
+        outcome = self.outcomes[route]
+        if status is None:
+            outcome['failed'] += 1
+        elif status == 429:
+            outcome['429'] += 1
+        elif status >= 500:
+            outcome['5xx'] += 1
+            if b'database is locked' in body:
+                outcome['locked'] += 1
+        elif status >= 400:
+            outcome['4xx'] += 1
+
+    def stop(self):
+        self.stopped = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return (self.stopped or time.perf_counter()) - self.started
+
+    def summary(self, routes=None):
+        """Return (requests, rps, p50, p95, p99 in ms, error rate, outcomes) over routes."""
+        routes = list(self.latencies) if routes is None else routes
+        latencies = sorted(value for route in routes for value in self.latencies[route])
+        outcomes = defaultdict(int)
+        for route in routes:
+            for key, count in self.outcomes[route].items():
+                outcomes[key] += count
+        count = len(latencies)
+        errors = outcomes['5xx'] + outcomes['failed']
+        return {
+            'requests': count,
+            'rps': count / self.elapsed if self.elapsed else 0.0,
+            'p50': percentile(latencies, 50) * 1000,
+            'p95': percentile(latencies, 95) * 1000,
+            'p99': percentile(latencies, 99) * 1000,
+            'error_rate': errors / count if count else 0.0,
+            **{key: outcomes[key] for key in ('4xx', '429', '5xx', 'failed', 'locked')},
+        }
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def print_report(stats, title):
+    header = (f"{'route':<34} {'reqs':>7} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'4xx':>5} {'429':>5} {'5xx':>5} {'locked':>6} {'err %':>6}")
+    print(f"\n{title} ({stats.elapsed:.1f}s)")
+    print(header)
+    print('-' * len(header))
+    rows = [(route, stats.summary([route])) for route in sorted(stats.latencies)]
+    rows.append(('TOTAL', stats.summary()))
+    for route, row in rows:
+        print(f"{route:<34} {row['requests']:>7} {row['rps']:>7.1f} {row['p50']:>8.1f} {row['p95']:>8.1f} "
+              f"{row['p99']:>8.1f} {row['4xx']:>5} {row['429']:>5} {row['5xx'] + row['failed']:>5} "
+              f"{row['locked']:>6} {row['error_rate']:>6.1%}")
+
+
+class VirtualUser:
+    """One signed-in employee or manager issuing requests in a loop."""
+
+    def __init__(self, index, role, connection, rng):
+        self.index = index
+        self.role = role
+        self.email = f'loadgen-{role}{index}@example.com'
+        self.http = connection
+        self.rng = rng
+        self.token = None
+        self.user_id = None
+        self.own_tasks = []
+
+    async def call(self, stats, route, method, path, body=None):
+        start = time.perf_counter()
+        try:
+            status, content = await self.http.request(method, API_PREFIX + path, body, self.token)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            self.http.close()
+            status, content = None, b''
+        if stats is not None:
+            stats.record(route, status, time.perf_counter() - start, content)
+        return status, content
+
+    async def sign_in(self):
+        """Log in, registering the account first if it does not exist yet."""
+        credentials = {'email': self.email, 'password': PASSWORD}
+        status, content = await self.call(None, 'login', 'POST', 'auth/login/', credentials)
+        if status != 200:
+            await self.call(None, 'register', 'POST', 'auth/register/', {
+                **credentials,
+                'password_confirm': PASSWORD,
+                'first_name': 'Load',
+                'last_name': f'{self.role.capitalize()} {self.index}',
+                'role': self.role,
+            })
+            status, content = await self.call(None, 'login', 'POST', 'auth/login/', credentials)
+        if status != 200:
+            raise RuntimeError(f"Could not sign in {self.email}: HTTP {status}")
+        data = json.loads(content)
+        self.token = data['access']
+        self.user_id = data['user']['id']
+
+    async def run(self, stats, actions, shared, stop, think_ms):
+        names = list(actions)
+        weights = [actions[name] for name in names]
+        while not stop.is_set():
+            action = getattr(self, f'do_{self.rng.choices(names, weights)[0]}')
+            await action(stats, shared)
+            if think_ms:
+                try:
+                    await asyncio.wait_for(stop.wait(), self.rng.expovariate(1000 / think_ms))
+                except asyncio.TimeoutError:
+                    pass
+
+    def random_date(self):
+        return (date.today() - timedelta(days=self.rng.randint(0, 365))).isoformat()
+
+    # Employee actions
+
+    async def do_create_task(self, stats, shared):
+        status, content = await self.call(stats, 'POST tasks/', 'POST', 'tasks/', {
+            'title': ' '.join(self.rng.choices(WORDS, k=3)).capitalize(),
+            'description': ' '.join(self.rng.choices(WORDS, k=20)).capitalize() + '.',
+            'hours_spent': str(self.rng.choice([0.5, 1, 1.5])),
+            'tags': self.rng.sample(TAGS, self.rng.randint(0, 3)),
+            'task_date': self.random_date(),
+        })
+        if status == 201:
+            self.own_tasks.append(json.loads(content)['id'])
+            shared['created'] += 1
+
+    async def do_edit_task(self, stats, shared):
+        if not self.own_tasks:
+            return await self.do_create_task(stats, shared)
+        task_id = self.rng.choice(self.own_tasks)
+        await self.call(stats, 'PATCH tasks/<id>/', 'PATCH', f'tasks/{task_id}/', {
+            'hours_spent': str(self.rng.choice([0.5, 1, 1.5])),
+            'description': ' '.join(self.rng.choices(WORDS, k=20)).capitalize() + '.',
+        })
+
+    async def do_task_detail(self, stats, shared):
+        if not self.own_tasks:
+            return await self.do_list_tasks(stats, shared)
+        await self.call(stats, 'GET tasks/<id>/', 'GET', f'tasks/{self.rng.choice(self.own_tasks)}/')
+
+    async def do_delete_task(self, stats, shared):
+        if not self.own_tasks:
+            return await self.do_create_task(stats, shared)
+        task_id = self.own_tasks.pop(self.rng.randrange(len(self.own_tasks)))
+        await self.call(stats, 'DELETE tasks/<id>/', 'DELETE', f'tasks/{task_id}/')
+
+    async def do_list_tasks(self, stats, shared):
+        query = self.rng.choice(['', '?status=pending', '?status=approved', f'?start_date={self.random_date()}'])
+        await self.call(stats, 'GET tasks/', 'GET', f'tasks/{query}')
+
+    async def do_weekly_summary(self, stats, shared):
+        await self.call(stats, 'GET analytics/employee/weekly/', 'GET', 'analytics/employee/weekly/')
+
+    async def do_bootstrap(self, stats, shared):
+        await self.call(stats, 'GET dashboard/bootstrap/', 'GET', 'dashboard/bootstrap/')
+
+    # Manager actions
+
+    async def do_approval_queue(self, stats, shared):
+        status, content = await self.call(stats, 'GET tasks/approvals/', 'GET', 'tasks/approvals/?limit=50')
+        if status == 200:
+            pending = shared['pending']
+            pending.extend(task['id'] for task in json.loads(content)['results'])
+            # Keep the pool bounded and fresh
+            del pending[:-500]
+
+    async def _review(self, stats, shared, route, suffix, body):
+        if not shared['pending']:
+            return await self.do_approval_queue(stats, shared)
+        pending = shared['pending']
+        task_id = pending.pop(self.rng.randrange(len(pending)))
+        await self.call(stats, route, 'PATCH', f'tasks/{task_id}/{suffix}/', body)
+
+    async def do_approve(self, stats, shared):
+        await self._review(stats, shared, 'PATCH tasks/<id>/approve/', 'approve', {})
+
+    async def do_reject(self, stats, shared):
+        await self._review(stats, shared, 'PATCH tasks/<id>/reject/', 'reject',
+                           {'feedback': 'Please add more detail.'})
+
+    async def do_team_analytics(self, stats, shared):
+        await self.call(stats, 'GET analytics/team/', 'GET', 'analytics/team/')
+
+    async def do_timeseries(self, stats, shared):
+        granularity = self.rng.choice(['day', 'week', 'month'])
+        await self.call(stats, 'GET analytics/timeseries/', 'GET',
+                        f'analytics/timeseries/?granularity={granularity}')
+
+    async def do_roster(self, stats, shared):
+        await self.call(stats, 'GET users/team/?roster=true', 'GET', 'users/team/?roster=true')
+
+    async def do_export(self, stats, shared):
+        start = (date.today() - timedelta(days=30)).isoformat()
+        await self.call(stats, 'GET analytics/export/', 'GET', f'analytics/export/?start_date={start}')
+
+
+class LocalServer:
+    """The app served on a scratch database in a subprocess."""
+
+    def __init__(self, server_cmd, workdir):
+        self.workdir = Path(workdir)
+        self.port = free_port()
+        self.env = {
+            **os.environ,
+            'TASKTRACKER_DB': str(self.workdir / 'loadgen.sqlite3'),
+            'PYTHONUNBUFFERED': '1',
+        }
+        if server_cmd:
+            self.command = shlex.split(server_cmd.format(port=self.port))
+        else:
+            self.command = [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{self.port}', '--noreload']
+        self.log_path = self.workdir / 'server.log'
+        self.process = None
+
+    def start(self, timeout=60):
+        subprocess.run(
+            [sys.executable, 'manage.py', 'migrate', '--verbosity', '0'],
+            cwd=PROJECT_DIR, env=self.env, check=True,
+        )
+        self.log = open(self.log_path, 'w')
+        self.process = subprocess.Popen(
+            self.command, cwd=PROJECT_DIR, env=self.env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited early; see {self.log_path}")
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=0.5).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError(f"Server did not start within {timeout}s; see {self.log_path}")
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.log.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class LoadTest:
+    """A growing pool of virtual users sharing one workload."""
+
+    def __init__(self, host, port, profile, args):
+        self.host = host
+        self.port = port
+        self.profile = PROFILES[profile]
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.users = []
+        self.tasks = []
+        self.shared = {'pending': [], 'created': 0}
+        self.stats = None
+        self.stop = asyncio.Event()
+
+    def _role_counts(self, total):
+        managers = max(1, round(total * self.profile['managers']))
+        return total - managers, managers
+
+    async def grow(self, total):
+        """Sign in new users up to total (untimed) and start their loops."""
+        employees, managers = self._role_counts(total)
+        have = defaultdict(int)
+        for user in self.users:
+            have[user.role] += 1
+        new_users = []
+        for role, wanted in (('employee', employees), ('manager', managers)):
+            for index in range(have[role], wanted):
+                connection = HttpConnection(self.host, self.port, self.args.accept_encoding)
+                new_users.append(VirtualUser(index, role, connection, random.Random(self.rng.random())))
+
+        # Password hashing makes sign-in slow; keep a few in flight at a time
+        gate = asyncio.Semaphore(8)
+
+        async def sign_in(user):
+            async with gate:
+                await user.sign_in()
+
+        await asyncio.gather(*(sign_in(user) for user in new_users))
+        for user in new_users:
+            self.users.append(user)
+            self.tasks.append(asyncio.create_task(user.run(
+                self, self.profile[user.role], self.shared, self.stop, self.args.think_ms,
+            )))
+
+    # VirtualUser.run records into whatever Stats is current
+    def record(self, route, status, seconds, body=b''):
+        if self.stats is not None:
+            self.stats.record(route, status, seconds, body)
+
+    async def measure(self, seconds):
+        """Return the stats of a fresh window of the given length."""
+        self.stats = Stats()
+        await asyncio.sleep(seconds)
+        stats, self.stats = self.stats, None
+        stats.stop()
+        return stats
+
+    async def close(self):
+        self.stop.set()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        for user in self.users:
+            user.http.close()
+
+
+async def run_fixed(test, args):
+    print(f"Signing in {args.users} users...")
+    await test.grow(args.users)
+    if args.warmup:
+        print(f"Warming up for {args.warmup}s...")
+        await test.measure(args.warmup)
+    print(f"Running {args.profile} workload for {args.duration}s...")
+    stats = await test.measure(args.duration)
+    employees, managers = test._role_counts(args.users)
+    print_report(stats, f"{args.profile}: {employees} employees, {managers} managers, "
+                        f"think time {args.think_ms}ms")
+
+
+async def run_saturation(test, args):
+    header = f"{'users':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'429':>6} {'locked':>7} {'err %':>6}  SLO"
+    print(f"Ramping from {args.users} users by {args.step} every {args.step_seconds}s "
+          f"until p95 > {args.slo_p95_ms}ms or errors > {args.slo_error_rate:.1%}\n")
+    print(header)
+    print('-' * len(header))
+
+    users, last_ok, breached = args.users, None, None
+    while users <= args.max_users:
+        await test.grow(users)
+        stats = await test.measure(args.step_seconds)
+        row = stats.summary()
+        ok = row['p95'] <= args.slo_p95_ms and row['error_rate'] <= args.slo_error_rate
+        print(f"{users:>6} {row['rps']:>8.1f} {row['p50']:>8.1f} {row['p95']:>8.1f} {row['p99']:>8.1f} "
+              f"{row['429']:>6} {row['locked']:>7} {row['error_rate']:>6.1%}  {'ok' if ok else 'BREACHED'}")
+        if not ok:
+            breached = stats
+            break
+        last_ok = users
+        users += args.step
+
+    if last_ok is None:
+        print(f"\nSLO breached at the starting concurrency of {args.users} users.")
+    elif breached is None:
+        print(f"\nSLO held up to {last_ok} users (--max-users reached).")
+    else:
+        print(f"\nSLO held up to {last_ok} users and was breached at {users}.")
+    if breached is not None:
+        print_report(breached, f"Per-route breakdown at {users} users")
+
+
+async def run(args):
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        workdir = tempfile.mkdtemp(prefix='tasktracker-loadgen-')
+        server = LocalServer(args.server_cmd, workdir)
+        print(f"Starting server on port {server.port} (database and log in {workdir})...")
+        server.start()
+        host, port = '127.0.0.1', server.port
+
+    test = LoadTest(host, port, args.profile, args)
+    try:
+        if args.saturate:
+            await run_saturation(test, args)
+        else:
+            await run_fixed(test, args)
+    finally:
+        await test.close()
+        if server is not None:
+            server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', help="Target a running server instead of starting one.")
+    parser.add_argument('--server-cmd',
+                        help="Command serving the app, with {port} for the port (default: runserver).")
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='mixed')
+    parser.add_argument('--users', type=int, default=20,
+                        help="Concurrent clients (the starting number with --saturate).")
+    parser.add_argument('--duration', type=float, default=30, help="Measured seconds.")
+    parser.add_argument('--warmup', type=float, default=5, help="Unmeasured seconds before measuring.")
+    parser.add_argument('--think-ms', type=float, default=200,
+                        help="Mean pause between a client's requests (exponential).")
+    parser.add_argument('--accept-encoding', choices=['gzip', 'identity'], default='gzip')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--saturate', action='store_true', help="Ramp clients until the SLO is breached.")
+    parser.add_argument('--step', type=int, default=10)
+    parser.add_argument('--step-seconds', type=float, default=20)
+    parser.add_argument('--max-users', type=int, default=500)
+    parser.add_argument('--slo-p95-ms', type=float, default=500)
+    parser.add_argument('--slo-error-rate', type=float, default=0.01)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark worker cold start with and without warm-up.
+
+Each run starts a fresh interpreter that loads ``tasktracker.wsgi``,
+optionally runs ``tasktracker.warmup.warm_up()``, then times the first
+and second authenticated requests to the task list through the WSGI
+application directly. Reports the median of every measurement, so
+startup time can be tracked from one change to the next.
+
+Usage (from the tasktracker directory):
+
+    python benchmarks/startup.py [--runs 5] [--path /api/v1/tasks/]
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+def child(mode, path, token):
+    """Measure one cold start in this (fresh) interpreter and print it as JSON."""
+    sys.path.insert(0, str(PROJECT_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tasktracker.settings')
+    from wsgiref.util import setup_testing_defaults
+
+    start = time.perf_counter()
+    from tasktracker.wsgi import application
+    result = {'load application': (time.perf_counter() - start) * 1000}
+
+    if mode == 'warm':
+        from tasktracker.warmup import warm_up
+
+        phase = time.perf_counter()
+        report = warm_up()
+        result['warm-up'] = (time.perf_counter() - phase) * 1000
+        result['slowest imports'] = sorted(report['imports'], key=lambda row: row[1], reverse=True)[:5]
+
+    def request():
+        environ = {'PATH_INFO': path, 'HTTP_AUTHORIZATION': f'Bearer {token}', 'wsgi.input': io.BytesIO()}
+        setup_testing_defaults(environ)
+        statuses = []
+        began = time.perf_counter()
+        body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            b''.join(body)
+        finally:
+            body.close()
+        return (time.perf_counter() - began) * 1000, statuses[0]
+
+    result['first request'], status = request()
+    result['second request'], _ = request()
+    result['status'] = status
+    print(json.dumps(result))
+
+
+def prepare_database(workdir):
+    """Create a scratch database with one employee and return an access token for them."""
+    os.environ['TASKTRACKER_DB'] = str(Path(workdir) / 'startup.sqlite3')
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '0'], cwd=PROJECT_DIR, check=True)
+
+    sys.path.insert(0, str(PROJECT_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tasktracker.settings')
+    import django
+
+    django.setup()
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from users.models import User
+
+    user = User.objects.create_user(email='startup@example.com', password='startup', first_name='Start', last_name='Up')
+    return str(RefreshToken.for_user(user).access_token)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/api/v1/tasks/')
+    parser.add_argument('--child', choices=['cold', 'warm'], help=argparse.SUPPRESS)
+    parser.add_argument('--token', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child, args.path, args.token)
+
+    workdir = tempfile.mkdtemp(prefix='tasktracker-startup-')
+    token = prepare_database(workdir)
+
+    results = {'cold': [], 'warm': []}
+    for _ in range(args.runs):
+        for mode in results:
+            output = subprocess.run(
+                [sys.executable, __file__, '--child', mode, '--path', args.path, '--token', token],
+                cwd=PROJECT_DIR, env={**os.environ, 'PYTHONWARNINGS': 'ignore'},
+                check=True, capture_output=True, text=True,
+            ).stdout
+            results[mode].append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"Median of {args.runs} fresh interpreters, GET {args.path} "
+          f"(status {results['cold'][0]['status']})\n")
+    metrics = ['load application', 'warm-up', 'first request', 'second request']
+    print(f"{'':<18} {'cold ms':>9} {'warm ms':>9}")
+    for metric in metrics:
+        cells = []
+        for mode in results:
+            values = [run[metric] for run in results[mode] if metric in run]
+            cells.append(f"{statistics.median(values):>9.1f}" if values else f"{'-':>9}")
+        print(f"{metric:<18} {' '.join(cells)}")
+
+    print("\nSlowest warm-up imports (last run):")
+    for name, ms, new_modules in results['warm'][-1]['slowest imports']:
+        print(f"  {name:<44} {ms:>8.1f} ms {new_modules:>5} modules")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.db.models import Q
+from django.template.response import TemplateResponse
+
+from tasktracker.paginators import EstimatedCountPaginator
+from .models import ClosedPeriod, Task, TaskAuditEntry, TaskImport
+
+
+class RejectionForm(forms.Form):
+    """Feedback for the tasks rejected by the bulk reject action."""
+
+    feedback = forms.CharField(widget=forms.Textarea(attrs={'rows': 4, 'cols': 60}))
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    """
+    Admin for tasks, built for millions of rows: no full counts, one query
+    per changelist page, and only indexed lookups in search.
+    """
+
+    list_display = ['id', 'title', 'user', 'team', 'task_date', 'hours_spent', 'status']
+    list_select_related = ['user', 'team']
+    list_filter = ['status', 'team']
+    date_hierarchy = 'task_date'
+    search_fields = ['id', 'user__email']
+    search_help_text = "Search by task id or the owner's exact email address."
+    autocomplete_fields = ['user']
+    readonly_fields = ['team', 'version', 'created_at', 'updated_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['approve_selected', 'reject_selected']
+
+    def get_search_results(self, request, queryset, search_term):
+        # Exact matches only, which can use the primary key and email indexes
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        query = Q(user__email=search_term)
+        if search_term.isdigit():
+            query |= Q(pk=int(search_term))
+        return queryset.filter(query), False
+
+    @admin.action(description="Approve selected pending tasks")
+    def approve_selected(self, request, queryset):
+        approved = queryset.bulk_transition(Task.STATUS_APPROVED, request.user)
+        self.message_user(request, f"Approved {approved} task(s).", messages.SUCCESS)
+
+    @admin.action(description="Reject selected pending tasks")
+    def reject_selected(self, request, queryset):
+        form = RejectionForm(request.POST if 'feedback' in request.POST else None)
+        if form.is_valid():
+            rejected = queryset.bulk_transition(
+                Task.STATUS_REJECTED, request.user, feedback=form.cleaned_data['feedback'],
+            )
+            self.message_user(request, f"Rejected {rejected} task(s).", messages.SUCCESS)
+            return None
+
+        return TemplateResponse(request, 'admin/tasks/task/reject_selected.html', {
+            **self.admin_site.each_context(request),
+            'title': "Reject selected tasks",
+            'opts': self.model._meta,
+            'form': form,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across') == '1',
+        })
+
+
+@admin.register(TaskAuditEntry)
+class TaskAuditEntryAdmin(admin.ModelAdmin):
+    """Read-only admin for the task audit history."""
+
+    list_display = ['id', 'task_id', 'user_id', 'actor', 'action', 'created_at']
+    list_select_related = ['actor']
+    list_filter = ['action']
+    search_fields = ['task_id', 'user_id']
+    search_help_text = "Search by task id or task owner id."
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if not search_term.isdigit():
+            return queryset.none(), False
+        return queryset.filter(Q(task_id=int(search_term)) | Q(user_id=int(search_term))), False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ClosedPeriod)
+class ClosedPeriodAdmin(admin.ModelAdmin):
+    """
+    Admin listing closed periods. Periods are closed through the API, which
+    takes their snapshots, so they cannot be added here.
+    """
+
+    list_display = ['team', 'start_date', 'end_date', 'closed_by', 'closed_at']
+    list_select_related = ['team', 'closed_by']
+    list_filter = ['team']
+    readonly_fields = ['team', 'start_date', 'end_date', 'closed_by', 'closed_at']
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(TaskImport)
+class TaskImportAdmin(admin.ModelAdmin):
+    """Read-only admin for the progress and errors of CSV imports."""
+
+    list_display = ['key', 'created_by', 'file_name', 'status', 'imported_count', 'error_count', 'updated_at']
+    list_select_related = ['created_by']
+    list_filter = ['status']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,162 @@
+"""
+Write-behind audit history for tasks.
+
+Changes are captured into an in-process buffer once the transaction that
+made them commits, so rolled-back writes leave no history, and written with
+``bulk_create`` when the buffer fills up, every ``AUDIT_FLUSH_INTERVAL``
+seconds and when the process exits. If a batch cannot be written it is
+appended to ``AUDIT_FALLBACK_PATH`` (one JSON entry per line) and replayed
+by the next successful flush. Reads of the history are therefore
+eventually consistent: a change is listed once the process that made it
+has flushed, not as soon as it is made.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import TaskAuditEntry
+
+logger = logging.getLogger(__name__)
+
+# Task fields recorded in the history
+AUDITED_FIELDS = ['title', 'description', 'hours_spent', 'tags', 'task_date', 'status', 'feedback']
+
+
+def _jsonable(value):
+    if isinstance(value, (Decimal, date)):
+        return DjangoJSONEncoder().default(value)
+    return value
+
+
+def snapshot(task, fields=AUDITED_FIELDS):
+    """Return the audited field values of a task, ready for JSON."""
+    return {field: _jsonable(getattr(task, field)) for field in fields if field in task.__dict__}
+
+
+def diff(before, after):
+    """Return {field: [old, new]} for the fields that differ."""
+    return {
+        field: [before.get(field), value]
+        for field, value in after.items()
+        if before.get(field) != value
+    }
+
+
+class AuditBuffer:
+    """Thread-safe buffer of pending audit entries."""
+
+    def __init__(self, max_size, flush_interval, fallback_path):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.fallback_path = str(fallback_path)
+        self._entries = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        # Entries and the timer thread belong to the parent, not forked workers
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._entries = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    def record(self, **fields):
+        """Queue an entry; flushes inline once the buffer is full."""
+        fields.setdefault('created_at', timezone.now())
+        with self._lock:
+            self._entries.append(fields)
+            full = len(self._entries) >= self.max_size
+            self._start_timer()
+        if full:
+            self.flush()
+
+    def _start_timer(self):
+        if self._timer is None and self.flush_interval > 0:
+            self._timer = threading.Thread(target=self._run_timer, name='audit-flush', daemon=True)
+            self._timer.start()
+
+    def _run_timer(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                # Keep flushing: a dead timer would leave entries piling up
+                logger.exception("Periodic audit flush failed")
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Write all buffered entries (and any fallback backlog)."""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._entries = self._entries, []
+            entries = self._take_fallback() + entries
+            if not entries:
+                return 0
+            try:
+                TaskAuditEntry.objects.bulk_create(
+                    [TaskAuditEntry(**entry) for entry in entries],
+                    batch_size=500,
+                )
+            except DatabaseError:
+                logger.exception("Could not write %d audit entries; saving to %s",
+                                 len(entries), self.fallback_path)
+                self._write_fallback(entries)
+                return 0
+            return len(entries)
+
+    def _write_fallback(self, entries):
+        with open(self.fallback_path, 'a', encoding='utf-8') as fallback:
+            for entry in entries:
+                fallback.write(json.dumps(entry, cls=DjangoJSONEncoder) + '\n')
+            fallback.flush()
+            os.fsync(fallback.fileno())
+
+    def _take_fallback(self):
+        # Claim the backlog by renaming it, so only one process replays it
+        claimed = f'{self.fallback_path}.{os.getpid()}'
+        try:
+            os.rename(self.fallback_path, claimed)
+        except FileNotFoundError:
+            return []
+        with open(claimed, encoding='utf-8') as fallback:
+            entries = [json.loads(line) for line in fallback if line.strip()]
+        os.remove(claimed)
+        for entry in entries:
+            entry['created_at'] = parse_datetime(entry['created_at'])
+        return entries
+
+
+audit_buffer = AuditBuffer(
+    max_size=settings.AUDIT_BUFFER_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+    fallback_path=settings.AUDIT_FALLBACK_PATH,
+)
+atexit.register(audit_buffer.flush)
+
+
+def record_task_change(task, action, actor=None, changes=None, task_id=None):
+    """Capture a change to a task into the audit buffer once it commits."""
+    entry = {
+        'task_id': task_id or task.pk,
+        'user_id': task.user_id,
+        'actor_id': getattr(actor, 'pk', None),
+        'action': action,
+        'changes': changes or {},
+        'created_at': timezone.now(),
+    }
+    transaction.on_commit(lambda: audit_buffer.record(**entry))
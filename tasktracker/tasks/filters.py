@@ -0,0 +1,142 @@
+"""
+Task list filters shared by the task list and the CSV export.
+
+The query parameters are validated and normalized by
+``TaskFilterSerializer``, then compiled into conditions of a single query
+on the task table. List parameters accept repeated parameters
+(``status=pending&status=rejected``), comma-separated values
+(``status=pending,rejected``) or both. Invalid parameters are rejected
+with 400 instead of being ignored or reaching the database.
+
+Statuses and employees become ``IN`` lists and dates a range, which the
+indexes on (team, task_date) and the task owner serve. Tags match any or
+all of the given tags. SQLite has no JSON containment lookup, so there they
+are matched against the elements of the tags array with ``json_each``.
+"""
+from decimal import Decimal
+from functools import reduce
+from operator import and_, or_
+
+from django.db import connections
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework import serializers
+
+from .models import Task
+
+TAG_MATCH_ANY = 'any'
+TAG_MATCH_ALL = 'all'
+
+# Orderings a client may choose, each ending with the id so pages are stable
+ORDERINGS = {
+    'task_date': ['task_date', 'id'],
+    '-task_date': ['-task_date', '-id'],
+    'hours_spent': ['hours_spent', 'id'],
+    '-hours_spent': ['-hours_spent', '-id'],
+    'created_at': ['created_at', 'id'],
+    '-created_at': ['-created_at', '-id'],
+    'status': ['status', '-task_date', '-id'],
+    'employee': ['user__email', '-task_date', '-id'],
+}
+
+# Longest lists accepted, to bound the size of the query
+MAX_EMPLOYEES = 200
+MAX_TAGS = 20
+
+
+class CommaSeparatedListField(serializers.ListField):
+    """List field reading repeated and comma-separated query parameters."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = [data]
+        if isinstance(data, (list, tuple)):
+            data = [
+                item.strip()
+                for value in data
+                for item in (value.split(',') if isinstance(value, str) else [value])
+                if not isinstance(item, str) or item.strip()
+            ]
+        values = super().to_internal_value(data)
+        # Drop duplicates, keeping the first occurrence
+        return list(dict.fromkeys(values))
+
+
+class TaskFilterSerializer(serializers.Serializer):
+    """Validates and normalizes the task list query parameters."""
+
+    status = CommaSeparatedListField(
+        child=serializers.ChoiceField(choices=Task.STATUS_CHOICES), required=False,
+    )
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    employee_id = CommaSeparatedListField(
+        child=serializers.IntegerField(min_value=1), required=False, max_length=MAX_EMPLOYEES,
+    )
+    tag = CommaSeparatedListField(
+        child=serializers.CharField(max_length=100), required=False, max_length=MAX_TAGS,
+    )
+    tag_match = serializers.ChoiceField(choices=[TAG_MATCH_ANY, TAG_MATCH_ALL], default=TAG_MATCH_ANY)
+    min_hours = serializers.DecimalField(max_digits=4, decimal_places=2, min_value=Decimal(0), required=False)
+    max_hours = serializers.DecimalField(max_digits=4, decimal_places=2, min_value=Decimal(0), required=False)
+    ordering = serializers.ChoiceField(choices=list(ORDERINGS), required=False)
+
+    def validate(self, data):
+        if data.get('start_date') and data.get('end_date') and data['start_date'] > data['end_date']:
+            raise serializers.ValidationError({'start_date': ["Must not be after end_date."]})
+        if (data.get('min_hours') is not None and data.get('max_hours') is not None
+                and data['min_hours'] > data['max_hours']):
+            raise serializers.ValidationError({'min_hours': ["Must not be more than max_hours."]})
+        return data
+
+
+def tag_condition(tags, match, using):
+    """Return a condition matching tasks with any (or all) of tags."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return reduce(and_ if match == TAG_MATCH_ALL else or_, [Q(tags__contains=[tag]) for tag in tags])
+
+    column = f"{connection.ops.quote_name(Task._meta.db_table)}.{connection.ops.quote_name('tags')}"
+    placeholders = ', '.join(['%s'] * len(tags))
+    if match == TAG_MATCH_ALL:
+        sql = (
+            f"(SELECT COUNT(DISTINCT value) FROM json_each({column}) "
+            f"WHERE value IN ({placeholders})) = {len(tags)}"
+        )
+    else:
+        sql = f"EXISTS (SELECT 1 FROM json_each({column}) WHERE value IN ({placeholders}))"
+    return RawSQL(sql, tags, output_field=BooleanField())
+
+
+def filter_tasks(queryset, query_params, user, default_ordering=None):
+    """
+    Apply the task filters of query_params to a queryset of tasks visible to
+    user, raising ValidationError for invalid parameters. The employee
+    filter only applies to managers, whose querysets span several employees.
+    """
+    serializer = TaskFilterSerializer(data=query_params)
+    serializer.is_valid(raise_exception=True)
+    filters = serializer.validated_data
+
+    conditions = {}
+    if filters.get('status'):
+        conditions['status__in'] = filters['status']
+    if filters.get('start_date'):
+        conditions['task_date__gte'] = filters['start_date']
+    if filters.get('end_date'):
+        conditions['task_date__lte'] = filters['end_date']
+    if filters.get('employee_id') and user.is_manager:
+        conditions['user_id__in'] = filters['employee_id']
+    if filters.get('min_hours') is not None:
+        conditions['hours_spent__gte'] = filters['min_hours']
+    if filters.get('max_hours') is not None:
+        conditions['hours_spent__lte'] = filters['max_hours']
+    queryset = queryset.filter(**conditions)
+
+    if filters.get('tag'):
+        queryset = queryset.filter(tag_condition(filters['tag'], filters['tag_match'], queryset.db))
+
+    ordering = ORDERINGS.get(filters.get('ordering'), default_ordering)
+    if ordering:
+        queryset = queryset.order_by(*ordering)
+    return queryset
@@ -0,0 +1,124 @@
+"""
+``Idempotency-Key`` support for task writes.
+
+A mutating request sent with an ``Idempotency-Key`` header claims the key
+(per user) before it runs, and its response is stored when it finishes.
+A retry with the same key gets the stored response back, marked with
+``Idempotent-Replayed: true``, without validating or writing anything
+again. A duplicate arriving while the first request is still running is
+rejected with 409 and ``Retry-After`` instead of running concurrently, and
+reusing a key for a different request is rejected with 422. Keys expire
+after ``IDEMPOTENCY_KEY_TTL`` seconds (see the ``purge_idempotency_keys``
+command).
+"""
+import hashlib
+
+from rest_framework import permissions, status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+# Responses a retry should not get back: server errors, throttling and
+# conflicts with other writes may well succeed when retried
+UNSTORED_STATUSES = {status.HTTP_409_CONFLICT, status.HTTP_429_TOO_MANY_REQUESTS}
+
+# Seconds a duplicate of a running request is told to wait
+IN_PROGRESS_RETRY_AFTER = 1
+
+
+class IdempotencyKeyInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with this Idempotency-Key is still in progress. Please retry shortly."
+    default_code = 'idempotency_key_in_progress'
+
+    def __init__(self, wait):
+        super().__init__()
+        # Sent as Retry-After by DRF's exception handler
+        self.wait = wait
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was already used for a different request."
+    default_code = 'idempotency_key_reused'
+
+
+class _Replay(Exception):
+    """Ends request processing early with the stored response of a key."""
+
+    def __init__(self, record):
+        self.record = record
+
+
+def request_fingerprint(request):
+    """Hash of what identifies a request: its method, path and body."""
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.get_full_path().encode(), request.body):
+        digest.update(part)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class IdempotencyMixin:
+    """
+    View mixin making mutating requests with an ``Idempotency-Key`` header
+    safe to retry. Requests without the header are unaffected.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        self._idempotency_key = None
+        super().initial(request, *args, **kwargs)
+
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None or request.method in permissions.SAFE_METHODS:
+            return
+        key = key.strip()
+        if not key or len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            raise ValidationError({IDEMPOTENCY_HEADER: ["Must be 1 to 255 characters."]})
+
+        # request.body is read before DRF parses the stream, and kept
+        fingerprint = request_fingerprint(request._request)
+        record, claimed = IdempotencyKey.claim(request.user, key, fingerprint)
+        if claimed:
+            self._idempotency_key = record
+        elif record.fingerprint != fingerprint:
+            raise IdempotencyKeyReused()
+        elif record.status == IdempotencyKey.STATUS_IN_PROGRESS:
+            raise IdempotencyKeyInProgress(wait=IN_PROGRESS_RETRY_AFTER)
+        else:
+            raise _Replay(record)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _Replay):
+            response = Response(exc.record.response_data, status=exc.record.response_status)
+            response[REPLAYED_HEADER] = 'true'
+            return response
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            # Unhandled errors skip finalize_response
+            self._release_idempotency_key()
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if (response.status_code >= 500
+                or response.status_code in UNSTORED_STATUSES
+                or response.streaming):
+            self._release_idempotency_key()
+        else:
+            record = getattr(self, '_idempotency_key', None)
+            if record is not None:
+                self._idempotency_key = None
+                record.complete(response.status_code, response.data)
+        return response
+
+    def _release_idempotency_key(self):
+        record = getattr(self, '_idempotency_key', None)
+        if record is not None:
+            self._idempotency_key = None
+            record.release()
@@ -0,0 +1,73 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.importer import IMPORT_CHUNK_ROWS, ImportConflict, ImportFormatError, TaskImporter
+from tasks.models import TaskImport
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Import tasks from a CSV in the export format."""
+
+    help = (
+        "Import tasks from a CSV in the export format. Running it again with "
+        "the same key resumes the import after its last committed line."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file to import.")
+        parser.add_argument(
+            '--key',
+            help="Identifies the import for resuming (default: the file name).",
+        )
+        parser.add_argument(
+            '--manager',
+            help="Email of a manager: only import into their teams and record them as the actor.",
+        )
+        parser.add_argument(
+            '--chunk-rows',
+            type=int,
+            default=IMPORT_CHUNK_ROWS,
+            help="Rows committed per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        manager = None
+        if options['manager']:
+            try:
+                manager = User.objects.get(email=options['manager'], role=User.ROLE_MANAGER)
+            except User.DoesNotExist:
+                raise CommandError(f"No manager with email {options['manager']}")
+
+        path = options['path']
+        key = options['key'] or os.path.basename(path)
+        task_import, created = TaskImport.objects.get_or_create(
+            created_by=manager, key=key[:64], defaults={'file_name': os.path.basename(path)[:255]}
+        )
+        if not created:
+            self.stdout.write(f"Resuming import {task_import.key!r} after line {task_import.last_line}")
+
+        def report(task_import):
+            self.stdout.write(
+                f"Line {task_import.last_line}: {task_import.imported_count} imported, "
+                f"{task_import.error_count} rejected"
+            )
+
+        importer = TaskImporter(task_import, manager, options['chunk_rows'], on_chunk=report)
+        try:
+            with open(path, 'rb') as csv_file:
+                importer.run(csv_file)
+        except OSError as e:
+            raise CommandError(str(e))
+        except (ImportFormatError, ImportConflict) as e:
+            raise CommandError(f"{e} Committed up to line {task_import.last_line}.")
+
+        for error in task_import.errors:
+            self.stderr.write(f"Line {error['line']}: {' '.join(error['errors'])}")
+        if task_import.error_count > len(task_import.errors):
+            self.stderr.write(f"... and {task_import.error_count - len(task_import.errors)} more")
+        self.stdout.write(
+            f"Import {task_import.key!r} completed: {task_import.imported_count} imported, "
+            f"{task_import.error_count} rejected"
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from tasks.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    """Delete expired idempotency keys."""
+
+    help = "Delete expired idempotency keys. Run it periodically, e.g. hourly from cron."
+
+    def handle(self, *args, **options):
+        deleted = IdempotencyKey.purge_expired()
+        self.stdout.write(f"Deleted {deleted} expired idempotency keys")
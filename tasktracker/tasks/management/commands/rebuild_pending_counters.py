@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from tasks.models import PendingApprovalCounter
+
+
+class Command(BaseCommand):
+    """Recompute the pending approval counters from the task table."""
+
+    help = "Recompute the pending approval counters from the task table."
+
+    def handle(self, *args, **options):
+        total = PendingApprovalCounter.rebuild()
+        self.stdout.write(f"Pending approval counters rebuilt ({total} pending tasks)")
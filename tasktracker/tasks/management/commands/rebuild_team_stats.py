@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from tasks.models import TeamDailyStats
+
+
+class Command(BaseCommand):
+    """Recompute the team daily stats from the task table."""
+
+    help = "Recompute the team daily stats from the task table."
+
+    def handle(self, *args, **options):
+        TeamDailyStats.rebuild()
+        self.stdout.write(f"Team daily stats rebuilt ({TeamDailyStats.objects.count()} rows)")
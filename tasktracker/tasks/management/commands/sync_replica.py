@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasktracker.db_router import REPLICA_DB_ALIAS, replica_configured, sync_replica
+
+
+class Command(BaseCommand):
+    """Copy the primary database into the read replica."""
+
+    help = "Copy the primary SQLite database into the read replica."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help="Keep syncing every N seconds instead of copying once.",
+        )
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError(
+                f"No '{REPLICA_DB_ALIAS}' database configured. "
+                "Set TASKTRACKER_REPLICA_DB to enable the replica."
+            )
+
+        interval = options['interval']
+        while True:
+            started = time.monotonic()
+            try:
+                sync_replica()
+            except ValueError as e:
+                raise CommandError(str(e))
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"Replica synced in {elapsed * 1000:.1f} ms")
+            if interval <= 0:
+                break
+            time.sleep(max(interval - elapsed, 0))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from tasktracker.warmup import format_report, warm_up
+
+
+class Command(BaseCommand):
+    """Run the worker warm-up and report where the time goes."""
+
+    help = "Run the worker warm-up and report where the time goes."
+    # The system checks would import the URLconf before it can be timed
+    requires_system_checks = []
+
+    def handle(self, *args, **options):
+        report = warm_up()
+        self.stdout.write(format_report(report))
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:30
+
+from django.db import migrations, models
+
+
+def build_pending_counters(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    PendingApprovalCounter = apps.get_model('tasks', 'PendingApprovalCounter')
+    
+    pending = Task.objects.filter(status='pending')
+    counters = {'team:all': pending.count()}
+    for row in pending.values('user_id').annotate(total=models.Count('id')).order_by():
+        counters[f"user:{row['user_id']}"] = row['total']
+    PendingApprovalCounter.objects.bulk_create([
+        PendingApprovalCounter(key=key, count=count) for key, count in counters.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingApprovalCounter',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='key')),
+                ('count', models.IntegerField(default=0, verbose_name='count')),
+            ],
+            options={
+                'verbose_name': 'pending approval counter',
+                'verbose_name_plural': 'pending approval counters',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['task_date', 'id'], name='task_pending_queue_idx'),
+        ),
+        migrations.RunPython(build_pending_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0003_task_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskAuditEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField(verbose_name='task id')),
+                ('user_id', models.BigIntegerField(verbose_name='task owner id')),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('deleted', 'Deleted')], max_length=10, verbose_name='action')),
+                ('changes', models.JSONField(default=dict, verbose_name='changes')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+                ('actor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'task audit entry',
+                'verbose_name_plural': 'task audit entries',
+                'indexes': [models.Index(fields=['task_id', 'id'], name='task_audit_task_idx'), models.Index(fields=['user_id', 'id'], name='task_audit_user_idx')],
+            },
+        ),
+    ]
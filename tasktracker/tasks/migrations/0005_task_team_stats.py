@@ -0,0 +1,83 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_task_teams(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    User = apps.get_model('users', 'User')
+    PendingApprovalCounter = apps.get_model('tasks', 'PendingApprovalCounter')
+    TeamDailyStats = apps.get_model('tasks', 'TeamDailyStats')
+    
+    Task.objects.update(
+        team_id=models.Subquery(User.objects.filter(pk=models.OuterRef('user_id')).values('team_id')[:1])
+    )
+    
+    # Replace the company-wide pending counter with per-team counters
+    PendingApprovalCounter.objects.filter(key='team:all').delete()
+    pending = Task.objects.filter(status='pending', team__isnull=False)
+    PendingApprovalCounter.objects.bulk_create([
+        PendingApprovalCounter(key=f"team:{row['team_id']}", count=row['total'])
+        for row in pending.values('team_id').annotate(total=models.Count('id')).order_by()
+    ])
+    
+    rows = Task.objects.filter(team__isnull=False).values(
+        'team_id', 'user_id', 'task_date', 'status'
+    ).annotate(task_count=models.Count('id'), total_hours=models.Sum('hours_spent')).order_by()
+    TeamDailyStats.objects.bulk_create([TeamDailyStats(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0002_team'),
+        ('tasks', '0004_task_audit_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_date', models.DateField(verbose_name='task date')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], max_length=10, verbose_name='status')),
+                ('task_count', models.IntegerField(default=0, verbose_name='task count')),
+                ('total_hours', models.DecimalField(decimal_places=2, default=0, max_digits=8, verbose_name='total hours')),
+            ],
+            options={
+                'verbose_name': 'team daily stats',
+                'verbose_name_plural': 'team daily stats',
+            },
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='team',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='users.team'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['team', 'task_date'], name='task_team_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['team', 'task_date', 'id'], name='task_team_pending_idx'),
+        ),
+        migrations.AddField(
+            model_name='teamdailystats',
+            name='team',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.team'),
+        ),
+        migrations.AddField(
+            model_name='teamdailystats',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='teamdailystats',
+            constraint=models.UniqueConstraint(fields=('team', 'task_date', 'user', 'status'), name='team_daily_stats_unique'),
+        ),
+        migrations.RunPython(fill_task_teams, migrations.RunPython.noop),
+    ]
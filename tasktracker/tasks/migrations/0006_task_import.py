@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0005_task_team_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, verbose_name='key')),
+                ('file_name', models.CharField(blank=True, max_length=255, verbose_name='file name')),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed')], default='running', max_length=10, verbose_name='status')),
+                ('last_line', models.PositiveIntegerField(default=0, verbose_name='last line')),
+                ('imported_count', models.PositiveIntegerField(default=0, verbose_name='imported count')),
+                ('error_count', models.PositiveIntegerField(default=0, verbose_name='error count')),
+                ('errors', models.JSONField(default=list, verbose_name='errors')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'task import',
+                'verbose_name_plural': 'task imports',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='taskimport',
+            constraint=models.UniqueConstraint(fields=('created_by', 'key'), name='task_import_key_unique'),
+        ),
+    ]
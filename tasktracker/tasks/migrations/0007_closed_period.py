@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0002_team'),
+        ('tasks', '0006_task_import'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClosedPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField(verbose_name='start date')),
+                ('end_date', models.DateField(verbose_name='end date')),
+                ('closed_at', models.DateTimeField(auto_now_add=True, verbose_name='closed at')),
+                ('closed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='closed_periods', to='users.team')),
+            ],
+            options={
+                'verbose_name': 'closed period',
+                'verbose_name_plural': 'closed periods',
+                'ordering': ['-start_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PeriodSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField(verbose_name='data')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='tasks.closedperiod')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'period snapshot',
+                'verbose_name_plural': 'period snapshots',
+                'indexes': [models.Index(fields=['user', 'period'], name='period_snapshot_user_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='closedperiod',
+            index=models.Index(fields=['team', 'start_date', 'end_date'], name='closed_period_team_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0008_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['task_date'], name='task_date_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_task_date_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'task_date'], name='task_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0010_task_user_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('namespace', models.CharField(max_length=32, primary_key=True, serialize=False, verbose_name='namespace')),
+                ('version', models.BigIntegerField(default=0, verbose_name='version')),
+            ],
+            options={
+                'verbose_name': 'data version',
+                'verbose_name_plural': 'data versions',
+            },
+        ),
+    ]
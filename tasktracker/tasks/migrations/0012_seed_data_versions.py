@@ -0,0 +1,24 @@
+import time
+
+from django.db import migrations
+
+
+def seed_data_versions(apps, schema_editor):
+    # Created up front, so bumping a version is a single UPDATE
+    DataVersion = apps.get_model('tasks', 'DataVersion')
+    version = int(time.time() * 1000)
+    DataVersion.objects.bulk_create(
+        [DataVersion(namespace=namespace, version=version) for namespace in ('users', 'tasks')],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0011_data_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_data_versions, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,183 @@
-from django.db import models
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 
+from tasktracker.caching import TASKS, bump_data_version
+from .tags import tag_index
+
+
+class TransitionConflict(Exception):
+    """
+    Raised when a conditional task update matched no row: the task was
+    changed (or moved out of the expected status) since it was read.
+    """
+
+
+class PeriodClosed(Exception):
+    """Raised when a task write falls in a closed period."""
+
+
+# Most hours an employee may log on one day, across all their tasks
+DAILY_HOURS_LIMIT = Decimal(8)
+
+
+# Statements adding to the counter columns of many rows at once, inserting
+# the rows that do not exist yet, by database vendor
+UPSERT_ADD_SQL = {
+    'postgresql': "INSERT INTO {table} ({columns}) VALUES {values} ON CONFLICT ({keys}) DO UPDATE SET {updates}",
+    'sqlite': "INSERT INTO {table} ({columns}) VALUES {values} ON CONFLICT ({keys}) DO UPDATE SET {updates}",
+    'mysql': "INSERT INTO {table} ({columns}) VALUES {values} ON DUPLICATE KEY UPDATE {updates}",
+}
+UPSERT_ADD_COLUMN = {
+    'postgresql': "{column} = {table}.{column} + excluded.{column}",
+    'sqlite': "{column} = {table}.{column} + excluded.{column}",
+    'mysql': "{column} = {column} + VALUES({column})",
+}
+
+# Rows per upsert statement, to stay under the databases' parameter limits
+UPSERT_BATCH_SIZE = 100
+
+
+def upsert_add(model, key_fields, counter_fields, rows):
+    """
+    Add to the counter_fields of rows, given as tuples of the key_fields
+    then the counter_fields values, with one statement per batch of rows.
+    Rows that do not exist yet are inserted. Returns False, writing
+    nothing, if the database has no such statement.
+    """
+    connection = connections[router.db_for_write(model)]
+    sql = UPSERT_ADD_SQL.get(connection.vendor)
+    if sql is None:
+        return False
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    fields = [model._meta.get_field(name) for name in (*key_fields, *counter_fields)]
+    keys = ', '.join(quote(field.column) for field in fields[:len(key_fields)])
+    updates = ', '.join(
+        UPSERT_ADD_COLUMN[connection.vendor].format(table=table, column=quote(field.column))
+        for field in fields[len(key_fields):]
+    )
+    row_placeholders = f"({', '.join(['%s'] * len(fields))})"
+    rows = list(rows)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            cursor.execute(sql.format(
+                table=table,
+                columns=', '.join(quote(field.column) for field in fields),
+                values=', '.join([row_placeholders] * len(batch)),
+                keys=keys,
+                updates=updates,
+            ), [field.get_db_prep_save(value, connection) for row in batch for field, value in zip(fields, row)])
+    return True
+
+
+# Statements locking the tasks of a team until the transaction ends, shared
+# (task writes) or exclusive (closing a period), by database vendor. SQLite
+# needs none: a transaction's first write takes the database's only write
+# lock and holds it to the end.
+TEAM_LOCK_SQL = {
+    'postgresql': {
+        False: "SELECT pg_advisory_xact_lock_shared(%s, %s)",
+        True: "SELECT pg_advisory_xact_lock(%s, %s)",
+    },
+}
+
+# First key of the team locks, telling them apart from other advisory locks
+TEAM_LOCK_CLASS = 7301
+
+
+def lock_team_tasks(team_ids, exclusive=False):
+    """
+    Lock the tasks of the given teams until the current transaction ends,
+    so a period of the team is never closed while one of its task writes
+    is in flight. team_ids is only iterated where the database takes the
+    locks. Returns False, locking nothing, if it takes none.
+    """
+    connection = connections[router.db_for_write(Task)]
+    sql = TEAM_LOCK_SQL.get(connection.vendor)
+    if sql is None:
+        return False
+    with connection.cursor() as cursor:
+        # In a fixed order, so two writers never wait on each other
+        for team_id in sorted(set(team_ids) - {None}):
+            cursor.execute(sql[exclusive], [TEAM_LOCK_CLASS, team_id])
+    return True
+
+
+class TaskQuerySet(models.QuerySet):
+    
+    # Tasks updated per UPDATE statement by bulk_transition()
+    TRANSITION_BATCH_SIZE = 500
+    
+    def visible_to(self, user):
+        """Restrict to a user's own tasks, or their teams' tasks for managers."""
+        if user.is_manager:
+            return self.filter(team_id__in=user.managed_team_ids())
+        return self.filter(user_id=user.id)
+    
+    def bulk_transition(self, status, actor=None, **changes):
+        """
+        Move the pending tasks of the queryset that are not in a closed
+        period to status with set-based updates, keeping the pending
+        counters, team daily stats and audit history in step (the UPDATE
+        sends no signals). Returns the number of tasks moved.
+        """
+        from .audit import record_task_change
+        
+        action = {
+            Task.STATUS_APPROVED: TaskAuditEntry.ACTION_APPROVED,
+            Task.STATUS_REJECTED: TaskAuditEntry.ACTION_REJECTED,
+        }[status]
+        now = timezone.now()
+        with transaction.atomic():
+            lock_team_tasks(self.order_by().values_list('team_id', flat=True).distinct())
+            # Locked (where supported) so the counters move exactly the rows updated
+            rows = list(self.filter(status=Task.STATUS_PENDING).exclude(
+                Exists(ClosedPeriod.objects.filter(
+                    team_id=OuterRef('team_id'),
+                    start_date__lte=OuterRef('task_date'),
+                    end_date__gte=OuterRef('task_date'),
+                ))
+            ).order_by().select_for_update().values_list(
+                'pk', 'team_id', 'user_id', 'task_date', 'hours_spent', *changes,
+            ))
+            ids = [row[0] for row in rows]
+            for start in range(0, len(ids), self.TRANSITION_BATCH_SIZE):
+                Task.objects.filter(pk__in=ids[start:start + self.TRANSITION_BATCH_SIZE]).update(
+                    status=status, version=F('version') + 1, updated_at=now, **changes,
+                )
+            
+            pending = {}
+            for _, team_id, user_id, *_ in rows:
+                for key in PendingApprovalCounter.keys_for(user_id, team_id):
+                    pending[key] = pending.get(key, 0) - 1
+            PendingApprovalCounter.add_many(pending)
+            TeamDailyStats.apply_many(
+                [(team_id, user_id, task_date, Task.STATUS_PENDING, hours)
+                 for _, team_id, user_id, task_date, hours, *_ in rows],
+                [(team_id, user_id, task_date, status, hours)
+                 for _, team_id, user_id, task_date, hours, *_ in rows],
+            )
+        
+        if rows:
+            bump_data_version(TASKS)
+        for pk, team_id, user_id, task_date, hours, *old_values in rows:
+            audited = {'status': [Task.STATUS_PENDING, status]}
+            for (field, value), old_value in zip(changes.items(), old_values):
+                audited[field] = [old_value, value]
+            record_task_change(Task(pk=pk, user_id=user_id), action, actor, audited)
+        return len(rows)
+
 
 class Task(models.Model):
     """
@@ -19,6 +193,8 @@ class Task(models.Model):
         (STATUS_REJECTED, 'Rejected'),
     ]
     
+    EDITABLE_STATUSES = [STATUS_PENDING, STATUS_REJECTED]
+    
     title = models.CharField(_('title'), max_length=255)
     description = models.TextField(_('description'))
     hours_spent = models.DecimalField(
@@ -39,12 +215,24 @@ class Task(models.Model):
         default=STATUS_PENDING
     )
     feedback = models.TextField(_('feedback'), null=True, blank=True)
+    # Incremented by every transition, for optimistic concurrency control
+    version = models.PositiveIntegerField(_('version'), default=0)
     
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name='tasks'
     )
+    # Copy of the owner's team, so team-scoped queries need no join
+    team = models.ForeignKey(
+        'users.Team',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,
+        related_name='+'
+    )
     
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
     updated_at = models.DateTimeField(_('updated at'), auto_now=True)
@@ -53,10 +241,65 @@ class Task(models.Model):
         ordering = ['-task_date', '-created_at']
         verbose_name = _('task')
         verbose_name_plural = _('tasks')
+        indexes = [
+            # Approval queue: pending tasks only, oldest first
+            models.Index(
+                fields=['task_date', 'id'],
+                condition=Q(status='pending'),
+                name='task_pending_queue_idx',
+            ),
+            models.Index(fields=['team', 'task_date'], name='task_team_date_idx'),
+            # Employee task lists and the daily hours check
+            models.Index(fields=['user', 'task_date'], name='task_user_date_idx'),
+            # Admin date hierarchy and the default ordering
+            models.Index(fields=['task_date'], name='task_date_idx'),
+            models.Index(
+                fields=['team', 'task_date', 'id'],
+                condition=Q(status='pending'),
+                name='task_team_pending_idx',
+            ),
+        ]
+    
+    objects = TaskQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.title} ({self.task_date})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status to maintain the pending counters
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_stats = instance.stats_entry()
+        instance._loaded_tags = instance.tag_entry()
+        return instance
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.team_id is None:
+            self.team_id = self.user.team_id
+        super().save(*args, **kwargs)
+    
+    def stats_entry(self):
+        """
+        Return what this task adds to TeamDailyStats as (team_id, user_id,
+        task_date, status, hours_spent), or None if a column is not loaded.
+        """
+        values = tuple(
+            self.__dict__.get(field)
+            for field in ('team_id', 'user_id', 'task_date', 'status', 'hours_spent')
+        )
+        return None if None in values[1:] else values
+    
+    def tag_entry(self):
+        """
+        Return what this task adds to the tag index as (team_id, user_id,
+        task_date, tags), or None if a column is not loaded.
+        """
+        values = tuple(self.__dict__.get(field) for field in ('team_id', 'user_id', 'task_date', 'tags'))
+        if None in values[1:]:
+            return None
+        return values[:3] + (tuple(tag for tag in values[3] if isinstance(tag, str)),)
+    
     @property
     def is_pending(self):
         return self.status == self.STATUS_PENDING
@@ -71,42 +314,636 @@ class Task(models.Model):
     
     def can_be_edited(self):
         """Check if task can be edited based on status."""
-        return self.status in [self.STATUS_PENDING, self.STATUS_REJECTED]
+        return self.status in self.EDITABLE_STATUSES
+    
+    def transition(self, from_statuses, expected_version=None, **changes):
+        """
+        Write changes with a single conditional UPDATE that only matches
+        while the task is in one of from_statuses and still at the version
+        it was read at (or expected_version). Only the changed columns are
+        written, in one transaction with the pending counters and team daily
+        stats (one statement each), and cached responses are invalidated once
+        it commits. Raises TransitionConflict if another write got there
+        first.
+        """
+        if expected_version is None:
+            expected_version = self.version
+        now = timezone.now()
+        closed = ClosedPeriod.covering(self.task_date, changes.get('task_date', self.task_date))
+        old_status = getattr(self, '_loaded_status', self.status)
+        old_stats = getattr(self, '_loaded_stats', self.stats_entry())
+        old_tags = getattr(self, '_loaded_tags', self.tag_entry())
+        # The counters and daily stats commit or roll back with the task
+        with transaction.atomic():
+            lock_team_tasks([self.team_id])
+            updated = Task.objects.filter(
+                pk=self.pk,
+                status__in=from_statuses,
+                version=expected_version,
+            ).exclude(
+                # Tasks in (or moved into) a closed period are frozen
+                Exists(ClosedPeriod.objects.filter(closed, team_id=OuterRef('team_id')))
+            ).update(version=F('version') + 1, updated_at=now, **changes)
+            if not updated:
+                if ClosedPeriod.objects.filter(closed, team_id=self.team_id).exists():
+                    raise PeriodClosed(_("The task is in a closed period."))
+                raise TransitionConflict(_("The task was changed by someone else."))
+            
+            for field, value in changes.items():
+                setattr(self, field, value)
+            self.version = expected_version + 1
+            self.updated_at = now
+            self._loaded_status = self.status
+            self._loaded_stats = self.stats_entry()
+            self._loaded_tags = self.tag_entry()
+            task_status_changed(self.user_id, old_status, self.status, self.team_id)
+            TeamDailyStats.apply(old_stats, self._loaded_stats)
+        tag_index.apply(old_tags, self._loaded_tags)
+        bump_data_version(TASKS)
     
-    def approve(self):
+    def approve(self, actor=None):
         """Approve the task."""
+        from .audit import record_task_change
+        
         if not self.is_pending:
             raise ValueError(_("Only pending tasks can be approved."))
-        self.status = self.STATUS_APPROVED
-        self.save()
+        self.transition([self.STATUS_PENDING], status=self.STATUS_APPROVED)
+        record_task_change(self, TaskAuditEntry.ACTION_APPROVED, actor, {
+            'status': [self.STATUS_PENDING, self.STATUS_APPROVED],
+        })
     
-    def reject(self, feedback):
+    def reject(self, feedback, actor=None):
         """Reject the task with feedback."""
+        from .audit import record_task_change
+        
         if not self.is_pending:
             raise ValueError(_("Only pending tasks can be rejected."))
         if not feedback:
             raise ValueError(_("Feedback is required when rejecting a task."))
-        self.status = self.STATUS_REJECTED
-        self.feedback = feedback
-        self.save()
+        old_feedback = self.feedback
+        self.transition([self.STATUS_PENDING], status=self.STATUS_REJECTED, feedback=feedback)
+        record_task_change(self, TaskAuditEntry.ACTION_REJECTED, actor, {
+            'status': [self.STATUS_PENDING, self.STATUS_REJECTED],
+            'feedback': [old_feedback, feedback],
+        })
         
     @classmethod
     def validate_daily_hours(cls, user, task_date, hours_spent, exclude_id=None):
         """
         Validate that total hours spent by user on task_date + new hours_spent
-        does not exceed 8 hours.
+        does not exceed DAILY_HOURS_LIMIT.
         """
         tasks = cls.objects.filter(user=user, task_date=task_date)
         if exclude_id:
             tasks = tasks.exclude(id=exclude_id)
         
-        total_hours = sum(task.hours_spent for task in tasks)
+        total_hours = tasks.aggregate(total=Sum('hours_spent'))['total'] or 0
         new_total = total_hours + hours_spent
         
-        if new_total > 8:
+        if new_total > DAILY_HOURS_LIMIT:
             raise ValueError(_(
-                f"Total hours for {task_date} would exceed 8 hours limit. "
+                f"Total hours for {task_date} would exceed {DAILY_HOURS_LIMIT} hours limit. "
                 f"Current total: {total_hours}, Attempting to add: {hours_spent}"
             ))
         
         return True
+
+
+class PendingApprovalCounter(models.Model):
+    """
+    Number of pending tasks for an employee or a team, kept up to date on
+    every task write so the approval queue can report its size in O(1).
+    """
+    
+    key = models.CharField(_('key'), max_length=64, primary_key=True)
+    count = models.IntegerField(_('count'), default=0)
+    
+    class Meta:
+        verbose_name = _('pending approval counter')
+        verbose_name_plural = _('pending approval counters')
+    
+    def __str__(self):
+        return f"{self.key}: {self.count}"
+    
+    @staticmethod
+    def user_key(user_id):
+        return f'user:{user_id}'
+    
+    @staticmethod
+    def team_key(team_id):
+        return f'team:{team_id}'
+    
+    @classmethod
+    def keys_for(cls, user_id, team_id=None):
+        """Return the counter keys a task owned by user_id counts towards."""
+        if team_id is None:
+            return [cls.user_key(user_id)]
+        return [cls.user_key(user_id), cls.team_key(team_id)]
+    
+    @classmethod
+    def _add_one(cls, key, delta):
+        if not cls.objects.filter(key=key).update(count=F('count') + delta):
+            counter, created = cls.objects.get_or_create(key=key, defaults={'count': delta})
+            if not created:
+                cls.objects.filter(key=key).update(count=F('count') + delta)
+    
+    @classmethod
+    def add_many(cls, deltas):
+        """Add to many counters ({key: delta}) with a single statement."""
+        rows = [(key, delta) for key, delta in deltas.items() if delta]
+        if not upsert_add(cls, ['key'], ['count'], rows):
+            for key, delta in rows:
+                cls._add_one(key, delta)
+    
+    @classmethod
+    def add(cls, key, delta):
+        """Add delta to a single counter."""
+        cls.add_many({key: delta})
+    
+    @classmethod
+    def adjust(cls, user_id, delta, team_id=None):
+        """Add delta to the counters of a task owner."""
+        cls.add_many({key: delta for key in cls.keys_for(user_id, team_id)})
+    
+    @classmethod
+    def get_count(cls, key):
+        """Return the current count for a key."""
+        count = cls.objects.filter(key=key).values_list('count', flat=True).first()
+        return max(count or 0, 0)
+    
+    @classmethod
+    def get_team_count(cls, team_ids):
+        """Return the number of pending tasks across teams."""
+        keys = [cls.team_key(team_id) for team_id in team_ids]
+        count = cls.objects.filter(key__in=keys).aggregate(total=Sum('count'))['total']
+        return max(count or 0, 0)
+    
+    @classmethod
+    def rebuild(cls):
+        """Recompute every counter from the task table. Returns the pending total."""
+        pending = Task.objects.filter(status=Task.STATUS_PENDING)
+        counters = {}
+        total = 0
+        for row in pending.values('user_id').annotate(total=Count('id')).order_by():
+            counters[cls.user_key(row['user_id'])] = row['total']
+            total += row['total']
+        for row in pending.filter(team__isnull=False).values('team_id').annotate(total=Count('id')).order_by():
+            counters[cls.team_key(row['team_id'])] = row['total']
+        
+        cls.objects.all().delete()
+        cls.objects.bulk_create([cls(key=key, count=count) for key, count in counters.items()])
+        return total
+
+
+class TeamDailyStats(models.Model):
+    """
+    Task count and hours per team, employee, day and status, kept up to
+    date on every task write so team analytics read one row per employee
+    and day instead of every task.
+    """
+    team = models.ForeignKey('users.Team', on_delete=models.CASCADE, related_name='+')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    task_date = models.DateField(_('task date'))
+    status = models.CharField(_('status'), max_length=10, choices=Task.STATUS_CHOICES)
+    task_count = models.IntegerField(_('task count'), default=0)
+    total_hours = models.DecimalField(_('total hours'), max_digits=8, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = _('team daily stats')
+        verbose_name_plural = _('team daily stats')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['team', 'task_date', 'user', 'status'],
+                name='team_daily_stats_unique',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.team_id} {self.task_date} {self.user_id} {self.status}"
+    
+    @classmethod
+    def _add_one(cls, team_id, user_id, task_date, status, task_count, hours):
+        rows = cls.objects.filter(team_id=team_id, task_date=task_date, user_id=user_id, status=status)
+        changes = {'task_count': F('task_count') + task_count, 'total_hours': F('total_hours') + hours}
+        if not rows.update(**changes):
+            stats, created = cls.objects.get_or_create(
+                team_id=team_id, task_date=task_date, user_id=user_id, status=status,
+                defaults={'task_count': task_count, 'total_hours': hours},
+            )
+            if not created:
+                rows.update(**changes)
+    
+    @classmethod
+    def add_many(cls, totals):
+        """
+        Add to many stats rows ({(team_id, user_id, task_date, status):
+        (task_count, hours)}) with a single statement.
+        """
+        rows = [(*key, count, hours) for key, (count, hours) in totals.items() if count or hours]
+        if not upsert_add(cls, ['team', 'user', 'task_date', 'status'], ['task_count', 'total_hours'], rows):
+            for row in rows:
+                cls._add_one(*row)
+    
+    @classmethod
+    def apply(cls, old_entry, new_entry):
+        """Move a task's contribution from its old stats entry to its new one."""
+        if old_entry == new_entry:
+            return
+        cls.apply_many([old_entry] if old_entry else [], [new_entry] if new_entry else [])
+    
+    @classmethod
+    def apply_many(cls, old_entries, new_entries):
+        """
+        Move many tasks' contributions from their old stats entries to their
+        new ones, with a single statement.
+        """
+        totals = {}
+        for entries, sign in ((old_entries, -1), (new_entries, 1)):
+            for team_id, user_id, task_date, status, hours in entries:
+                if team_id is None:
+                    continue
+                count, total = totals.get((team_id, user_id, task_date, status), (0, 0))
+                totals[team_id, user_id, task_date, status] = (count + sign, total + sign * hours)
+        cls.add_many(totals)
+    
+    @classmethod
+    def apply_created(cls, entries):
+        """Add the stats entries of many new tasks, with a single statement."""
+        cls.apply_many((), entries)
+    
+    @classmethod
+    def rebuild(cls, **filters):
+        """Recompute the stats, or only those matching filters, from the task table."""
+        rows = Task.objects.filter(team__isnull=False, **filters).values(
+            'team_id', 'user_id', 'task_date', 'status'
+        ).annotate(task_count=Count('id'), total_hours=Sum('hours_spent')).order_by()
+        
+        cls.objects.filter(**filters).delete()
+        cls.objects.bulk_create([cls(**row) for row in rows], batch_size=1000)
+
+
+class ClosedPeriod(models.Model):
+    """
+    A date range of a team's tasks that has been closed: its tasks can no
+    longer be created, edited, approved or rejected, and its analytics are
+    served from the snapshots taken when it was closed.
+    """
+    team = models.ForeignKey('users.Team', on_delete=models.CASCADE, related_name='closed_periods')
+    start_date = models.DateField(_('start date'))
+    end_date = models.DateField(_('end date'))
+    closed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    closed_at = models.DateTimeField(_('closed at'), auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-start_date']
+        verbose_name = _('closed period')
+        verbose_name_plural = _('closed periods')
+        indexes = [
+            models.Index(fields=['team', 'start_date', 'end_date'], name='closed_period_team_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.team_id} {self.start_date} - {self.end_date}"
+    
+    @staticmethod
+    def covering(*task_dates):
+        """Return a Q matching the periods that contain any of task_dates."""
+        query = Q()
+        for task_date in set(task_dates):
+            query |= Q(start_date__lte=task_date, end_date__gte=task_date)
+        return query
+    
+    @classmethod
+    def is_closed(cls, team_id, task_date):
+        """Return True if a team's tasks on task_date are in a closed period."""
+        return cls.objects.filter(cls.covering(task_date), team_id=team_id).exists()
+
+
+class PeriodSnapshot(models.Model):
+    """
+    Analytics of a closed period, computed when it was closed: the team
+    summary (no user) or the summary of one employee.
+    """
+    period = models.ForeignKey(ClosedPeriod, on_delete=models.CASCADE, related_name='snapshots')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    data = models.JSONField(_('data'))
+    
+    class Meta:
+        verbose_name = _('period snapshot')
+        verbose_name_plural = _('period snapshots')
+        indexes = [
+            models.Index(fields=['user', 'period'], name='period_snapshot_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.period} {self.user_id or 'team'}"
+
+
+class TaskAuditEntry(models.Model):
+    """
+    Append-only record of a change to a task. Entries reference the task
+    and its owner by id so the history outlives deleted tasks.
+    """
+    ACTION_CREATED = 'created'
+    ACTION_UPDATED = 'updated'
+    ACTION_APPROVED = 'approved'
+    ACTION_REJECTED = 'rejected'
+    ACTION_DELETED = 'deleted'
+    
+    ACTION_CHOICES = [
+        (ACTION_CREATED, 'Created'),
+        (ACTION_UPDATED, 'Updated'),
+        (ACTION_APPROVED, 'Approved'),
+        (ACTION_REJECTED, 'Rejected'),
+        (ACTION_DELETED, 'Deleted'),
+    ]
+    
+    task_id = models.BigIntegerField(_('task id'))
+    user_id = models.BigIntegerField(_('task owner id'))
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+'
+    )
+    action = models.CharField(_('action'), max_length=10, choices=ACTION_CHOICES)
+    # {field: [old value, new value]}
+    changes = models.JSONField(_('changes'), default=dict)
+    created_at = models.DateTimeField(_('created at'), default=timezone.now)
+    
+    class Meta:
+        verbose_name = _('task audit entry')
+        verbose_name_plural = _('task audit entries')
+        indexes = [
+            models.Index(fields=['task_id', 'id'], name='task_audit_task_idx'),
+            models.Index(fields=['user_id', 'id'], name='task_audit_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.action} task {self.task_id}"
+
+
+class TaskImport(models.Model):
+    """
+    Progress of a bulk CSV import. Saved with every committed chunk of
+    rows, so an interrupted import resumes after its last committed line.
+    """
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+    ]
+    
+    # Chosen by the client; importing again with the same key resumes
+    key = models.CharField(_('key'), max_length=64)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    file_name = models.CharField(_('file name'), max_length=255, blank=True)
+    status = models.CharField(_('status'), max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    # Last CSV line of the last committed chunk
+    last_line = models.PositiveIntegerField(_('last line'), default=0)
+    imported_count = models.PositiveIntegerField(_('imported count'), default=0)
+    error_count = models.PositiveIntegerField(_('error count'), default=0)
+    # [{"line": n, "errors": [...]}] for the first rejected rows
+    errors = models.JSONField(_('errors'), default=list)
+    
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('task import')
+        verbose_name_plural = _('task imports')
+        constraints = [
+            models.UniqueConstraint(fields=['created_by', 'key'], name='task_import_key_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.key} ({self.status}, line {self.last_line})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    A task write made with an ``Idempotency-Key`` header, and its response
+    once the write has finished. Retries with the same key get the stored
+    response until the key expires.
+    """
+    STATUS_IN_PROGRESS = 'in_progress'
+    STATUS_COMPLETED = 'completed'
+    
+    STATUS_CHOICES = [
+        (STATUS_IN_PROGRESS, 'In progress'),
+        (STATUS_COMPLETED, 'Completed'),
+    ]
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    key = models.CharField(_('key'), max_length=255)
+    # Hash of the method, path and body, so a key cannot be reused for another request
+    fingerprint = models.CharField(_('fingerprint'), max_length=64)
+    status = models.CharField(_('status'), max_length=11, choices=STATUS_CHOICES, default=STATUS_IN_PROGRESS)
+    response_status = models.PositiveSmallIntegerField(_('response status'), null=True, blank=True)
+    response_data = models.JSONField(_('response data'), null=True, blank=True, encoder=DjangoJSONEncoder)
+    # An unfinished request is presumed dead after this, and a retry takes over
+    locked_until = models.DateTimeField(_('locked until'))
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+    expires_at = models.DateTimeField(_('expires at'))
+    
+    class Meta:
+        verbose_name = _('idempotency key')
+        verbose_name_plural = _('idempotency keys')
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_key_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_key_expiry_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} {self.key} ({self.status})"
+    
+    @classmethod
+    def claim(cls, user, key, fingerprint):
+        """
+        Claim a key for a request. Returns (record, True) if the caller
+        should perform the request, or (record, False) with the existing
+        record of an earlier request made with the key.
+        """
+        for _attempt in range(2):
+            now = timezone.now()
+            claim = {
+                'fingerprint': fingerprint,
+                'status': cls.STATUS_IN_PROGRESS,
+                'response_status': None,
+                'response_data': None,
+                'locked_until': now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT),
+                'expires_at': now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+            }
+            record = cls.objects.filter(user=user, key=key).first()
+            if record is None:
+                try:
+                    with transaction.atomic():
+                        return cls.objects.create(user=user, key=key, **claim), True
+                except IntegrityError:
+                    # A concurrent duplicate claimed it first
+                    continue
+            
+            abandoned = (
+                record.status == cls.STATUS_IN_PROGRESS
+                and record.locked_until <= now
+                and record.fingerprint == fingerprint
+            )
+            if record.expires_at > now and not abandoned:
+                return record, False
+            # Take over an expired or abandoned key, unless another retry did first
+            taken = cls.objects.filter(
+                pk=record.pk, status=record.status, locked_until=record.locked_until,
+            ).update(**claim)
+            if taken:
+                for field, value in claim.items():
+                    setattr(record, field, value)
+                return record, True
+        return cls.objects.get(user=user, key=key), False
+    
+    def _owned(self):
+        """Match this record only while the claim taken by this request holds."""
+        return IdempotencyKey.objects.filter(
+            pk=self.pk, status=self.STATUS_IN_PROGRESS, locked_until=self.locked_until,
+        )
+    
+    def complete(self, response_status, response_data):
+        """Store the response of the claimed request."""
+        self._owned().update(
+            status=self.STATUS_COMPLETED,
+            response_status=response_status,
+            response_data=response_data,
+        )
+    
+    def release(self):
+        """Give up the claim, so a retry performs the request again."""
+        self._owned().delete()
+    
+    @classmethod
+    def purge_expired(cls):
+        """Delete expired keys and return how many were deleted."""
+        deleted, _ = cls.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+
+class DataVersion(models.Model):
+    """
+    Version of a namespace of cached data (see ``tasktracker.caching``),
+    bumped on every write to it.
+    """
+    
+    namespace = models.CharField(_('namespace'), max_length=32, primary_key=True)
+    version = models.BigIntegerField(_('version'), default=0)
+    
+    class Meta:
+        verbose_name = _('data version')
+        verbose_name_plural = _('data versions')
+    
+    def __str__(self):
+        return f"{self.namespace}: {self.version}"
+
+
+def task_status_changed(user_id, old_status, new_status, team_id=None):
+    """Keep the pending counters in step with a task's status change."""
+    is_pending = new_status == Task.STATUS_PENDING
+    was_pending = old_status == Task.STATUS_PENDING
+    PendingApprovalCounter.adjust(user_id, int(is_pending) - int(was_pending), team_id)
+
+
+@receiver(post_save, sender=Task)
+def update_pending_counters_on_save(sender, instance, created, **kwargs):
+    """Keep the pending counters in step with a saved task."""
+    status = instance.__dict__.get('status')
+    if status is None:
+        # Status was deferred and therefore not written
+        return
+    old_status = None if created else getattr(instance, '_loaded_status', None)
+    task_status_changed(instance.user_id, old_status, status, instance.team_id)
+    instance._loaded_status = status
+
+
+@receiver(post_delete, sender=Task)
+def update_pending_counters_on_delete(sender, instance, **kwargs):
+    """Drop a deleted pending task from the pending counters."""
+    old_status = getattr(instance, '_loaded_status', instance.__dict__.get('status'))
+    task_status_changed(instance.user_id, old_status, None, instance.team_id)
+
+
+@receiver(post_save, sender=Task)
+def update_team_stats_on_save(sender, instance, created, **kwargs):
+    """Keep the team daily stats in step with a saved task."""
+    old_entry = None if created else getattr(instance, '_loaded_stats', None)
+    instance._loaded_stats = instance.stats_entry()
+    TeamDailyStats.apply(old_entry, instance._loaded_stats)
+
+
+@receiver(post_delete, sender=Task)
+def update_team_stats_on_delete(sender, instance, **kwargs):
+    """Drop a deleted task from the team daily stats."""
+    TeamDailyStats.apply(getattr(instance, '_loaded_stats', instance.stats_entry()), None)
+
+
+@receiver(post_save, sender=Task)
+def update_tag_index_on_save(sender, instance, created, **kwargs):
+    """Keep this process's tag index in step with a saved task."""
+    old_entry = None if created else getattr(instance, '_loaded_tags', None)
+    instance._loaded_tags = instance.tag_entry()
+    tag_index.apply(old_entry, instance._loaded_tags)
+
+
+@receiver(post_delete, sender=Task)
+def update_tag_index_on_delete(sender, instance, **kwargs):
+    """Drop a deleted task from this process's tag index."""
+    tag_index.apply(getattr(instance, '_loaded_tags', instance.tag_entry()), None)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def move_tasks_with_user(sender, instance, created, raw=False, **kwargs):
+    """Move a user's tasks, pending counts and stats when they change team."""
+    old_team_id = getattr(instance, '_loaded_team_id', instance.team_id)
+    if created or raw or old_team_id == instance.team_id:
+        return
+    with transaction.atomic():
+        tasks = Task.objects.filter(user_id=instance.pk)
+        tasks.update(team_id=instance.team_id)
+        pending = tasks.filter(status=Task.STATUS_PENDING).count()
+        if pending and old_team_id is not None:
+            PendingApprovalCounter.add(PendingApprovalCounter.team_key(old_team_id), -pending)
+        if pending and instance.team_id is not None:
+            PendingApprovalCounter.add(PendingApprovalCounter.team_key(instance.team_id), pending)
+        TeamDailyStats.rebuild(user_id=instance.pk)
+    instance._loaded_team_id = instance.team_id
+    tag_index.expire()
+    bump_data_version(TASKS)
+
+
+@receiver([post_save, post_delete], sender=Task)
+def invalidate_task_caches(sender, **kwargs):
+    """Invalidate cached responses built from task data."""
+    bump_data_version(TASKS)
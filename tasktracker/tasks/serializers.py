@@ -1,25 +1,159 @@
+from django.db import transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from rest_framework import serializers
+from rest_framework import exceptions, permissions, serializers
 from django.contrib.auth import get_user_model
 
-from .models import Task
+from .audit import diff, record_task_change, snapshot
+from .models import (
+    ClosedPeriod,
+    PeriodClosed,
+    Task,
+    TaskAuditEntry,
+    TaskImport,
+    TransitionConflict,
+    lock_team_tasks,
+)
 
 User = get_user_model()
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskConflict(exceptions.APIException):
+    """The task was changed by another request since the client read it."""
+    
+    status_code = 409
+    default_detail = _("The task was changed by someone else. Reload it and try again.")
+    default_code = 'conflict'
+
+
+def update_task(instance, validated_data, actor):
+    """
+    Write the changed fields of a task with one conditional UPDATE. The
+    client may send the ``version`` it read; otherwise the version the
+    instance was loaded at is expected.
+    """
+    expected_version = validated_data.pop('version', None)
+    changes = {
+        field: value for field, value in validated_data.items()
+        if getattr(instance, field) != value
+    }
+    if not changes and expected_version in (None, instance.version):
+        return instance
+    before = snapshot(instance, changes)
+    try:
+        instance.transition(Task.EDITABLE_STATUSES, expected_version, **changes)
+    except PeriodClosed as e:
+        raise serializers.ValidationError(str(e))
+    except TransitionConflict:
+        raise TaskConflict()
+    record_task_change(
+        instance, TaskAuditEntry.ACTION_UPDATED, actor, diff(before, snapshot(instance, changes))
+    )
+    return instance
+
+
+def validate_open_period(team_id, task_date):
+    """Refuse to create a task in a closed period of the owner's team."""
+    if task_date is not None and ClosedPeriod.is_closed(team_id, task_date):
+        raise serializers.ValidationError(_("Tasks dated %s are in a closed period.") % task_date)
+
+
+def create_task(create, validated_data, actor):
+    """
+    Insert a task with create(validated_data) and record its creation. The
+    closed period check runs in the insert's transaction, under the team's
+    lock and after the insert (which takes SQLite's write lock), so a
+    period closed concurrently either refuses the task or sees it.
+    """
+    team_id = validated_data['user'].team_id
+    with transaction.atomic():
+        lock_team_tasks([team_id])
+        task = create(validated_data)
+        validate_open_period(team_id, task.task_date)
+    record_task_change(task, TaskAuditEntry.ACTION_CREATED, actor, diff({}, snapshot(task)))
+    return task
+
+
+def _split_param(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def sparse_field_names(request, available):
+    """
+    Return the field names selected by ``?fields=`` or ``?omit=`` for a
+    read request, or None when every field should be rendered.
+    """
+    if request is None or request.method not in permissions.SAFE_METHODS:
+        return None
+    
+    fields = _split_param(request.query_params.get('fields', ''))
+    omit = _split_param(request.query_params.get('omit', ''))
+    if not fields and not omit:
+        return None
+    
+    unknown = [name for name in fields + omit if name not in available]
+    if unknown:
+        raise serializers.ValidationError(
+            {'fields': [_("Unknown field(s): %s") % ', '.join(unknown)]}
+        )
+    
+    selected = [name for name in available if name in fields] if fields else list(available)
+    return [name for name in selected if name not in omit]
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin rendering only the fields selected with ``?fields=`` /
+    ``?omit=``. Unrequested method fields are never evaluated, and
+    ``only_columns`` tells views which columns (and joins) to load.
+    """
+    
+    # Model columns read by each field that is not a plain model field
+    field_sources = {}
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = sparse_field_names(self.context.get('request'), list(self.fields))
+        if selected is not None:
+            for name in set(self.fields) - set(selected):
+                self.fields.pop(name)
+    
+    @classmethod
+    def only_columns(cls, request):
+        """Return the columns to pass to ``only()``, or None for all."""
+        selected = sparse_field_names(request, cls.Meta.fields)
+        if selected is None:
+            return None
+        columns = {'id'}
+        for name in selected:
+            for column in cls.field_sources.get(name, [name]):
+                columns.add(column)
+                # A relation traversed with select_related must not be deferred
+                if '__' in column:
+                    columns.add(column.split('__', 1)[0])
+        return sorted(columns)
+
+
+class TaskSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for the Task model."""
     
+    field_sources = {
+        'user_email': ['user__email'],
+        'user_name': ['user__first_name', 'user__last_name'],
+        'can_edit': ['status'],
+    }
+    
     user_email = serializers.SerializerMethodField()
     user_name = serializers.SerializerMethodField()
     can_edit = serializers.SerializerMethodField()
+    version = serializers.IntegerField(required=False, min_value=0)
     
     class Meta:
         model = Task
         fields = [
             'id', 'title', 'description', 'hours_spent', 'tags',
             'task_date', 'status', 'feedback', 'user', 'user_email',
-            'user_name', 'can_edit', 'created_at', 'updated_at'
+            'user_name', 'can_edit', 'version', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'status', 'feedback', 'user', 'created_at', 'updated_at']
     
@@ -58,7 +192,13 @@ class TaskSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         # Set the user to the current user
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
+        validated_data.pop('version', None)
+        # Closed periods are checked here, in the insert's transaction, and
+        # updates by the conditional write
+        return create_task(super().create, validated_data, self.context['request'].user)
+    
+    def update(self, instance, validated_data):
+        return update_task(instance, validated_data, self.context['request'].user)
 
 
 class ManagerTaskAssignmentSerializer(serializers.ModelSerializer):
@@ -68,13 +208,14 @@ class ManagerTaskAssignmentSerializer(serializers.ModelSerializer):
     user_email = serializers.SerializerMethodField(read_only=True)
     user_name = serializers.SerializerMethodField(read_only=True)
     can_edit = serializers.SerializerMethodField(read_only=True)
+    version = serializers.IntegerField(required=False, min_value=0)
     
     class Meta:
         model = Task
         fields = [
             'id', 'title', 'description', 'hours_spent', 'tags',
             'task_date', 'status', 'feedback', 'user', 'user_id', 'user_email',
-            'user_name', 'can_edit', 'created_at', 'updated_at'
+            'user_name', 'can_edit', 'version', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'status', 'feedback', 'user', 'created_at', 'updated_at']
     
@@ -95,7 +236,8 @@ class ManagerTaskAssignmentSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(_("Employee must be selected for task assignment."))
             
         try:
-            assigned_user = User.objects.get(id=user_id, role=User.ROLE_EMPLOYEE)
+            # Managers can only assign tasks within their teams
+            assigned_user = User.objects.managed_by(self.context['request'].user).get(id=user_id)
             self._assigned_user = assigned_user
         except User.DoesNotExist:
             raise serializers.ValidationError(_("Selected employee does not exist."))
@@ -122,12 +264,15 @@ class ManagerTaskAssignmentSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         # Set the user to the assigned employee
         validated_data['user'] = self._assigned_user
-        return super().create(validated_data)
+        validated_data.pop('version', None)
+        # Closed periods are checked here, in the insert's transaction, and
+        # updates by the conditional write
+        return create_task(super().create, validated_data, self.context['request'].user)
     
     def update(self, instance, validated_data):
         # Keep the existing user for updates
         validated_data.pop('user', None)
-        return super().update(instance, validated_data)
+        return update_task(instance, validated_data, self.context['request'].user)
 
 
 class TaskApprovalSerializer(serializers.Serializer):
@@ -140,7 +285,12 @@ class TaskApprovalSerializer(serializers.Serializer):
         return data
     
     def update(self, instance, validated_data):
-        instance.approve()
+        try:
+            instance.approve(actor=self.context['request'].user)
+        except PeriodClosed as e:
+            raise serializers.ValidationError(str(e))
+        except TransitionConflict:
+            raise TaskConflict()
         return instance
 
 
@@ -156,5 +306,58 @@ class TaskRejectionSerializer(serializers.Serializer):
         return data
     
     def update(self, instance, validated_data):
-        instance.reject(validated_data['feedback'])
-        return instance 
\ No newline at end of file
+        try:
+            instance.reject(validated_data['feedback'], actor=self.context['request'].user)
+        except PeriodClosed as e:
+            raise serializers.ValidationError(str(e))
+        except TransitionConflict:
+            raise TaskConflict()
+        return instance 
+
+class TaskAuditEntrySerializer(serializers.ModelSerializer):
+    """Serializer for task audit history entries."""
+    
+    actor_email = serializers.EmailField(source='actor.email', default=None, read_only=True)
+    
+    class Meta:
+        model = TaskAuditEntry
+        fields = [
+            'id', 'task_id', 'user_id', 'actor', 'actor_email',
+            'action', 'changes', 'created_at'
+        ]
+        read_only_fields = fields
+
+
+class TaskImportSerializer(serializers.ModelSerializer):
+    """Serializer for the progress and error report of a task import."""
+    
+    class Meta:
+        model = TaskImport
+        fields = [
+            'id', 'key', 'file_name', 'status', 'last_line', 'imported_count',
+            'error_count', 'errors', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class ClosedPeriodSerializer(serializers.ModelSerializer):
+    """Serializer for closing a period of a team's tasks."""
+    
+    closed_by_email = serializers.EmailField(source='closed_by.email', default=None, read_only=True)
+    
+    class Meta:
+        model = ClosedPeriod
+        fields = ['id', 'team', 'start_date', 'end_date', 'closed_by', 'closed_by_email', 'closed_at']
+        read_only_fields = ['id', 'closed_by', 'closed_at']
+    
+    def validate_team(self, team):
+        if team.id not in self.context['request'].user.managed_team_ids():
+            raise serializers.ValidationError(_("You do not manage this team."))
+        return team
+    
+    def validate(self, data):
+        if data['start_date'] > data['end_date']:
+            raise serializers.ValidationError({'start_date': [_("Must not be after end_date.")]})
+        if data['end_date'] > timezone.now().date():
+            raise serializers.ValidationError({'end_date': [_("Future dates cannot be closed.")]})
+        return data
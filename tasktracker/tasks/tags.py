@@ -0,0 +1,224 @@
+"""
+In-memory tag index for tag autocomplete.
+
+Each worker process keeps, per team, the number of tasks using each tag
+in a dict plus a sorted array of (casefolded tag, tag), so the tags
+starting with a prefix are found with two bisections. Short prefixes
+match too many tags to rank on every keystroke, so their ranking is kept
+until a task write changes the team's tags. The index also remembers the
+last date each user used each tag, to rank their own recent tags first.
+
+The index is built from ``Task.tags`` on first use (or by the warm-up) and
+updated in place by this process's task writes. Other workers' writes
+only move the ``TASKS`` data version, so once the index is older than
+``TAG_INDEX_MAX_AGE`` seconds and the version has moved, it is rebuilt in
+a background thread while the current one keeps answering.
+"""
+import bisect
+import heapq
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from tasktracker.caching import TASKS, get_data_version
+from tasktracker.db_router import replica_reads
+
+logger = logging.getLogger(__name__)
+
+# Sorts after every string starting with a given prefix
+_PREFIX_END = '\U0010ffff'
+
+# Rankings of prefixes up to this long are kept, RANKED_DEPTH tags deep
+RANKED_PREFIX_LENGTH = 2
+RANKED_DEPTH = 100
+
+
+def _rank_key(item):
+    tag, count = item
+    return -count, tag.casefold(), tag
+
+
+class TagIndex:
+    """Thread-safe per-process index of the tags used in each team."""
+
+    def __init__(self):
+        # {team_id: ({tag: task count}, sorted [(casefolded tag, tag)])}
+        self._teams = {}
+        # {user_id: {tag: last task date (ISO)}}
+        self._recent = {}
+        # {sorted team ids: {prefix: [(tag, count)] most used first}}
+        self._ranked = {}
+        self._version = None
+        self._built_at = None
+        self._rebuilding = False
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        # The index is inherited by forked workers, but not the locks' state
+        # or a rebuild thread
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._rebuilding = False
+
+    @staticmethod
+    def _add(teams, team_id, tag, count):
+        tag_counts, entries = teams.setdefault(team_id, ({}, []))
+        total = tag_counts.get(tag, 0) + count
+        entry = (tag.casefold(), tag)
+        if total > 0:
+            if tag not in tag_counts:
+                bisect.insort(entries, entry)
+            tag_counts[tag] = total
+        elif tag in tag_counts:
+            del tag_counts[tag]
+            del entries[bisect.bisect_left(entries, entry)]
+
+    @staticmethod
+    def _used(recent, user_id, task_date, tags):
+        # ISO dates compare like the dates, and unsaved tasks may hold strings
+        task_date = str(task_date)
+        last_used = recent.setdefault(user_id, {})
+        for tag in tags:
+            if task_date > last_used.get(tag, ''):
+                last_used[tag] = task_date
+
+    def apply(self, old_entry, new_entry):
+        """
+        Move a task's tags from old_entry to new_entry, each a
+        Task.tag_entry() or None. Does nothing until the index is built.
+        """
+        if self._built_at is None or old_entry == new_entry:
+            return
+        changes = {}
+        if old_entry is not None:
+            for tag in old_entry[3]:
+                changes[old_entry[0], tag] = changes.get((old_entry[0], tag), 0) - 1
+        if new_entry is not None:
+            for tag in new_entry[3]:
+                changes[new_entry[0], tag] = changes.get((new_entry[0], tag), 0) + 1
+        with self._lock:
+            for (team_id, tag), count in changes.items():
+                if count:
+                    self._add(self._teams, team_id, tag, count)
+                    for team_ids in [team_ids for team_ids in self._ranked if team_id in team_ids]:
+                        del self._ranked[team_ids]
+            if new_entry is not None:
+                team_id, user_id, task_date, tags = new_entry
+                self._used(self._recent, user_id, task_date, tags)
+
+    def rebuild(self):
+        """Build the index from the task table and swap it in."""
+        from .models import Task
+
+        start = time.perf_counter()
+        # Read first, so writes made during the build move it on
+        version = get_data_version(TASKS)
+        counts, recent = {}, {}
+        with replica_reads():
+            rows = Task.objects.order_by().values_list('team_id', 'user_id', 'task_date', 'tags')
+            for team_id, user_id, task_date, tags in rows.iterator(chunk_size=5000):
+                tags = [tag for tag in tags or () if isinstance(tag, str)]
+                if not tags:
+                    continue
+                team_counts = counts.setdefault(team_id, {})
+                for tag in tags:
+                    team_counts[tag] = team_counts.get(tag, 0) + 1
+                self._used(recent, user_id, task_date, tags)
+
+        teams = {
+            team_id: (team_counts, sorted((tag.casefold(), tag) for tag in team_counts))
+            for team_id, team_counts in counts.items()
+        }
+        with self._lock:
+            self._teams, self._recent, self._ranked = teams, recent, {}
+            self._version = version
+            self._built_at = time.monotonic()
+        logger.info("Tag index built in %.1f ms (%d teams)", (time.perf_counter() - start) * 1000, len(teams))
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("Tag index rebuild failed")
+        finally:
+            self._rebuilding = False
+            connections.close_all()
+
+    def expire(self):
+        """Have the next lookup rebuild the index (in the background)."""
+        if self._built_at is not None:
+            self._built_at = float('-inf')
+
+    def ensure_fresh(self):
+        """Build the index on first use, or start a rebuild when it is stale."""
+        if self._built_at is None:
+            with self._build_lock:
+                if self._built_at is None:
+                    self.rebuild()
+            return
+        if self._rebuilding or time.monotonic() - self._built_at < settings.TAG_INDEX_MAX_AGE:
+            return
+        with self._build_lock:
+            if self._rebuilding:
+                return
+            if get_data_version(TASKS) == self._version:
+                # Nothing changed anywhere: check again later
+                self._built_at = time.monotonic()
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild_in_background, name='tag-index', daemon=True).start()
+
+    def _rank(self, team_ids, prefix, depth):
+        """Return the depth most used tags of team_ids starting with prefix."""
+        counts = {}
+        for team_id in team_ids:
+            tag_counts, entries = self._teams.get(team_id, ({}, []))
+            low = bisect.bisect_left(entries, (prefix,))
+            high = bisect.bisect_left(entries, (prefix + _PREFIX_END,), low)
+            for _, tag in entries[low:high]:
+                counts[tag] = counts.get(tag, 0) + tag_counts[tag]
+        return heapq.nsmallest(depth, counts.items(), key=_rank_key)
+
+    def suggest(self, prefix, team_ids, user_id=None, limit=10):
+        """
+        Return up to limit tags of team_ids starting with prefix (case
+        insensitively) as [{'tag', 'count', 'recent'}]. The user's tags used
+        in the last TAG_RECENT_DAYS days come first, then the most used.
+        """
+        self.ensure_fresh()
+        prefix = prefix.casefold()
+        team_ids = tuple(sorted(set(team_ids)))
+        since = (timezone.localdate() - timedelta(days=settings.TAG_RECENT_DAYS)).isoformat()
+        with self._lock:
+            recent = []
+            for tag, last_used in self._recent.get(user_id, {}).items():
+                if last_used > since and tag.casefold().startswith(prefix):
+                    count = sum(self._teams.get(team_id, ({},))[0].get(tag, 0) for team_id in team_ids)
+                    if count:
+                        recent.append((tag, count))
+            recent.sort(key=_rank_key)
+            recent = recent[:limit]
+
+            if len(prefix) <= RANKED_PREFIX_LENGTH:
+                ranked = self._ranked.setdefault(team_ids, {}).get(prefix)
+                if ranked is None:
+                    ranked = self._ranked[team_ids][prefix] = self._rank(team_ids, prefix, RANKED_DEPTH)
+            else:
+                ranked = self._rank(team_ids, prefix, limit + len(recent))
+
+        recent_tags = {tag for tag, _ in recent}
+        others = [item for item in ranked if item[0] not in recent_tags][:limit - len(recent)]
+        return (
+            [{'tag': tag, 'count': count, 'recent': True} for tag, count in recent]
+            + [{'tag': tag, 'count': count, 'recent': False} for tag, count in others]
+        )
+
+tag_index = TagIndex()
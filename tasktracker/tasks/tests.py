@@ -0,0 +1,163 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.db import DatabaseError, transaction
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users.models import User
+from .audit import audit_buffer
+from .models import ClosedPeriod, Task, TaskAuditEntry
+
+
+class TaskMutationQueryCountTests(TestCase):
+    """
+    Every task mutation stays within a fixed query budget: one fetch of the
+    task, scoped to the user in SQL, the checks the write needs, the write
+    with one statement each for the pending counters and daily stats, and
+    the data version bump once the transaction commits.
+    """
+
+    # Queries per mutation. Outside tests the savepoint and its release are
+    # the BEGIN and COMMIT of the request's transaction.
+    QUERY_BUDGETS = {
+        # Daily hours check, savepoint, INSERT, pending counters, daily
+        # stats, closed period check, release, data version bump
+        'create': 8,
+        # Task fetch, daily hours check, savepoint, conditional UPDATE, daily
+        # stats, release, data version bump
+        'update': 7,
+        # Task fetch, savepoint, conditional UPDATE claiming the task, DELETE,
+        # pending counters, daily stats, release, data version bump
+        'delete': 8,
+        # The manager's team ids, task fetch, savepoint, conditional UPDATE,
+        # pending counters, daily stats, release, data version bump
+        'approve': 8,
+        'reject': 8,
+    }
+
+    def setUp(self):
+        # The test runner starts no flush thread, so audit entries stay
+        # buffered: flush them into this test's transaction, which is rolled
+        # back, rather than into a later test
+        self.addCleanup(audit_buffer.flush)
+        caches['admission'].clear()
+
+        self.manager = User.objects.create_user(
+            email='manager@example.com', password='secret', first_name='Mia', last_name='Manager', role='manager',
+        )
+        self.employee = User.objects.create_user(
+            email='employee@example.com', password='secret', first_name='Eli', last_name='Employee',
+        )
+        self.employee_client = APIClient()
+        self.employee_client.force_authenticate(self.employee)
+        self.manager_client = APIClient()
+        self.manager_client.force_authenticate(self.manager)
+
+    def create_task(self):
+        response = self.employee_client.post(reverse('task_list_create'), {
+            'title': 'Write report',
+            'description': 'Quarterly report',
+            'hours_spent': '2.00',
+            'tags': ['reports'],
+            'task_date': '2025-01-06',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response.data['id']
+
+    def test_create(self):
+        with self.assertNumQueries(self.QUERY_BUDGETS['create']), self.captureOnCommitCallbacks(execute=True):
+            self.create_task()
+
+    def test_create_in_closed_period_is_refused(self):
+        ClosedPeriod.objects.create(
+            team_id=self.employee.team_id, start_date=date(2025, 1, 1), end_date=date(2025, 1, 31),
+        )
+        response = self.employee_client.post(reverse('task_list_create'), {
+            'title': 'Write report', 'hours_spent': '2.00', 'task_date': '2025-01-06',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Task.objects.exists())
+    
+    def test_update(self):
+        task_id = self.create_task()
+        with self.assertNumQueries(self.QUERY_BUDGETS['update']), self.captureOnCommitCallbacks(execute=True):
+            response = self.employee_client.patch(
+                reverse('task_detail', args=[task_id]), {'hours_spent': '3.00'}, format='json',
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+
+    def test_delete(self):
+        task_id = self.create_task()
+        with self.assertNumQueries(self.QUERY_BUDGETS['delete']), self.captureOnCommitCallbacks(execute=True):
+            response = self.employee_client.delete(reverse('task_detail', args=[task_id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Task.objects.filter(id=task_id).exists())
+
+    def test_approve(self):
+        task_id = self.create_task()
+        with self.assertNumQueries(self.QUERY_BUDGETS['approve']), self.captureOnCommitCallbacks(execute=True):
+            response = self.manager_client.patch(reverse('task_approve', args=[task_id]), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(Task.objects.get(id=task_id).status, 'approved')
+
+    def test_reject(self):
+        task_id = self.create_task()
+        with self.assertNumQueries(self.QUERY_BUDGETS['reject']), self.captureOnCommitCallbacks(execute=True):
+            response = self.manager_client.patch(
+                reverse('task_reject', args=[task_id]), {'feedback': 'Split this into two tasks'}, format='json',
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(Task.objects.get(id=task_id).status, 'rejected')
+
+    def test_other_employee_cannot_fetch(self):
+        other = User.objects.create_user(
+            email='other@example.com', password='secret', first_name='Oli', last_name='Other',
+        )
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        task_id = self.create_task()
+        with self.assertNumQueries(1):
+            response = other_client.patch(
+                reverse('task_detail', args=[task_id]), {'hours_spent': '3.00'}, format='json',
+            )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TaskAuditTests(TestCase):
+    def setUp(self):
+        self.addCleanup(audit_buffer.flush)
+        self.manager = User.objects.create_user(
+            email='manager@example.com', password='secret', first_name='Mia', last_name='Manager', role='manager',
+        )
+        employee = User.objects.create_user(
+            email='employee@example.com', password='secret', first_name='Eli', last_name='Employee',
+        )
+        self.task = Task.objects.create(
+            user=employee, title='Write report', description='Quarterly report',
+            hours_spent=Decimal('2.00'), task_date=date(2025, 1, 6),
+        )
+        self.task.refresh_from_db()
+
+    def test_change_is_recorded_once_committed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.approve(self.manager)
+        audit_buffer.flush()
+        self.assertEqual(
+            list(TaskAuditEntry.objects.filter(task_id=self.task.pk).values_list('action', flat=True)),
+            [TaskAuditEntry.ACTION_APPROVED],
+        )
+
+    def test_rolled_back_change_is_not_recorded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.task.approve(self.manager)
+                    raise DatabaseError("Simulated failure after the transition")
+            except DatabaseError:
+                pass
+        audit_buffer.flush()
+        self.assertFalse(TaskAuditEntry.objects.filter(task_id=self.task.pk).exists())
@@ -1,14 +1,24 @@
+from datetime import datetime
+
 from django.shortcuts import render
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import F, Q
 from rest_framework import generics, permissions, status
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from django.shortcuts import get_object_or_404
 
-from .models import Task
+from .audit import record_task_change, snapshot
+from .filters import filter_tasks
+from .idempotency import IdempotencyMixin
+from .models import PendingApprovalCounter, Task, TaskAuditEntry
+from .tags import tag_index
 from .serializers import (
+    TaskConflict,
     TaskSerializer,
+    TaskAuditEntrySerializer,
     TaskApprovalSerializer,
     TaskRejectionSerializer,
     ManagerTaskAssignmentSerializer
@@ -18,9 +28,28 @@ from users.permissions import (
     IsTaskOwner,
     IsManagerOrTaskOwner
 )
+from users.models import User
+from tasktracker.db_router import ReplicaReadMixin
+from tasktracker.throttling import AdmissionControlMixin
+
 
+class SparseFieldsetViewMixin:
+    """
+    View mixin loading only the columns (and joins) needed by the fields a
+    read request selected with ``?fields=`` / ``?omit=``.
+    """
+    
+    def narrow_queryset(self, queryset, *required_columns):
+        columns = self.get_serializer_class().only_columns(self.request)
+        if columns is None:
+            # All fields, including the user_* fields, are rendered
+            return queryset.select_related('user')
+        if any(c.startswith('user__') for c in columns):
+            queryset = queryset.select_related('user')
+        return queryset.only(*columns, *required_columns)
 
-class TaskListCreateView(generics.ListCreateAPIView):
+
+class TaskListCreateView(IdempotencyMixin, AdmissionControlMixin, SparseFieldsetViewMixin, ReplicaReadMixin, generics.ListCreateAPIView):
     """View for listing and creating tasks."""
     
     permission_classes = [permissions.IsAuthenticated]
@@ -33,46 +62,36 @@ class TaskListCreateView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         user = self.request.user
-        queryset = Task.objects.all()
-        
-        # Filter by user unless manager is viewing
-        if not user.is_manager:
-            queryset = queryset.filter(user=user)
-        
-        # Apply filters
-        status_filter = self.request.query_params.get('status')
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
-        tag = self.request.query_params.get('tag')
-        employee_id = self.request.query_params.get('employee_id')
-        
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
-        
-        if start_date:
-            queryset = queryset.filter(task_date__gte=start_date)
+        # Employees see their own tasks, managers their teams' tasks
+        queryset = Task.objects.visible_to(user)
         
-        if end_date:
-            queryset = queryset.filter(task_date__lte=end_date)
+        queryset = filter_tasks(queryset, self.request.query_params, user)
         
-        if tag:
-            # Filter tasks with specific tag in the JSONField
-            queryset = queryset.filter(tags__contains=[tag])
-        
-        if employee_id and user.is_manager:
-            queryset = queryset.filter(user_id=employee_id)
-        
-        return queryset
+        return self.narrow_queryset(queryset)
+
+
+class SingleFetchMixin:
+    """
+    View mixin fetching the object at most once per request, even though
+    DRF's update and destroy call ``get_object()`` again.
+    """
+    
+    def get_object(self):
+        if getattr(self, '_object', None) is None:
+            self._object = super().get_object()
+        return self._object
 
 
-class TaskDetailView(generics.RetrieveUpdateDestroyAPIView):
+class TaskDetailView(IdempotencyMixin, AdmissionControlMixin, SparseFieldsetViewMixin, SingleFetchMixin, generics.RetrieveUpdateDestroyAPIView):
     """View for retrieving, updating and deleting tasks."""
     
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated, IsManagerOrTaskOwner]
     
     def get_queryset(self):
-        return Task.objects.all()
+        # Employees only ever see their own tasks, managers their teams' tasks
+        queryset = Task.objects.visible_to(self.request.user)
+        return self.narrow_queryset(queryset, 'user')
     
     def update(self, request, *args, **kwargs):
         task = self.get_object()
@@ -84,15 +103,8 @@ class TaskDetailView(generics.RetrieveUpdateDestroyAPIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Check if user is the task owner or manager
-        if task.user != request.user and not request.user.is_manager:
-            return Response(
-                {"detail": "You can only edit your own tasks."},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
         # For managers editing assigned tasks
-        if request.user.is_manager and task.user != request.user:
+        if request.user.is_manager and task.user_id != request.user.id:
             self.serializer_class = ManagerTaskAssignmentSerializer
         
         return super().update(request, *args, **kwargs)
@@ -107,24 +119,36 @@ class TaskDetailView(generics.RetrieveUpdateDestroyAPIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Check if user is the task owner or manager
-        if task.user != request.user and not request.user.is_manager:
-            return Response(
-                {"detail": "You can only delete your own tasks."},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
         return super().destroy(request, *args, **kwargs)
+    
+    def perform_destroy(self, instance):
+        task_id = instance.pk
+        removed = {field: [value, None] for field, value in snapshot(instance).items()}
+        with transaction.atomic():
+            # Claim the row with a conditional write, which fails if the task
+            # was approved or changed since it was read. Writing first (rather
+            # than SELECT ... FOR UPDATE) also lets SQLite wait for its write
+            # lock instead of failing with "database is locked".
+            claimed = Task.objects.filter(
+                pk=instance.pk, status=Task.STATUS_PENDING, version=instance.version
+            ).update(version=F('version') + 1)
+            if not claimed:
+                raise TaskConflict()
+            super().perform_destroy(instance)
+        record_task_change(
+            instance, TaskAuditEntry.ACTION_DELETED, self.request.user, removed, task_id=task_id
+        )
 
 
-class TaskApproveView(generics.UpdateAPIView):
+class TaskApproveView(IdempotencyMixin, AdmissionControlMixin, generics.UpdateAPIView):
     """View for approving a task."""
     
     serializer_class = TaskApprovalSerializer
     permission_classes = [permissions.IsAuthenticated, IsManager]
     
     def get_queryset(self):
-        return Task.objects.all()
+        # The owner is rendered in the response
+        return Task.objects.visible_to(self.request.user).select_related('user')
     
     def update(self, request, *args, **kwargs):
         task = self.get_object()
@@ -136,14 +160,15 @@ class TaskApproveView(generics.UpdateAPIView):
         return Response(TaskSerializer(task).data)
 
 
-class TaskRejectView(generics.UpdateAPIView):
+class TaskRejectView(IdempotencyMixin, AdmissionControlMixin, generics.UpdateAPIView):
     """View for rejecting a task with feedback."""
     
     serializer_class = TaskRejectionSerializer
     permission_classes = [permissions.IsAuthenticated, IsManager]
     
     def get_queryset(self):
-        return Task.objects.all()
+        # The owner is rendered in the response
+        return Task.objects.visible_to(self.request.user).select_related('user')
     
     def update(self, request, *args, **kwargs):
         task = self.get_object()
@@ -153,3 +178,171 @@ class TaskRejectView(generics.UpdateAPIView):
         
         # Return updated task with TaskSerializer
         return Response(TaskSerializer(task).data)
+
+
+class ApprovalQueueView(AdmissionControlMixin, SparseFieldsetViewMixin, ReplicaReadMixin, generics.GenericAPIView):
+    """
+    View listing pending tasks awaiting approval, oldest first.
+    
+    Pages are fetched by keyset: pass the ``next`` cursor of one page as
+    ``?after=`` to get the following one. ``count`` comes from the pending
+    counters, so it costs a single primary-key lookup.
+    """
+    
+    serializer_class = TaskSerializer
+    permission_classes = [permissions.IsAuthenticated, IsManager]
+    default_limit = 25
+    max_limit = 200
+    
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            raise ValidationError({'limit': ["A valid integer is required."]})
+        return min(max(limit, 1), self.max_limit)
+    
+    def get_employee_id(self):
+        employee_id = self.request.query_params.get('employee_id')
+        if not employee_id:
+            return None
+        try:
+            return int(employee_id)
+        except ValueError:
+            raise ValidationError({'employee_id': ["A valid integer is required."]})
+    
+    def get_queryset(self):
+        queryset = Task.objects.visible_to(self.request.user).filter(
+            status=Task.STATUS_PENDING
+        ).order_by('task_date', 'id')
+        
+        employee_id = self.get_employee_id()
+        if employee_id is not None:
+            queryset = queryset.filter(user_id=employee_id)
+        
+        cursor = self.request.query_params.get('after')
+        if cursor:
+            try:
+                task_date, task_id = cursor.split(',')
+                task_date = datetime.strptime(task_date, '%Y-%m-%d').date()
+                task_id = int(task_id)
+            except ValueError:
+                raise ValidationError({'after': ["Invalid cursor."]})
+            queryset = queryset.filter(
+                Q(task_date__gt=task_date) | Q(task_date=task_date, id__gt=task_id)
+            )
+        
+        return self.narrow_queryset(queryset, 'task_date')
+    
+    def get(self, request, *args, **kwargs):
+        limit = self.get_limit()
+        employee_id = self.get_employee_id()
+        tasks = list(self.get_queryset()[:limit + 1])
+        
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = f"{tasks[-1].task_date.isoformat()},{tasks[-1].id}"
+        
+        if employee_id is None:
+            count = PendingApprovalCounter.get_team_count(request.user.managed_team_ids())
+        elif User.objects.managed_by(request.user).filter(id=employee_id).exists():
+            count = PendingApprovalCounter.get_count(PendingApprovalCounter.user_key(employee_id))
+        else:
+            count = 0
+        
+        return Response({
+            'count': count,
+            'next': next_cursor,
+            'results': self.get_serializer(tasks, many=True).data,
+        })
+
+
+class TagAutocompleteView(AdmissionControlMixin, generics.GenericAPIView):
+    """
+    View suggesting tags that start with ``?q=``, from the in-memory tag
+    index of the user's team (or a manager's teams). Tags the employee used
+    recently come first, then the most used ones.
+    """
+    
+    permission_classes = [permissions.IsAuthenticated]
+    default_limit = 10
+    max_limit = 50
+    
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            raise ValidationError({'limit': ["A valid integer is required."]})
+        return min(max(limit, 1), self.max_limit)
+    
+    def get(self, request, *args, **kwargs):
+        user = request.user
+        if user.is_manager:
+            team_ids = user.managed_team_ids()
+            # Rank by the recent tags of the employee work is assigned to
+            user_id = request.query_params.get('employee_id')
+            if user_id:
+                try:
+                    user_id = int(user_id)
+                except ValueError:
+                    raise ValidationError({'employee_id': ["A valid integer is required."]})
+                if not User.objects.managed_by(user).filter(id=user_id).exists():
+                    raise PermissionDenied("You can only view your teams' employees.")
+            else:
+                user_id = None
+        else:
+            team_ids, user_id = [user.team_id], user.id
+        
+        prefix = request.query_params.get('q', '').strip()
+        return Response({
+            'results': tag_index.suggest(prefix, team_ids, user_id, self.get_limit()),
+        })
+
+
+class AuditHistoryPagination(CursorPagination):
+    """Newest-first cursor pagination over the audit history."""
+    
+    page_size = 50
+    ordering = '-id'
+
+
+class TaskHistoryView(generics.ListAPIView):
+    """
+    View for the change history of a task. Managers see the history of their
+    teams' tasks, employees the history of their own tasks.
+    
+    The history is eventually consistent: every process buffers its changes
+    and writes them at least every ``AUDIT_FLUSH_INTERVAL`` seconds, so the
+    latest changes may not be listed yet.
+    """
+    
+    serializer_class = TaskAuditEntrySerializer
+    pagination_class = AuditHistoryPagination
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        entries = TaskAuditEntry.objects.filter(task_id=self.kwargs['pk']).select_related('actor')
+        if self.request.user.is_manager:
+            return entries.filter(user_id__in=User.objects.managed_by(self.request.user).values('id'))
+        return entries.filter(user_id=self.request.user.id)
+
+
+class UserTaskHistoryView(generics.ListAPIView):
+    """
+    View for the change history of all tasks owned by a user. Employees can
+    only see their own. Eventually consistent, like TaskHistoryView.
+    """
+    
+    serializer_class = TaskAuditEntrySerializer
+    pagination_class = AuditHistoryPagination
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        user = self.request.user
+        user_id = self.kwargs['user_id']
+        if user.is_manager:
+            if not User.objects.managed_by(user).filter(id=user_id).exists():
+                raise PermissionDenied("You can only view the history of your teams' tasks.")
+        elif user_id != user.id:
+            raise PermissionDenied("You can only view the history of your own tasks.")
+        return TaskAuditEntry.objects.filter(user_id=user_id).select_related('actor')
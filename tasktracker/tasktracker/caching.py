@@ -0,0 +1,67 @@
+"""
+Version counters for cached API responses.
+
+Cached responses embed the current version of the data they were built
+from in their cache key. Writes bump the version, so stale entries are
+simply never read again and expire on their own.
+
+The versions are rows of ``tasks.DataVersion``, which every worker process
+sees: a bump in one worker invalidates the responses cached by all of
+them, while the responses themselves stay in each process's own cache.
+"""
+import time
+
+from django.db import transaction
+from django.db.models import F
+
+USERS = 'users'
+TASKS = 'tasks'
+
+
+def _initial_version():
+    # Seed from the clock so a counter row that is lost (say, to a restore)
+    # never restarts at a value older cache entries were built with.
+    return int(time.time() * 1000)
+
+
+def get_data_versions(*namespaces):
+    """Return the current version numbers of data namespaces, in one query."""
+    from tasks.models import DataVersion
+
+    versions = dict(DataVersion.objects.filter(namespace__in=namespaces).values_list('namespace', 'version'))
+    return [versions.get(namespace, 0) for namespace in namespaces]
+
+
+def get_data_version(namespace):
+    """Return the current version number of a data namespace."""
+    return get_data_versions(namespace)[0]
+
+
+def bump_data_version(*namespaces):
+    """
+    Invalidate every cached response built from the given namespaces, once
+    the current transaction (if any) commits: bumped any earlier, a response
+    rebuilt from the data as it was before the write could be cached under
+    the new version.
+    """
+    transaction.on_commit(lambda: _bump(namespaces))
+
+
+def _bump(namespaces):
+    from tasks.models import DataVersion
+
+    rows = DataVersion.objects.filter(namespace__in=namespaces)
+    # One atomic UPDATE, so concurrent bumps are never lost
+    if rows.update(version=F('version') + 1) < len(set(namespaces)):
+        DataVersion.objects.bulk_create(
+            [DataVersion(namespace=namespace, version=_initial_version()) for namespace in namespaces],
+            ignore_conflicts=True,
+        )
+        rows.update(version=F('version') + 1)
+
+
+def versioned_cache_key(prefix, namespaces, *parts):
+    """Build a cache key that changes whenever any namespace is bumped."""
+    versions = ':'.join(str(version) for version in get_data_versions(*namespaces))
+    suffix = ':'.join(str(part) for part in parts)
+    return f'{prefix}:{versions}:{suffix}'
@@ -0,0 +1,188 @@
+"""
+Response compression negotiated from ``Accept-Encoding``.
+
+gzip is always available; brotli and zstd are used when the ``brotli`` and
+``zstandard`` packages are installed. Streaming responses are compressed
+chunk by chunk, flushing after each chunk so clients receive data as soon
+as the view yields it.
+"""
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, level):
+        # wbits=31 writes a gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    name = 'zstd'
+
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+def available_encoders():
+    """Return the supported encoders, in server preference order."""
+    encoders = {}
+    if zstandard is not None:
+        encoders[ZstdEncoder.name] = ZstdEncoder
+    if brotli is not None:
+        encoders[BrotliEncoder.name] = BrotliEncoder
+    encoders[GzipEncoder.name] = GzipEncoder
+    return encoders
+
+
+ENCODERS = available_encoders()
+
+_COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/|application/(json|javascript|xml|csv|.*\+json|.*\+xml)|image/svg\+xml)'
+)
+
+
+def negotiate_encoding(accept_encoding, encoders=ENCODERS):
+    """
+    Pick the encoding to use for an ``Accept-Encoding`` header value.
+
+    The client's q-values decide; ties go to the server's preference order.
+    Returns None when no acceptable encoding is supported.
+    """
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        match = re.search(r'q\s*=\s*([0-9.]+)', params)
+        if match:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+
+    best, best_quality = None, 0.0
+    for name in encoders:
+        quality = accepted.get(name, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def compression_level(encoding, content_type):
+    """Return the level for an encoding from COMPRESSION_LEVELS."""
+    levels = settings.COMPRESSION_LEVELS
+    media_type = content_type.split(';')[0].strip().lower()
+    return levels.get(media_type, levels['default'])[encoding]
+
+
+def compress_sequence(encoder, sequence):
+    """Compress an iterable of byte chunks incrementally."""
+    for chunk in sequence:
+        data = encoder.compress(chunk) + encoder.flush()
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with the best encoding the client accepts.
+
+    Skips responses that are already encoded, are not a compressible text
+    type, are smaller than COMPRESSION_MIN_LENGTH or live under one of
+    COMPRESSION_EXCLUDE_PATHS (such as the token endpoints, to keep secrets
+    out of compressed bodies).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if response.has_header('Content-Encoding') or response.status_code in (204, 304):
+            return response
+        content_type = response.get('Content-Type', '')
+        if not _COMPRESSIBLE_TYPES.match(content_type):
+            return response
+        if any(request.path.startswith(path) for path in settings.COMPRESSION_EXCLUDE_PATHS):
+            return response
+
+        # Responses vary on the header even when this one is not compressed
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+        encoder = ENCODERS[encoding](compression_level(encoding, content_type))
+
+        if response.streaming:
+            response.streaming_content = compress_sequence(encoder, response.streaming_content)
+            del response['Content-Length']
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_LENGTH:
+                return response
+            compressed = encoder.compress(response.content) + encoder.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The representation changed, so a strong ETag no longer matches it
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,149 @@
+"""
+Database routing between the primary database and an optional read replica.
+
+Reads go to the ``replica`` alias only while a view has explicitly opted in
+(see ``ReplicaReadMixin``); everything else, and every write, goes to the
+primary. Users who have just written are pinned to the primary for
+``REPLICA_PIN_SECONDS`` so they always read their own writes. The pins are
+rows of ``users.ReplicaPin``, so they hold whichever worker process serves
+the user's next request.
+"""
+import contextvars
+import sqlite3
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+from rest_framework import permissions
+
+REPLICA_DB_ALIAS = 'replica'
+
+# Read to decide what to serve, so never from a lagging copy (nor are the
+# tables of database caches)
+PRIMARY_ONLY_MODELS = {'tasks.dataversion', 'users.replicapin'}
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+def replica_configured():
+    """Return True if a replica database alias is configured."""
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def read_db_alias():
+    """Return the alias reads should currently be sent to."""
+    if _replica_reads.get() and replica_configured():
+        return REPLICA_DB_ALIAS
+    return DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Route ORM reads inside the block to the replica (if configured)."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def pin_to_primary(user):
+    """Send the user's reads to the primary while the replica catches up."""
+    from users.models import ReplicaPin
+
+    pinned_until = timezone.now() + timedelta(seconds=getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+    if not ReplicaPin.objects.filter(user_id=user.pk).update(pinned_until=pinned_until):
+        ReplicaPin.objects.bulk_create([ReplicaPin(user_id=user.pk, pinned_until=pinned_until)], ignore_conflicts=True)
+
+
+def is_pinned_to_primary(user):
+    """Return True if the user wrote recently and must read from the primary."""
+    from users.models import ReplicaPin
+
+    if not (user and user.is_authenticated):
+        return False
+    return ReplicaPin.objects.filter(user_id=user.pk, pinned_until__gt=timezone.now()).exists()
+
+
+class PrimaryReplicaRouter:
+    """Send writes to the primary and opted-in reads to the replica."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower in PRIMARY_ONLY_MODELS or model._meta.app_label == 'django_cache':
+            return DEFAULT_DB_ALIAS
+        return read_db_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of the primary, so objects from either
+        # database may be related to each other.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema from the primary via sync_replica.
+        return db != REPLICA_DB_ALIAS
+
+
+class ReplicaReadMixin:
+    """
+    View mixin that serves safe (read-only) requests from the replica.
+
+    Authentication and permission checks still run against the primary, and
+    users pinned by a recent write keep reading from the primary.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._replica_token = None
+        if (request.method in permissions.SAFE_METHODS
+                and replica_configured()
+                and not is_pinned_to_primary(request.user)):
+            self._replica_token = _replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _replica_reads.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReplicaPinningMiddleware:
+    """Pin users to the primary after a successful write request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        if (request.method not in permissions.SAFE_METHODS
+                and response.status_code < 400
+                and replica_configured()
+                and user is not None and user.is_authenticated):
+            pin_to_primary(user)
+        return response
+
+
+def sync_replica(source_alias=DEFAULT_DB_ALIAS, replica_alias=REPLICA_DB_ALIAS):
+    """
+    Copy the primary SQLite database into the replica file using the
+    SQLite online backup API, which is safe while the primary is in use.
+    """
+    source_settings = connections[source_alias].settings_dict
+    replica_settings = connections[replica_alias].settings_dict
+    for db_settings in (source_settings, replica_settings):
+        if db_settings['ENGINE'] != 'django.db.backends.sqlite3':
+            raise ValueError('sync_replica only supports SQLite databases.')
+
+    source = sqlite3.connect(str(source_settings['NAME']))
+    replica = sqlite3.connect(str(replica_settings['NAME']))
+    try:
+        source.backup(replica)
+    finally:
+        replica.close()
+        source.close()
@@ -0,0 +1,451 @@
+"""
+Prometheus metrics shared by every worker process.
+
+Each process counts into an in-memory registry, holding one lock only for
+a dictionary update, and writes a snapshot to its own file in
+``METRICS_DIR`` every ``METRICS_FLUSH_INTERVAL`` seconds and at exit, once
+``tasktracker.wsgi`` has started serving: management commands and test runs
+leave no files behind. The ``/metrics`` view merges the files of every process, so counters and
+histograms add up across workers with no cross-process locking on the
+request path. Files of exited processes are folded into one archive file
+when metrics are scraped, so their counts are kept but the directory does
+not grow with every recycled worker.
+"""
+import atexit
+import bisect
+import fcntl
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+QUERY_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+ARCHIVE_FILE = 'archive.json'
+LOCK_FILE = '.lock'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Registry:
+    """Counters and histograms of this process, saved to a file of its own."""
+
+    def __init__(self, directory, flush_interval):
+        self.directory = Path(directory)
+        self.flush_interval = flush_interval
+        self.metrics = {}
+        self.serving = False
+        self._reset()
+        # Counts and the flush thread belong to the parent, not forked workers
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # {metric name: {label values: value, or [bucket counts..., sum]}}
+        self._values = {}
+        self._lock = threading.Lock()
+        self._timer = None
+        self._dirty = False
+        self.path = self.directory / f'metrics-{os.getpid()}-{uuid.uuid4().hex[:8]}.json'
+
+    def serve(self):
+        """Save this process's values from now on: periodically and at exit."""
+        if not self.serving:
+            self.serving = True
+            atexit.register(self.flush)
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def inc(self, name, labels, amount):
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + amount
+            self._dirty = True
+            self._start_timer()
+
+    def observe(self, name, labels, bucket, value, bucket_count):
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            counts = series.get(labels)
+            if counts is None:
+                counts = series[labels] = [0] * (bucket_count + 1)
+            counts[bucket] += 1
+            counts[-1] += value
+            self._dirty = True
+            self._start_timer()
+
+    def _start_timer(self):
+        if self._timer is None and self.serving and self.flush_interval > 0:
+            self._timer = threading.Thread(target=self._run_timer, name='metrics-flush', daemon=True)
+            self._timer.start()
+
+    def _run_timer(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def snapshot(self):
+        """Return a JSON-ready copy of this process's values."""
+        with self._lock:
+            return {
+                name: [
+                    [list(labels), list(value) if isinstance(value, list) else value]
+                    for labels, value in series.items()
+                ]
+                for name, series in self._values.items()
+            }
+
+    def flush(self):
+        """Write this process's values to its file (atomically)."""
+        if not self._dirty:
+            return
+        self._dirty = False
+        data = self.snapshot()
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            temporary = self.path.with_suffix('.tmp')
+            temporary.write_text(json.dumps(data))
+            os.replace(temporary, self.path)
+        except OSError:
+            self._dirty = True
+            logger.exception("Could not write metrics to %s", self.path)
+
+    def collect(self):
+        """
+        Return the merged values of every process, with this one's live
+        values instead of its last flushed file.
+        """
+        merged = {}
+        for path in self._compact():
+            if path != self.path:
+                _merge(merged, _read(path))
+        _merge(merged, self.snapshot())
+        return merged
+
+    def _compact(self):
+        """Fold the files of exited processes into the archive; return the files left."""
+        if not self.directory.is_dir():
+            return []
+        with _directory_lock(self.directory):
+            dead = [path for path in self.directory.glob('metrics-*.json') if not _process_alive(path)]
+            if dead:
+                archive = self.directory / ARCHIVE_FILE
+                merged = _merge({}, _read(archive))
+                for path in dead:
+                    _merge(merged, _read(path))
+                temporary = archive.with_suffix('.tmp')
+                temporary.write_text(json.dumps(_as_json(merged)))
+                os.replace(temporary, archive)
+                for path in dead:
+                    path.unlink(missing_ok=True)
+        return sorted(self.directory.glob('metrics-*.json')) + [self.directory / ARCHIVE_FILE]
+
+
+@contextmanager
+def _directory_lock(directory):
+    with open(directory / LOCK_FILE, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _process_alive(path):
+    try:
+        pid = int(path.name.split('-')[1])
+        os.kill(pid, 0)
+    except (IndexError, ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read(path):
+    try:
+        return json.loads(path.read_text())
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError):
+        logger.warning("Skipping unreadable metrics file %s", path, exc_info=True)
+        return {}
+
+
+def _merge(merged, data):
+    """Add the values of a snapshot into merged ({name: {label values: value}})."""
+    for name, series in data.items():
+        target = merged.setdefault(name, {})
+        for labels, value in series:
+            labels = tuple(labels)
+            if isinstance(value, list):
+                current = target.get(labels)
+                target[labels] = list(value) if current is None else [a + b for a, b in zip(current, value)]
+            else:
+                target[labels] = target.get(labels, 0) + value
+    return merged
+
+
+def _as_json(merged):
+    return {name: [[list(labels), value] for labels, value in series.items()] for name, series in merged.items()}
+
+
+registry = Registry(settings.METRICS_DIR, settings.METRICS_FLUSH_INTERVAL)
+
+
+class Counter:
+    """A monotonically increasing count, optionally split by labels."""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def inc(self, amount=1, **labels):
+        registry.inc(self.name, tuple(str(labels[name]) for name in self.labelnames), amount)
+
+
+class Histogram:
+    """Observations counted into cumulative buckets, optionally split by labels."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        registry.register(self)
+
+    def observe(self, value, **labels):
+        registry.observe(
+            self.name,
+            tuple(str(labels[name]) for name in self.labelnames),
+            bisect.bisect_left(self.buckets, value),
+            value,
+            len(self.buckets) + 1,
+        )
+
+
+REQUEST_LATENCY = Histogram(
+    'tasktracker_http_request_duration_seconds',
+    "Time from receiving a request to sending the last byte of its response.",
+    ['route'],
+)
+REQUESTS = Counter(
+    'tasktracker_http_requests_total',
+    "Requests handled, by route, method and status code.",
+    ['route', 'method', 'status'],
+)
+RESPONSE_SIZE = Histogram(
+    'tasktracker_http_response_size_bytes',
+    "Size of response bodies as sent, after compression.",
+    ['route'],
+    SIZE_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'tasktracker_db_queries_per_request',
+    "Database queries run by a request, by view.",
+    ['view'],
+    QUERY_COUNT_BUCKETS,
+)
+DB_QUERY_TIME = Histogram(
+    'tasktracker_db_query_duration_seconds',
+    "Time a request spent in database queries, by view.",
+    ['view'],
+    QUERY_TIME_BUCKETS,
+)
+AUTH_FAILURES = Counter(
+    'tasktracker_auth_failures_total',
+    "Requests rejected with 401 (bad credentials or a missing, invalid or expired token).",
+    ['route'],
+)
+EXPORT_ROWS = Counter('tasktracker_export_rows_total', "Rows written by CSV exports.")
+EXPORT_BYTES = Counter('tasktracker_export_bytes_total', "Bytes of CSV written by exports, before compression.")
+CACHE_REQUESTS = Counter(
+    'tasktracker_cache_requests_total',
+    "Cache lookups, by cache and result (hit or miss).",
+    ['cache', 'result'],
+)
+
+
+def cache_lookup(cache_name, hit):
+    """Count a hit or miss of one of the application's caches."""
+    CACHE_REQUESTS.inc(cache=cache_name, result='hit' if hit else 'miss')
+
+
+_api_routes = None
+
+
+def api_routes():
+    """Return the names of the api_v1 routes, which label request metrics."""
+    global _api_routes
+    if _api_routes is None:
+        from tasktracker.urls import api_v1_patterns
+
+        _api_routes = frozenset(pattern.name for pattern in api_v1_patterns if pattern.name)
+    return _api_routes
+
+
+def route_labels(request):
+    """Return the (route, view) labels of a request; other URLs share one label."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None or match.url_name not in api_routes():
+        return 'other', 'other'
+    view = getattr(match.func, 'view_class', match.func)
+    return match.url_name, view.__name__
+
+
+class RequestMetrics:
+    """Measurements of one request, finished when its last byte is sent."""
+
+    def __init__(self, request):
+        self.request = request
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self.size = 0
+        self._connections = [connections[alias] for alias in connections]
+        for connection in self._connections:
+            connection.execute_wrappers.append(self)
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute wrapper: time every query of the request
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_time += time.perf_counter() - started
+
+    def stream(self, content, response):
+        try:
+            for chunk in content:
+                self.size += len(chunk)
+                yield chunk
+        finally:
+            self.finish(response)
+
+    def detach(self):
+        for connection in self._connections:
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+
+    def finish(self, response):
+        self.detach()
+        route, view = route_labels(self.request)
+        REQUEST_LATENCY.observe(time.perf_counter() - self.started, route=route)
+        REQUESTS.inc(route=route, method=self.request.method, status=response.status_code)
+        RESPONSE_SIZE.observe(self.size, route=route)
+        DB_QUERIES.observe(self.queries, view=view)
+        DB_QUERY_TIME.observe(self.query_time, view=view)
+        if response.status_code == 401:
+            AUTH_FAILURES.inc(route=route)
+
+
+class MetricsMiddleware:
+    """
+    Record latency, response size and database use of every request.
+    Streaming responses are measured when their last chunk has been sent.
+    Queries run in other threads (the dashboard bootstrap parts) are not
+    counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        measurements = RequestMetrics(request)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            measurements.detach()
+            raise
+        if response.streaming:
+            response.streaming_content = measurements.stream(response.streaming_content, response)
+        else:
+            measurements.size = len(response.content)
+            measurements.finish(response)
+        return response
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render(merged):
+    """Render merged values in the Prometheus text exposition format."""
+    # Every api_v1 route has a latency histogram, even before its first request
+    latency = merged.setdefault(REQUEST_LATENCY.name, {})
+    for route in sorted(api_routes()):
+        latency.setdefault((route,), [0] * (len(REQUEST_LATENCY.buckets) + 2))
+
+    lines = []
+    for metric in registry.metrics.values():
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        series = merged.get(metric.name, {})
+        if metric.type == 'counter' and not metric.labelnames and not series:
+            series = {(): 0}
+        for labels, value in sorted(series.items()):
+            if metric.type == 'counter':
+                lines.append(f'{metric.name}{_labels(metric.labelnames, labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (math.inf,), value[:-1]):
+                cumulative += count
+                bucket_labels = _labels(metric.labelnames, labels, [('le', _number(bound))])
+                lines.append(f'{metric.name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{metric.name}_sum{_labels(metric.labelnames, labels)} {_number(value[-1])}')
+            lines.append(f'{metric.name}_count{_labels(metric.labelnames, labels)} {cumulative}')
+
+    # Hit ratio of each cache, from the merged lookup counts
+    lookups = {}
+    for (cache_name, result), count in merged.get(CACHE_REQUESTS.name, {}).items():
+        lookups.setdefault(cache_name, {'hit': 0, 'miss': 0})[result] = count
+    lines.append('# HELP tasktracker_cache_hit_ratio Share of cache lookups that were hits.')
+    lines.append('# TYPE tasktracker_cache_hit_ratio gauge')
+    for cache_name, counts in sorted(lookups.items()):
+        total = counts['hit'] + counts['miss']
+        ratio = counts['hit'] / total if total else 0
+        lines.append(f'tasktracker_cache_hit_ratio{_labels(["cache"], [cache_name])} {_number(ratio)}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Serve the metrics of every worker to clients in METRICS_ALLOWED_IPS."""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(render(registry.collect()), content_type=CONTENT_TYPE)
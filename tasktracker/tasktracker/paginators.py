@@ -0,0 +1,60 @@
+"""
+Admin paginator for tables too large to count.
+
+The Django admin counts every changelist with ``COUNT(*)``, which scans
+the whole table once it has millions of rows. ``EstimatedCountPaginator``
+counts at most ``ADMIN_EXACT_COUNT_LIMIT`` rows. Past that, an unfiltered
+changelist reports the row estimate the database keeps for the table
+(from ANALYZE), and a filtered one reports the limit.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, router, transaction
+from django.utils.functional import cached_property
+
+ESTIMATE_QUERIES = {
+    'postgresql': "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+    'mysql': (
+        "SELECT table_rows FROM information_schema.tables "
+        "WHERE table_schema = DATABASE() AND table_name = %s"
+    ),
+    # The first number of a table's ANALYZE statistics is its row count
+    'sqlite': "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1",
+}
+
+
+def estimated_row_count(model):
+    """Return the database's row estimate for a model's table, or None."""
+    alias = router.db_for_read(model)
+    connection = connections[alias]
+    sql = ESTIMATE_QUERIES.get(connection.vendor)
+    if sql is None:
+        return None
+    try:
+        # In a savepoint, so a failure cannot break an enclosing transaction
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            cursor.execute(sql, [model._meta.db_table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        # e.g. sqlite_stat1 does not exist until ANALYZE has run
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that never counts more than ADMIN_EXACT_COUNT_LIMIT rows."""
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        counted = self.object_list.order_by().values('pk')[:limit].count()
+        if counted < limit:
+            return counted
+        if not self.object_list.query.where:
+            estimate = estimated_row_count(self.object_list.model)
+            if estimate is not None:
+                return max(estimate, limit)
+        return limit
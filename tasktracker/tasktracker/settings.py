@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 
@@ -49,7 +51,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'tasktracker.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'tasktracker.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS middleware
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +61,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'tasktracker.db_router.ReplicaPinningMiddleware',
 ]
 
 # CORS settings
@@ -80,6 +85,7 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
 ]
 
 ROOT_URLCONF = 'tasktracker.urls'
@@ -106,13 +112,137 @@ WSGI_APPLICATION = 'tasktracker.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# TASKTRACKER_DB points the app at another SQLite file, e.g. the scratch
+# database benchmarks/loadgen.py starts the server with.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('TASKTRACKER_DB', BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# Optional read replica. Point TASKTRACKER_REPLICA_DB at a SQLite file kept in
+# sync with `python manage.py sync_replica` to serve read-only endpoints from it.
+REPLICA_DB_PATH = os.environ.get('TASKTRACKER_REPLICA_DB')
+if REPLICA_DB_PATH:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': REPLICA_DB_PATH,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['tasktracker.db_router.PrimaryReplicaRouter']
+
+
+# Caches
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    # Admission control state; point at a shared cache to enforce limits
+    # across worker processes
+    'admission': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'admission',
+    },
+}
+
+# Seconds a user keeps reading from the primary after a write
+REPLICA_PIN_SECONDS = 5
+
+# Upper bound on how long a cached team roster page is served
+ROSTER_CACHE_SECONDS = 300
+
+# Upper bound on how long a cached capacity calendar is served
+CAPACITY_CACHE_SECONDS = 300
+
+# Threads used to compute the dashboard bootstrap parts concurrently
+BOOTSTRAP_MAX_WORKERS = 4
+
+# Response compression (gzip, plus br and zstd when brotli/zstandard are installed)
+COMPRESSION_MIN_LENGTH = 500
+COMPRESSION_LEVELS = {
+    'text/csv': {'gzip': 6, 'br': 5, 'zstd': 6},
+    'default': {'gzip': 5, 'br': 4, 'zstd': 3},
+}
+COMPRESSION_EXCLUDE_PATHS = ['/api/v1/auth/']
+
+# Admission control per endpoint class: a token bucket per user (`rate`
+# requests per `per` seconds, bursts up to `burst`) plus in-flight request
+# limits per user and for the whole class. See tasktracker/throttling.py.
+ADMISSION_CONTROL = {
+    # Analytics, exports and the dashboard bootstrap
+    'heavy': {
+        'rate': 30,
+        'per': 60,
+        'burst': 10,
+        'user_concurrency': 2,
+        'concurrency': 4,
+        'retry_after': 2,
+    },
+    # Task create, read, update and approval routes
+    'crud': {
+        'rate': 300,
+        'per': 60,
+        'burst': 60,
+        'user_concurrency': 8,
+        'concurrency': 64,
+        'retry_after': 1,
+    },
+}
+
+
+# Task audit history is buffered in each process and written in batches of
+# up to AUDIT_BUFFER_SIZE entries, at least every AUDIT_FLUSH_INTERVAL seconds.
+# Batches that cannot be written are kept in AUDIT_FALLBACK_PATH and retried.
+AUDIT_BUFFER_SIZE = 200
+AUDIT_FLUSH_INTERVAL = 2
+AUDIT_FALLBACK_PATH = BASE_DIR / 'audit_fallback.jsonl'
+
+# Keeps the audit entries of test runs out of the real database and fallback file
+TEST_RUNNER = 'tasktracker.test_runner.TestRunner'
+
+
+# Task writes sent with an Idempotency-Key header replay their stored response
+# to retries for IDEMPOTENCY_KEY_TTL seconds. A request still unfinished after
+# IDEMPOTENCY_LOCK_TIMEOUT seconds is presumed dead and a retry runs again.
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+
+# Tag autocomplete is served from an in-memory index in each worker, rebuilt
+# in the background when other workers may have changed tasks and it is older
+# than TAG_INDEX_MAX_AGE seconds. Tags an employee used in the last
+# TAG_RECENT_DAYS days are suggested to them first.
+TAG_INDEX_MAX_AGE = 60
+TAG_RECENT_DAYS = 30
+
+
+# Revoked tokens are checked against an in-memory denylist in each worker,
+# which reads new revocations from the database at most every
+# TOKEN_DENYLIST_REFRESH_INTERVAL seconds. See users/revocation.py.
+TOKEN_DENYLIST_REFRESH_INTERVAL = 1
+
+
+# Admin changelists of large tables count at most this many rows, and use the
+# database's row estimate beyond it. See tasktracker/paginators.py.
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+
+# Prometheus metrics: each worker process writes its counts to its own file in
+# METRICS_DIR at least every METRICS_FLUSH_INTERVAL seconds, and /metrics
+# (served to METRICS_ALLOWED_IPS only) adds up the files of all workers. The
+# files only matter while the server runs, so they live in a temporary
+# directory by default.
+METRICS_DIR = os.environ.get(
+    'TASKTRACKER_METRICS_DIR', Path(tempfile.gettempdir()) / 'tasktracker-metrics'
+)
+METRICS_FLUSH_INTERVAL = 1
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -161,7 +291,7 @@ AUTH_USER_MODEL = 'users.User'
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.RevocableJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -0,0 +1,35 @@
+"""
+Test runner keeping the audit history of a test run out of the real
+database and fallback file.
+
+Buffered audit entries are written by a background thread and at exit,
+both of which would reach the real database (or ``AUDIT_FALLBACK_PATH``)
+once the test database is gone. Under this runner no flush thread starts,
+failed batches go to a temporary file, and whatever is still buffered is
+written to the test database before it is destroyed.
+"""
+import os
+import tempfile
+
+from django.test.runner import DiscoverRunner
+
+from tasks.audit import audit_buffer
+
+
+class TestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._audit_settings = (audit_buffer.flush_interval, audit_buffer.fallback_path)
+        self._audit_dir = tempfile.TemporaryDirectory()
+        audit_buffer.flush_interval = 0
+        audit_buffer.fallback_path = os.path.join(self._audit_dir.name, 'audit_fallback.jsonl')
+
+    def teardown_databases(self, old_config, **kwargs):
+        audit_buffer.flush()
+        super().teardown_databases(old_config, **kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        audit_buffer.flush_interval, audit_buffer.fallback_path = self._audit_settings
+        self._audit_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,178 @@
+"""
+Admission control for API views.
+
+Each view belongs to an admission class (``heavy`` for analytics and
+exports, ``crud`` for task routes) with its own budget in
+``ADMISSION_CONTROL``:
+
+- a token bucket per user (``rate`` tokens refilled per ``per`` seconds, up
+  to ``burst``), and
+- concurrency limits per user (``user_concurrency``) and for the whole
+  class (``concurrency``).
+
+Requests over budget are rejected immediately with 429 and a
+``Retry-After`` header instead of queueing for a worker. State lives in the
+``admission`` cache, which is per process with the default local-memory
+backend and shared when pointed at a shared cache.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+ADMISSION_CACHE = 'admission'
+
+# Serializes the read-modify-write of buckets within this process
+_bucket_lock = threading.Lock()
+
+
+def admission_settings(admission_class):
+    return settings.ADMISSION_CONTROL[admission_class]
+
+
+def client_ident(request, throttle):
+    """Identify the client: the user id, or the address for anonymous requests."""
+    if request.user and request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'anon:{throttle.get_ident(request)}'
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Token bucket per client and admission class."""
+
+    def __init__(self, admission_class):
+        self.admission_class = admission_class
+        config = admission_settings(admission_class)
+        self.refill_rate = config['rate'] / config['per']
+        self.capacity = config['burst']
+        self.cache = caches[ADMISSION_CACHE]
+        self._wait = None
+
+    def allow_request(self, request, view):
+        key = f'bucket:{self.admission_class}:{client_ident(request, self)}'
+        now = time.time()
+        with _bucket_lock:
+            tokens, updated = self.cache.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill_rate)
+            if tokens < 1:
+                self._wait = (1 - tokens) / self.refill_rate
+                self.cache.set(key, (tokens, now), self.timeout)
+                return False
+            self.cache.set(key, (tokens - 1, now), self.timeout)
+        return True
+
+    @property
+    def timeout(self):
+        # An idle bucket is full again after this long and can be dropped
+        return int(self.capacity / self.refill_rate) + 1
+
+    def wait(self):
+        return self._wait
+
+
+class ConcurrencySlot:
+    """A slot in the per-user and per-class in-flight request counters."""
+
+    def __init__(self, admission_class, ident):
+        config = admission_settings(admission_class)
+        self.cache = caches[ADMISSION_CACHE]
+        # Counters expire so slots leaked by a crashed worker free themselves
+        self.timeout = config.get('slot_timeout', 300)
+        self.limits = [
+            (f'inflight:{admission_class}:{ident}', config['user_concurrency']),
+            (f'inflight:{admission_class}', config['concurrency']),
+        ]
+        self.acquired = []
+
+    def _incr(self, key):
+        self.cache.add(key, 0, self.timeout)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.add(key, 0, self.timeout)
+            return self.cache.incr(key)
+
+    def acquire(self):
+        """Take the slot, returning False (and holding nothing) when full."""
+        for key, limit in self.limits:
+            if self._incr(key) > limit:
+                self._decr(key)
+                self.release()
+                return False
+            self.acquired.append(key)
+        return True
+
+    def _decr(self, key):
+        try:
+            self.cache.decr(key)
+        except ValueError:
+            pass
+
+    def release(self):
+        while self.acquired:
+            self._decr(self.acquired.pop())
+
+
+class _ReleasingIterator:
+    """
+    Wrap streaming content to release a slot when the stream is exhausted
+    or closed (Django closes it when the response is closed, even if it was
+    never iterated).
+    """
+
+    def __init__(self, content, slot):
+        self._content = iter(content)
+        self._slot = slot
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._content)
+        except StopIteration:
+            self._slot.release()
+            raise
+
+    def close(self):
+        self._slot.release()
+
+
+class AdmissionControlMixin:
+    """
+    View mixin applying the token bucket and concurrency limits of
+    ``admission_class``. Streaming responses hold their slot until the
+    stream is finished or closed.
+    """
+
+    admission_class = 'crud'
+
+    def get_throttles(self):
+        return [TokenBucketThrottle(self.admission_class)] + super().get_throttles()
+
+    def initial(self, request, *args, **kwargs):
+        self._admission_slot = None
+        super().initial(request, *args, **kwargs)
+
+        slot = ConcurrencySlot(self.admission_class, client_ident(request, BaseThrottle()))
+        if not slot.acquire():
+            raise Throttled(
+                wait=admission_settings(self.admission_class).get('retry_after', 1),
+                detail="Too many concurrent requests. Please retry shortly.",
+            )
+        self._admission_slot = slot
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        slot = getattr(self, '_admission_slot', None)
+        if slot is not None:
+            self._admission_slot = None
+            if response.streaming:
+                response.streaming_content = _ReleasingIterator(response.streaming_content, slot)
+            else:
+                slot.release()
+        return response
@@ -16,11 +16,15 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework_simplejwt.views import TokenRefreshView
+
+from tasktracker.metrics import metrics_view
 
 from users.views import (
     UserRegistrationView,
     CustomTokenObtainPairView,
+    CustomTokenRefreshView,
+    LogoutView,
+    RevokeTokensView,
     UserProfileView,
     TeamMembersView
 )
@@ -28,12 +32,22 @@ from tasks.views import (
     TaskListCreateView,
     TaskDetailView,
     TaskApproveView,
-    TaskRejectView
+    TaskRejectView,
+    ApprovalQueueView,
+    TagAutocompleteView,
+    TaskHistoryView,
+    UserTaskHistoryView
 )
 from analytics.views import (
     EmployeeWeeklySummaryView,
+    BatchWeeklySummaryView,
     TeamAnalyticsView,
-    ExportTasksView
+    CapacityView,
+    ExportTasksView,
+    ImportTasksView,
+    ClosedPeriodListCreateView,
+    TimeSeriesAnalyticsView,
+    DashboardBootstrapView
 )
 
 # API URL patterns
@@ -41,7 +55,9 @@ api_v1_patterns = [
     # Authentication endpoints
     path('auth/register/', UserRegistrationView.as_view(), name='register'),
     path('auth/login/', CustomTokenObtainPairView.as_view(), name='login'),
-    path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/logout/', LogoutView.as_view(), name='logout'),
+    path('auth/revoke-all/', RevokeTokensView.as_view(), name='revoke_all_tokens'),
     
     # User endpoints
     path('users/me/', UserProfileView.as_view(), name='user_profile'),
@@ -49,20 +65,34 @@ api_v1_patterns = [
     
     # Task endpoints
     path('tasks/', TaskListCreateView.as_view(), name='task_list_create'),
+    path('tasks/approvals/', ApprovalQueueView.as_view(), name='approval_queue'),
+    path('tasks/tags/', TagAutocompleteView.as_view(), name='tag_autocomplete'),
     path('tasks/<int:pk>/', TaskDetailView.as_view(), name='task_detail'),
     path('tasks/<int:pk>/approve/', TaskApproveView.as_view(), name='task_approve'),
     path('tasks/<int:pk>/reject/', TaskRejectView.as_view(), name='task_reject'),
+    path('tasks/<int:pk>/history/', TaskHistoryView.as_view(), name='task_history'),
+    path('tasks/history/user/<int:user_id>/', UserTaskHistoryView.as_view(), name='user_task_history'),
     
     # Analytics endpoints
     path('analytics/employee/<int:employee_id>/weekly/', 
          EmployeeWeeklySummaryView.as_view(), name='employee_weekly_summary'),
     path('analytics/employee/weekly/', 
          EmployeeWeeklySummaryView.as_view(), name='current_employee_weekly_summary'),
+    path('analytics/employees/weekly/',
+         BatchWeeklySummaryView.as_view(), name='batch_weekly_summary'),
     path('analytics/team/', TeamAnalyticsView.as_view(), name='team_analytics'),
+    path('analytics/capacity/', CapacityView.as_view(), name='capacity'),
     path('analytics/export/', ExportTasksView.as_view(), name='export_tasks'),
+    path('analytics/import/', ImportTasksView.as_view(), name='import_tasks'),
+    path('analytics/periods/', ClosedPeriodListCreateView.as_view(), name='closed_periods'),
+    path('analytics/timeseries/', TimeSeriesAnalyticsView.as_view(), name='timeseries_analytics'),
+    
+    # Dashboard endpoints
+    path('dashboard/bootstrap/', DashboardBootstrapView.as_view(), name='dashboard_bootstrap'),
 ]
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/v1/', include(api_v1_patterns)),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -0,0 +1,225 @@
+"""
+Warm-up for preloading servers.
+
+``warm_up()`` does the work the first requests of a fresh worker would
+otherwise pay for: importing the modules views load lazily, resolving
+DRF's default classes, building every serializer's fields, resolving every
+``api_v1_patterns`` route, building the tag autocomplete index and priming
+each database connection. Run it in the master process of a preloading
+server (``gunicorn --preload`` with ``TASKTRACKER_WARMUP=1``, which makes
+``tasktracker.wsgi`` call it) so that forked workers start hot.
+
+Connections are closed again afterwards because they must not be shared
+across a fork; call ``warm_up_connections(close=False)`` from a post-fork
+hook to open them in each worker.
+"""
+import importlib
+import importlib.util
+import logging
+import re
+import sys
+import time
+
+from django.apps import apps
+from django.db import DatabaseError, connections
+from django.urls import URLPattern, URLResolver, resolve, reverse
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+# Modules the first requests would otherwise import
+PRELOAD_MODULES = [
+    'rest_framework.views',
+    'rest_framework.generics',
+    'rest_framework.pagination',
+    'rest_framework.renderers',
+    'rest_framework.parsers',
+    'rest_framework_simplejwt.authentication',
+    'rest_framework_simplejwt.tokens',
+    'corsheaders.middleware',
+    'tasktracker.urls',
+]
+
+# Per-app modules imported when they exist
+APP_MODULES = ['models', 'serializers', 'views', 'admin']
+
+# DRF settings that import their classes on first access
+DRF_CLASS_SETTINGS = [
+    'DEFAULT_AUTHENTICATION_CLASSES',
+    'DEFAULT_PERMISSION_CLASSES',
+    'DEFAULT_PAGINATION_CLASS',
+    'DEFAULT_RENDERER_CLASSES',
+    'DEFAULT_PARSER_CLASSES',
+    'DEFAULT_THROTTLE_CLASSES',
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS',
+    'DEFAULT_METADATA_CLASS',
+    'DEFAULT_VERSIONING_CLASS',
+    'EXCEPTION_HANDLER',
+]
+
+
+def _elapsed_ms(start):
+    return (time.perf_counter() - start) * 1000
+
+
+def import_modules():
+    """Import the preload and app modules, returning (module, ms, new modules) rows."""
+    names = list(PRELOAD_MODULES)
+    for app_config in apps.get_app_configs():
+        for module in APP_MODULES:
+            name = f'{app_config.name}.{module}'
+            if name not in names and importlib.util.find_spec(name) is not None:
+                names.append(name)
+
+    rows = []
+    for name in names:
+        loaded = len(sys.modules)
+        start = time.perf_counter()
+        importlib.import_module(name)
+        rows.append((name, _elapsed_ms(start), len(sys.modules) - loaded))
+    return rows
+
+
+def load_drf_classes():
+    """Resolve DRF's lazily imported default classes."""
+    for name in DRF_CLASS_SETTINGS:
+        getattr(api_settings, name)
+
+
+def _local_serializer_classes():
+    local_apps = tuple(f'{app_config.name}.' for app_config in apps.get_app_configs()
+                       if not app_config.name.startswith('django.'))
+    pending, found = [serializers.BaseSerializer], []
+    while pending:
+        for subclass in pending.pop().__subclasses__():
+            pending.append(subclass)
+            if subclass.__module__.startswith(local_apps) and subclass not in found:
+                found.append(subclass)
+    return found
+
+
+def build_serializer_fields():
+    """Build the fields of every serializer defined in the project's apps."""
+    built = 0
+    for serializer_class in _local_serializer_classes():
+        try:
+            serializer_class(context={}).fields
+        except Exception:
+            logger.debug("Could not build fields of %s", serializer_class.__name__, exc_info=True)
+            continue
+        built += 1
+    return built
+
+
+def _route_samples(patterns, prefix=''):
+    """Yield (sample path, url name, kwargs) for every route."""
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from _route_samples(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern):
+            kwargs = {name: 1 for name in re.findall(r'<(?:\w+:)?(\w+)>', route)}
+            yield re.sub(r'<[^>]+>', '1', route), pattern.name, kwargs
+
+
+def resolve_routes():
+    """Resolve and reverse every api_v1 route, compiling the URL resolvers."""
+    from tasktracker.urls import api_v1_patterns
+
+    count = 0
+    for path, name, kwargs in _route_samples(api_v1_patterns):
+        resolve(f'/api/v1/{path}')
+        if name:
+            reverse(name, kwargs=kwargs)
+        count += 1
+    return count
+
+
+def build_tag_index():
+    """Build the tag autocomplete index, so forked workers inherit it."""
+    from tasks.tags import tag_index
+
+    try:
+        tag_index.rebuild()
+    except DatabaseError:
+        logger.warning("Could not build the tag index", exc_info=True)
+
+
+def warm_up_connections(close=True):
+    """
+    Open each database connection and read the hot tables, so SQLite's
+    pages are in the OS cache. Closes them again unless close is False.
+    """
+    from tasks.models import PendingApprovalCounter, Task
+    from users.models import User
+
+    for alias in connections:
+        connection = connections[alias]
+        try:
+            connection.ensure_connection()
+            for model in (User, Task, PendingApprovalCounter):
+                model.objects.using(alias).exists()
+        except DatabaseError:
+            logger.warning("Could not warm up database %r", alias, exc_info=True)
+        finally:
+            if close:
+                connection.close()
+
+
+def warm_up(started=None):
+    """
+    Run every warm-up step and return a report of the time each took (in
+    ms) and the import breakdown. Pass the perf_counter value taken before
+    the application was loaded to include that in the report.
+    """
+    start = time.perf_counter()
+    report = {'phases': {}, 'imports': []}
+    if started is not None:
+        report['phases']['load application'] = (start - started) * 1000
+
+    phase = time.perf_counter()
+    report['imports'] = import_modules()
+    report['phases']['import modules'] = _elapsed_ms(phase)
+
+    phase = time.perf_counter()
+    load_drf_classes()
+    report['phases']['load DRF classes'] = _elapsed_ms(phase)
+
+    phase = time.perf_counter()
+    report['serializers'] = build_serializer_fields()
+    report['phases']['build serializer fields'] = _elapsed_ms(phase)
+
+    phase = time.perf_counter()
+    report['routes'] = resolve_routes()
+    report['phases']['resolve routes'] = _elapsed_ms(phase)
+
+    phase = time.perf_counter()
+    build_tag_index()
+    report['phases']['build tag index'] = _elapsed_ms(phase)
+
+    phase = time.perf_counter()
+    warm_up_connections()
+    report['phases']['prime connections'] = _elapsed_ms(phase)
+
+    report['total'] = _elapsed_ms(start)
+    logger.info(
+        "Warm-up finished in %.1f ms (%d serializers, %d routes)",
+        report['total'], report['serializers'], report['routes'],
+    )
+    return report
+
+
+def format_report(report):
+    """Render a warm-up report as text."""
+    lines = ['Phases:']
+    for name, ms in report['phases'].items():
+        lines.append(f'  {name:<28} {ms:>9.1f} ms')
+    lines.append(f"  {'warm-up total':<28} {report['total']:>9.1f} ms")
+    lines.append('')
+    lines.append('Imports (slowest first):')
+    for name, ms, new_modules in sorted(report['imports'], key=lambda row: row[1], reverse=True):
+        lines.append(f'  {name:<44} {ms:>9.1f} ms {new_modules:>5} modules')
+    lines.append('')
+    lines.append(f"Serializers built: {report['serializers']}, routes resolved: {report['routes']}")
+    return '\n'.join(lines)
@@ -8,9 +8,22 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/wsgi/
 """
 
 import os
+import time
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tasktracker.settings')
 
-application = get_wsgi_application() 
\ No newline at end of file
+started = time.perf_counter()
+application = get_wsgi_application()
+
+# Worker processes save their metrics for /metrics to merge
+from tasktracker.metrics import registry  # noqa: E402
+
+registry.serve()
+
+# Preloading servers warm the app up once, before forking workers
+if os.environ.get('TASKTRACKER_WARMUP', '').lower() in ('1', 'true', 'yes'):
+    from tasktracker.warmup import warm_up
+
+    warm_up(started)
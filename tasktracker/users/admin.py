@@ -0,0 +1,62 @@
+from django.contrib import admin, messages
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.contrib.auth.forms import UserChangeForm as BaseUserChangeForm
+from django.contrib.auth.forms import UserCreationForm as BaseUserCreationForm
+from django.utils.translation import gettext_lazy as _
+
+from .models import Team, User
+from .revocation import revoke_user_tokens
+
+
+class UserCreationForm(BaseUserCreationForm):
+    class Meta:
+        model = User
+        fields = ['email', 'first_name', 'last_name', 'role', 'team']
+
+
+class UserChangeForm(BaseUserChangeForm):
+    class Meta:
+        model = User
+        fields = '__all__'
+
+
+@admin.register(User)
+class UserAdmin(BaseUserAdmin):
+    """Admin for users, who sign in with their email address."""
+
+    form = UserChangeForm
+    add_form = UserCreationForm
+    fieldsets = [
+        (None, {'fields': ['email', 'password']}),
+        (_('Personal info'), {'fields': ['first_name', 'last_name']}),
+        (_('Role'), {'fields': ['role', 'team']}),
+        (_('Permissions'), {'fields': ['is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions']}),
+        (_('Important dates'), {'fields': ['last_login', 'date_joined']}),
+    ]
+    add_fieldsets = [
+        (None, {
+            'classes': ['wide'],
+            'fields': ['email', 'first_name', 'last_name', 'role', 'team', 'password1', 'password2'],
+        }),
+    ]
+    list_display = ['email', 'first_name', 'last_name', 'role', 'team', 'is_active']
+    list_select_related = ['team']
+    list_filter = ['role', 'team', 'is_active', 'is_staff']
+    # Also what task autocompletion searches
+    search_fields = ['email', 'first_name', 'last_name']
+    ordering = ['email']
+    actions = ['revoke_tokens']
+
+    @admin.action(description="Revoke all tokens of selected users")
+    def revoke_tokens(self, request, queryset):
+        users = list(queryset)
+        for user in users:
+            revoke_user_tokens(user)
+        self.message_user(request, f"Revoked the tokens of {len(users)} user(s).", messages.SUCCESS)
+
+
+@admin.register(Team)
+class TeamAdmin(admin.ModelAdmin):
+    list_display = ['name', 'created_at']
+    search_fields = ['name']
+    filter_horizontal = ['managers']
@@ -0,0 +1,15 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .revocation import denylist
+
+
+class RevocableJWTAuthentication(JWTAuthentication):
+    """JWT authentication that rejects revoked access tokens."""
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if denylist.is_revoked(validated_token):
+            raise InvalidToken(_("Token has been revoked."))
+        return validated_token
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from users.models import RevokedToken
+
+
+class Command(BaseCommand):
+    """Delete revocations of tokens that have expired anyway."""
+
+    help = "Delete revocations of tokens that have expired anyway. Run it periodically, e.g. daily from cron."
+
+    def handle(self, *args, **options):
+        deleted = RevokedToken.purge_expired()
+        self.stdout.write(f"Deleted {deleted} expired token revocations")
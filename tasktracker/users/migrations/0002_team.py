@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_default_team(apps, schema_editor):
+    # Existing managers keep seeing every existing employee
+    Team = apps.get_model('users', 'Team')
+    User = apps.get_model('users', 'User')
+    
+    team = Team.objects.create(name='Default')
+    User.objects.filter(role='employee').update(team=team)
+    team.managers.set(User.objects.filter(role='manager'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Team',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='name')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('managers', models.ManyToManyField(blank=True, related_name='managed_teams', to=settings.AUTH_USER_MODEL, verbose_name='managers')),
+            ],
+            options={
+                'verbose_name': 'team',
+                'verbose_name_plural': 'teams',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='team',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='members', to='users.team', verbose_name='team'),
+        ),
+        migrations.RunPython(create_default_team, migrations.RunPython.noop),
+    ]
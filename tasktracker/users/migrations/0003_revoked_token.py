@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_team'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jti', models.CharField(blank=True, max_length=255, null=True, verbose_name='token id')),
+                ('revoked_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='revoked at')),
+                ('expires_at', models.DateTimeField(verbose_name='expires at')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'revoked token',
+                'verbose_name_plural': 'revoked tokens',
+                'indexes': [models.Index(fields=['revoked_at'], name='revoked_token_revoked_idx'), models.Index(fields=['expires_at'], name='revoked_token_expiry_idx')],
+            },
+        ),
+    ]
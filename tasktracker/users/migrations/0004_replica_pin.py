@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_revoked_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplicaPin',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('pinned_until', models.DateTimeField(verbose_name='pinned until')),
+            ],
+            options={
+                'verbose_name': 'replica pin',
+                'verbose_name_plural': 'replica pins',
+            },
+        ),
+    ]
@@ -1,7 +1,17 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Count, DecimalField, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from tasktracker.caching import USERS, bump_data_version
+
 
 class UserManager(BaseUserManager):
     """Define a model manager for User model with no username field."""
@@ -37,6 +47,78 @@ class UserManager(BaseUserManager):
 
         return self._create_user(email, password, **extra_fields)
 
+    def with_roster_stats(self, today):
+        """
+        Annotate users with their hours this week and month, pending task
+        count and last activity date, computed in a single grouped query.
+        """
+        week_start = today - timedelta(days=today.weekday())
+        week_end = week_start + timedelta(days=6)
+        month_start = today.replace(day=1)
+        if today.month == 12:
+            month_end = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
+        else:
+            month_end = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
+
+        hours = DecimalField(max_digits=8, decimal_places=2)
+        return self.get_queryset().annotate(
+            hours_this_week=Coalesce(
+                Sum('tasks__hours_spent', filter=Q(tasks__task_date__range=[week_start, week_end])),
+                Value(0),
+                output_field=hours,
+            ),
+            hours_this_month=Coalesce(
+                Sum('tasks__hours_spent', filter=Q(tasks__task_date__range=[month_start, month_end])),
+                Value(0),
+                output_field=hours,
+            ),
+            pending_count=Count('tasks', filter=Q(tasks__status='pending')),
+            last_activity=Max('tasks__task_date'),
+        )
+
+    def managed_by(self, manager):
+        """Return the employees in the teams a manager manages."""
+        return self.get_queryset().filter(
+            role=User.ROLE_EMPLOYEE,
+            team_id__in=manager.managed_team_ids(),
+        )
+
+    def team_roster(self, today, manager):
+        """Return the employees a manager sees, with roster stats."""
+        return self.with_roster_stats(today).filter(
+            role=User.ROLE_EMPLOYEE,
+            team_id__in=manager.managed_team_ids(),
+        ).order_by('id')
+
+
+class Team(models.Model):
+    """A group of employees and the managers responsible for them."""
+
+    DEFAULT_NAME = 'Default'
+
+    name = models.CharField(_('name'), max_length=100, unique=True)
+    managers = models.ManyToManyField(
+        settings.AUTH_USER_MODEL,
+        related_name='managed_teams',
+        blank=True,
+        verbose_name=_('managers'),
+    )
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = _('team')
+        verbose_name_plural = _('teams')
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def get_default(cls):
+        """Return the team new users join when none is given."""
+        team, created = cls.objects.get_or_create(name=cls.DEFAULT_NAME)
+        return team
+
 
 class User(AbstractUser):
     """Custom User model with email as username and role field."""
@@ -52,6 +134,15 @@ class User(AbstractUser):
     username = None
     email = models.EmailField(_('email address'), unique=True)
     role = models.CharField(_('role'), max_length=10, choices=ROLE_CHOICES, default=ROLE_EMPLOYEE)
+    # The team an employee belongs to; managers are linked through Team.managers
+    team = models.ForeignKey(
+        Team,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='members',
+        verbose_name=_('team'),
+    )
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name']
@@ -60,6 +151,13 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.email
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored team to move the user's tasks when it changes
+        instance._loaded_team_id = instance.__dict__.get('team_id')
+        return instance
     
     @property
     def is_employee(self):
@@ -68,3 +166,79 @@ class User(AbstractUser):
     @property
     def is_manager(self):
         return self.role == self.ROLE_MANAGER
+
+    def managed_team_ids(self):
+        """Return the ids of the teams this user manages, loaded once per instance."""
+        if not hasattr(self, '_managed_team_ids'):
+            self._managed_team_ids = list(self.managed_teams.values_list('id', flat=True))
+        return self._managed_team_ids
+
+
+class RevokedToken(models.Model):
+    """
+    A revoked JWT, or every token of a user issued before ``revoked_at``
+    when ``jti`` is empty. Checked through the in-process denylist in
+    ``users.revocation``.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    jti = models.CharField(_('token id'), max_length=255, null=True, blank=True)
+    revoked_at = models.DateTimeField(_('revoked at'), default=timezone.now)
+    # When the revoked token (or the user's last token issued before
+    # revoked_at) expires anyway, after which the row can be purged
+    expires_at = models.DateTimeField(_('expires at'))
+
+    class Meta:
+        verbose_name = _('revoked token')
+        verbose_name_plural = _('revoked tokens')
+        indexes = [
+            models.Index(fields=['revoked_at'], name='revoked_token_revoked_idx'),
+            models.Index(fields=['expires_at'], name='revoked_token_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.jti or 'all tokens'}"
+
+    @classmethod
+    def purge_expired(cls):
+        """Delete revocations of tokens that have expired anyway, returning how many."""
+        deleted, _ = cls.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+
+class ReplicaPin(models.Model):
+    """
+    Until when a user who has just written reads from the primary
+    database, while the replica catches up (see ``tasktracker.db_router``).
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    pinned_until = models.DateTimeField(_('pinned until'))
+
+    class Meta:
+        verbose_name = _('replica pin')
+        verbose_name_plural = _('replica pins')
+
+    def __str__(self):
+        return f"{self.user_id} until {self.pinned_until}"
+
+
+@receiver(post_save, sender=User)
+def assign_default_team(sender, instance, created, raw=False, **kwargs):
+    """Put new users without a team in the default team."""
+    if not created or raw:
+        return
+    if instance.is_manager:
+        Team.get_default().managers.add(instance)
+    elif instance.team_id is None:
+        instance.team = Team.get_default()
+        User.objects.filter(pk=instance.pk).update(team=instance.team)
+        instance._loaded_team_id = instance.team_id
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Team)
+def invalidate_user_caches(sender, **kwargs):
+    """Invalidate cached responses built from user data."""
+    bump_data_version(USERS)
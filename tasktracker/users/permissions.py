@@ -28,7 +28,7 @@ class IsTaskOwner(permissions.BasePermission):
     message = "You can only modify your own tasks."
     
     def has_object_permission(self, request, view, obj):
-        return obj.user == request.user
+        return obj.user_id == request.user.id
 
 
 class IsManagerOrTaskOwner(permissions.BasePermission):
@@ -37,4 +37,4 @@ class IsManagerOrTaskOwner(permissions.BasePermission):
     """
     def has_object_permission(self, request, view, obj):
         # Check if user is a manager or the task owner
-        return (request.user.is_manager or obj.user == request.user) 
\ No newline at end of file
+        return (request.user.is_manager or obj.user_id == request.user.id)
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""
+JWT revocation with an in-process denylist.
+
+Revocations are stored as ``RevokedToken`` rows. Each worker process keeps
+the unexpired ones in memory: revoked token ids in a bloom filter backed
+by an exact set, and per-user cutoffs for "revoke all". Every
+authentication and refresh checks the token against them. That costs
+a clock read and a few bit probes, with no query. The denylist picks
+up other workers' revocations by reading the rows revoked since its last
+refresh, at most every ``TOKEN_DENYLIST_REFRESH_INTERVAL`` seconds.
+Revocations made by this process take effect immediately.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+# Revocations committed this long before a refresh are read again by the
+# next one, so rows that commit out of order are not missed
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+
+class BloomFilter:
+    """Fixed-size bloom filter of strings, with no false negatives."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(capacity, 1)
+        size = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.size = size
+        self.hash_count = max(1, round(size / self.capacity * math.log(2)))
+        self.bits = bytearray((size + 7) // 8)
+
+    def _hashes(self, value):
+        # Python's string hash is only stable within a process (and its
+        # forks), which is all this per-process filter needs
+        return hash(value), hash((value, self.size)) | 1
+
+    def add(self, value):
+        first, second = self._hashes(value)
+        for i in range(self.hash_count):
+            position = (first + i * second) % self.size
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        first, second = self._hashes(value)
+        for i in range(self.hash_count):
+            position = (first + i * second) % self.size
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class TokenDenylist:
+    """The revoked tokens of this process, refreshed from the database."""
+
+    def __init__(self, capacity=1024):
+        self.initial_capacity = capacity
+        # {jti: expiry timestamp}
+        self._tokens = {}
+        self._bloom = BloomFilter(capacity)
+        # {str(user_id): (cutoff timestamp, expiry timestamp)}: tokens issued
+        # before the cutoff's second are revoked. ``iat`` has whole seconds,
+        # so a token issued in that second (by logging in again right after
+        # revoking) is kept. Keys are strings like the tokens' user id claim.
+        self._users = {}
+        self._refreshed_at = None
+        self._next_refresh = 0
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+
+    def _add(self, jti, expires, user_id, cutoff):
+        """Add a revocation; call with the lock held."""
+        if jti is None:
+            user_id = str(user_id)
+            previous = self._users.get(user_id)
+            if previous is None or previous[0] < cutoff:
+                self._users[user_id] = (cutoff, expires)
+            return
+        if jti in self._tokens:
+            return
+        self._tokens[jti] = expires
+        if len(self._tokens) > self._bloom.capacity:
+            self._rebuild_bloom()
+        else:
+            self._bloom.add(jti)
+
+    def _rebuild_bloom(self):
+        """
+        Drop expired revocations and size the bloom filter for the rest;
+        call with the lock held.
+        """
+        now = time.time()
+        self._tokens = {jti: expires for jti, expires in self._tokens.items() if expires > now}
+        self._users = {user_id: entry for user_id, entry in self._users.items() if entry[1] > now}
+        capacity = self.initial_capacity
+        while capacity < len(self._tokens) * 2:
+            capacity *= 2
+        bloom = BloomFilter(capacity)
+        for jti in self._tokens:
+            bloom.add(jti)
+        self._bloom = bloom
+
+    def add(self, revoked_token):
+        """Add a RevokedToken, taking effect in this process at once."""
+        with self._lock:
+            self._add(
+                revoked_token.jti,
+                revoked_token.expires_at.timestamp(),
+                revoked_token.user_id,
+                int(revoked_token.revoked_at.timestamp()),
+            )
+
+    def refresh(self):
+        """Load the revocations made since the last refresh (all on the first)."""
+        started = timezone.now()
+        if self._refreshed_at is None:
+            rows = RevokedToken.objects.filter(expires_at__gt=started)
+        else:
+            rows = RevokedToken.objects.filter(revoked_at__gte=self._refreshed_at - REFRESH_OVERLAP)
+        rows = rows.values_list('jti', 'expires_at', 'user_id', 'revoked_at')
+        try:
+            rows = list(rows)
+        except DatabaseError:
+            logger.warning("Could not refresh the token denylist", exc_info=True)
+            return
+        with self._lock:
+            for jti, expires_at, user_id, revoked_at in rows:
+                self._add(jti, expires_at.timestamp(), user_id, int(revoked_at.timestamp()))
+            self._refreshed_at = started
+
+    def is_revoked(self, token):
+        """Return True if a validated token (or its payload) has been revoked."""
+        now = time.monotonic()
+        if now >= self._next_refresh:
+            # One thread refreshes while the others use the current entries
+            with self._lock:
+                due = now >= self._next_refresh
+                if due:
+                    self._next_refresh = now + settings.TOKEN_DENYLIST_REFRESH_INTERVAL
+            if due:
+                self.refresh()
+
+        user_entry = self._users.get(str(token.get(api_settings.USER_ID_CLAIM)))
+        if user_entry is not None and token.get('iat', 0) < user_entry[0]:
+            return True
+        jti = token.get(api_settings.JTI_CLAIM)
+        return jti is not None and jti in self._bloom and jti in self._tokens
+
+
+denylist = TokenDenylist()
+
+
+def _expiry(token):
+    return datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+
+
+def revoke_token(token):
+    """Revoke a validated token until it expires."""
+    revoked = RevokedToken.objects.create(
+        user_id=token[api_settings.USER_ID_CLAIM],
+        jti=token[api_settings.JTI_CLAIM],
+        expires_at=_expiry(token),
+    )
+    denylist.add(revoked)
+    return revoked
+
+
+def revoke_user_tokens(user):
+    """Revoke every token issued to a user so far."""
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    revoked_at = timezone.now()
+    revoked = RevokedToken.objects.create(
+        user=user, jti=None, revoked_at=revoked_at, expires_at=revoked_at + lifetime,
+    )
+    denylist.add(revoked)
+    return revoked
+
@@ -1,6 +1,12 @@
 from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .revocation import denylist
 
 User = get_user_model()
 
@@ -14,6 +20,20 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'role']
 
 
+class TeamRosterSerializer(UserSerializer):
+    """Serializer for team members with their task stats."""
+    
+    hours_this_week = serializers.DecimalField(max_digits=8, decimal_places=2, read_only=True)
+    hours_this_month = serializers.DecimalField(max_digits=8, decimal_places=2, read_only=True)
+    pending_count = serializers.IntegerField(read_only=True)
+    last_activity = serializers.DateField(read_only=True)
+    
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + [
+            'hours_this_week', 'hours_this_month', 'pending_count', 'last_activity'
+        ]
+
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     """Serializer for user registration."""
     
@@ -60,4 +80,45 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
             'role': self.user.role,
         }
         
-        return data 
\ No newline at end of file
+        return data 
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """Token refresh serializer that rejects revoked refresh tokens."""
+    
+    def validate(self, attrs):
+        if denylist.is_revoked(self.token_class(attrs['refresh'])):
+            raise InvalidToken(_("Token has been revoked."))
+        return super().validate(attrs)
+
+
+class LogoutSerializer(serializers.Serializer):
+    """Serializer for the refresh token revoked on logout."""
+    
+    refresh = serializers.CharField()
+    
+    def validate_refresh(self, value):
+        try:
+            token = RefreshToken(value)
+        except TokenError as e:
+            raise serializers.ValidationError(str(e))
+        if str(token.get(api_settings.USER_ID_CLAIM)) != str(self.context['request'].user.pk):
+            raise serializers.ValidationError("The token belongs to another user.")
+        return token
+
+
+class RevokeTokensSerializer(serializers.Serializer):
+    """Serializer for the user whose tokens are all revoked (default: yourself)."""
+    
+    user_id = serializers.IntegerField(required=False)
+    
+    def validate_user_id(self, value):
+        user = self.context['request'].user
+        if value == user.pk:
+            return user
+        if not user.is_manager:
+            raise serializers.ValidationError("You can only revoke your own tokens.")
+        try:
+            return User.objects.managed_by(user).get(pk=value)
+        except User.DoesNotExist:
+            raise serializers.ValidationError("No employee with this id in your teams.")
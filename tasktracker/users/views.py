@@ -1,15 +1,28 @@
 from django.shortcuts import render
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
 from rest_framework import generics, permissions, status
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from .serializers import (
     UserSerializer,
+    TeamRosterSerializer,
     UserRegistrationSerializer,
-    CustomTokenObtainPairSerializer
+    CustomTokenObtainPairSerializer,
+    CustomTokenRefreshSerializer,
+    LogoutSerializer,
+    RevokeTokensSerializer
 )
 from .permissions import IsManager
+from .revocation import revoke_token, revoke_user_tokens
+from tasktracker.caching import TASKS, USERS, versioned_cache_key
+from tasktracker.db_router import ReplicaReadMixin
+from tasktracker.metrics import cache_lookup
 
 User = get_user_model()
 
@@ -38,6 +51,43 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
+class CustomTokenRefreshView(TokenRefreshView):
+    """Token refresh view that rejects revoked refresh tokens."""
+    
+    serializer_class = CustomTokenRefreshSerializer
+
+
+class LogoutView(generics.GenericAPIView):
+    """View revoking the given refresh token and the access token used."""
+    
+    serializer_class = LogoutSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        revoke_token(serializer.validated_data['refresh'])
+        if request.auth is not None:
+            revoke_token(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class RevokeTokensView(generics.GenericAPIView):
+    """
+    View revoking every token issued so far to the user, or to an employee
+    of a manager's teams (for instance when they leave).
+    """
+    
+    serializer_class = RevokeTokensSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        revoke_user_tokens(serializer.validated_data.get('user_id', request.user))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class UserProfileView(generics.RetrieveUpdateAPIView):
     """View for retrieving and updating user profile."""
     
@@ -48,13 +98,62 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         return self.request.user
 
 
-class TeamMembersView(generics.ListAPIView):
-    """View for listing team members (for managers only)."""
+class RosterPagination(PageNumberPagination):
+    """Pagination for the team roster."""
+    
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class TeamMembersView(ReplicaReadMixin, generics.ListAPIView):
+    """
+    View for listing the members of the teams a manager manages.
+    
+    Pass ``?roster=true`` to include each member's hours this week and month,
+    pending task count and last activity date.
+    """
     
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated, IsManager]
     
+    @property
+    def is_roster(self):
+        return self.request.query_params.get('roster', '').lower() in ('1', 'true', 'yes')
+    
+    @property
+    def pagination_class(self):
+        if self.is_roster:
+            return RosterPagination
+        return api_settings.DEFAULT_PAGINATION_CLASS
+    
+    def get_serializer_class(self):
+        if self.is_roster:
+            return TeamRosterSerializer
+        return UserSerializer
+    
     def get_queryset(self):
-        # For simplicity, managers can see all employees
-        # In a real application, you might want to filter by department or team
-        return User.objects.filter(role=User.ROLE_EMPLOYEE)
+        # Managers see the employees of the teams they manage
+        if self.is_roster:
+            return User.objects.team_roster(timezone.now().date(), self.request.user)
+        return User.objects.managed_by(self.request.user).order_by('id')
+    
+    def list(self, request, *args, **kwargs):
+        if not self.is_roster:
+            return super().list(request, *args, **kwargs)
+        
+        # Roster pages are cached until a user or task is written
+        cache_key = versioned_cache_key(
+            'team-roster',
+            (USERS, TASKS),
+            timezone.now().date(),
+            '-'.join(map(str, sorted(request.user.managed_team_ids()))),
+            request.query_params.get('page', 1),
+            request.query_params.get('page_size', ''),
+        )
+        data = cache.get(cache_key)
+        cache_lookup('team-roster', data is not None)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(cache_key, data, settings.ROSTER_CACHE_SECONDS)
+        return Response(data)